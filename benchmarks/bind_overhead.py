@@ -0,0 +1,42 @@
+"""
+Micro-benchmark of the per-call overhead of bound API methods.
+
+Compares rebuilding the APIMethod class on every call (the behaviour before
+endpoints were memoized) against the memoized API attributes. Requests are
+built with create=True, so nothing is sent over the network.
+
+    $ python benchmarks/bind_overhead.py
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import timeit
+
+from sensetdp.api import API
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.binder import bind_api
+
+CALLS = 20000
+
+api = API(HTTPBasicAuth('username', 'password'))
+
+
+def rebuilt():
+    get_stream = bind_api(
+        api=api,
+        path='/streams/{id}',
+        method='GET',
+        payload_type='stream',
+        allowed_param=['id'],
+        require_auth=True,
+    )
+    return get_stream(id='stream_1', create=True)
+
+
+def memoized():
+    return api.get_stream(id='stream_1', create=True)
+
+
+if __name__ == '__main__':
+    for name, fn in (('rebuilt per call', rebuilt), ('memoized', memoized)):
+        best = min(timeit.repeat(fn, number=CALLS, repeat=5))
+        print('%-17s %8.2f us/call' % (name, best / CALLS * 1e6))
@@ -0,0 +1,37 @@
+"""
+Micro-benchmark of serializing an observation upload.
+
+Compares Model.to_json (a state dict per result, strftime per timestamp and
+json.dumps with sort_keys) against the observation serializer behind
+Observation.to_json, which produces the same bytes.
+
+    $ python benchmarks/serialize_observations.py
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import timeit
+import datetime
+
+from sensetdp.models import Model, Observation, UnivariateResult
+
+POINTS = 100000
+
+observation = Observation()
+start = datetime.datetime(2016, 2, 15)
+observation.results = [UnivariateResult(t=start + datetime.timedelta(seconds=i * 15), v={'v': i * 0.25})
+                       for i in range(POINTS)]
+
+
+def generic():
+    return Model.to_json(observation, 'create')
+
+
+def serializer():
+    return observation.to_json('create')
+
+
+if __name__ == '__main__':
+    assert generic() == serializer()
+    for name, fn in (('Model.to_json', generic), ('serializer', serializer)):
+        best = min(timeit.repeat(fn, number=1, repeat=3))
+        print('%-14s %8.2f ms per %d points' % (name, best * 1e3, POINTS))
@@ -53,6 +53,12 @@ setup(name="sensetdp",
       extras_require = {
 	      'pandas-observation-parser': [
 	          'pandas >= 0.18.1'
+	      ],
+	      'async': [
+	          'aiohttp >= 3.5'
+	      ],
+	      'orjson': [
+	          'orjson >= 3'
 	      ]
 	  },
       zip_safe=True)
@@ -0,0 +1,438 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Asyncio client, Python 3 only.
+"""
+import time
+import asyncio
+import logging
+import contextvars
+
+import aiohttp
+
+from sensetdp.api import API
+from sensetdp.error import SenseTError
+from sensetdp.hooks import clock
+from sensetdp.ingest import BulkIngest, IngestStats, IngestReport
+from sensetdp.models import BulkResult, Observation
+from sensetdp.utils import unique, chunk_results
+from sensetdp.session import PoolStats
+from sensetdp.writer import Batcher, WriterStats, make_result
+
+log = logging.getLogger('sensetdp.aio')
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+class AsyncResponse(object):
+    """The parts of an aiohttp response the binder needs, read while the connection is open."""
+
+    def __init__(self, status_code, headers, text, url=None, reason=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.url = url
+        self.reason = reason
+
+    def iter_content(self, chunk_size=65536, decode_unicode=False):
+        # the body is already read, streaming parsers get it in chunks all the same
+        for i in range(0, len(self.text), chunk_size):
+            yield self.text[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return '<AsyncResponse [%s]>' % self.status_code
+
+
+class _AuthTarget(object):
+    """Stand-in request object so requests style auth handlers can set their headers."""
+
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def _query_params(params):
+    # aiohttp neither drops None values nor accepts non string values like requests does
+    query = []
+    for k, v in params.items():
+        if v is None:
+            continue
+        for item in (v if isinstance(v, (list, tuple)) else [v]):
+            query.append((k, item if isinstance(item, str) else str(item)))
+    return query
+
+
+class AsyncAPI(API):
+    """
+    Sense-T API for asyncio, with the same endpoints as API. Calling an endpoint
+    returns a coroutine:
+
+        async with AsyncAPI(auth) as api:
+            stream = await api.get_stream(id='stream_1')
+
+    Requests share one aiohttp connection pool, created on first use, and retry
+    and rate limit waits use asyncio.sleep so they don't block the event loop.
+    """
+
+    # failures to send a request worth retrying
+    transient_errors = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+    def __init__(self, *args, **kwargs):
+        self._client = None
+        self._pool_stats = PoolStats()
+        self._cached_result = contextvars.ContextVar('cached_result', default=False)
+        API.__init__(self, *args, **kwargs)
+
+    @property
+    def cached_result(self):
+        """ True when the last call of this task was answered from the cache """
+        return self._cached_result.get()
+
+    @cached_result.setter
+    def cached_result(self, value):
+        self._cached_result.set(value)
+
+    def build_session(self):
+        # aiohttp sessions must be created inside the event loop, see client_session()
+        return None
+
+    @property
+    def pool_stats(self):
+        return self._pool_stats
+
+    def _trace_config(self):
+        stats = self._pool_stats
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.host = '%s:%s' % (params.url.host, params.url.port)
+
+        async def on_connection_reuseconn(session, context, params):
+            stats.record(context.host, True)
+
+        async def on_connection_create_end(session, context, params):
+            stats.record(context.host, False)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
+
+    async def client_session(self):
+        """ The aiohttp session shared by all bound methods """
+        if self._client is None or self._client.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_connections * self.pool_maxsize,
+                                             limit_per_host=self.pool_maxsize,
+                                             force_close=not self.keep_alive,
+                                             ssl=None if self.verify else False)
+            # timeouts are set per request, see _send
+            self._client = aiohttp.ClientSession(connector=connector,
+                                                 trace_configs=[self._trace_config()])
+        return self._client
+
+    async def close(self):
+        """ Close all pooled connections """
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def execute(self, method):
+        return self._execute(method)
+
+    async def _gather_many(self, func, items, max_workers):
+        result = BulkResult()
+        semaphore = asyncio.Semaphore(max_workers or self.pool_maxsize)
+
+        async def fetch(item):
+            async with semaphore:
+                try:
+                    result[item] = await func(item)
+                except Exception as e:
+                    result.errors[item] = e
+
+        items = unique(items)
+        await asyncio.gather(*[fetch(item) for item in items])
+        # keep the order of the requested items
+        ordered = BulkResult((item, result[item]) for item in items if item in result)
+        ordered.errors = result.errors
+        return ordered
+
+    async def get_streams_many(self, ids, max_workers=None, **kwargs):
+        return await self._gather_many(lambda id: self.get_stream(id=id, **kwargs), ids, max_workers)
+
+    async def get_observations_many(self, streamids, max_workers=None, **kwargs):
+        return await self._gather_many(lambda streamid: self.get_observations(streamid=streamid, **kwargs),
+                                       streamids, max_workers)
+
+    async def ingest_observations(self, observations, max_points=10000, max_bytes=4 * 1024 * 1024,
+                                  max_workers=None, retry_count=3, retry_delay=1, progress=None, **kwargs):
+        """ API.ingest_observations, uploading the chunks from tasks on the running loop. """
+        return await AsyncBulkIngest(self, max_points=max_points, max_bytes=max_bytes, max_workers=max_workers,
+                                     retry_count=retry_count, retry_delay=retry_delay, progress=progress,
+                                     **kwargs).run(observations)
+
+    async def upload_dataframe(self, dataframe, max_points=10000, max_bytes=4 * 1024 * 1024, **kwargs):
+        """ API.upload_dataframe, awaiting each create_observations call. """
+        responses = {}
+        for streamid, results in Observation.results_from_dataframe(dataframe).items():
+            responses[streamid] = [await self.create_observations(streamid=streamid, results=chunk, **kwargs)
+                                   for chunk in chunk_results(results, max_points, max_bytes)]
+        return responses
+
+    async def _send(self, method, url, body):
+        auth = method.build_auth()
+        headers = dict(self.session_headers(), **method.headers)
+        if auth is not None:
+            auth(_AuthTarget(headers))
+
+        connect, read = method.request_timeout()
+        remaining = method.deadline_remaining()
+        timeout = aiohttp.ClientTimeout(total=remaining, connect=connect, sock_read=read)
+
+        session = await self.client_session()
+        async with session.request(method.method, url, data=body, params=_query_params(method.query_params),
+                                   headers=headers, proxy=self.proxy.get(self.scheme), timeout=timeout) as raw:
+            text = await raw.text()
+            return AsyncResponse(raw.status, raw.headers, text, str(raw.url), raw.reason)
+
+    def session_headers(self):
+        return {} if self.keep_alive else {'Connection': 'close'}
+
+    async def _execute(self, method):
+        method.begin()
+        try:
+            result = await self._send_all(method)
+        except Exception as e:
+            method.complete(e)
+            raise
+        method.complete()
+        return result
+
+    async def _send_all(self, method):
+        # Build the request URL
+        full_url = method.scheme + '://' + method.host + method.api_root + method.path
+
+        cache_result = method.lookup_cache_observed()
+        if cache_result is not None:
+            return cache_result
+
+        body = method.build_body_observed()
+
+        # Continue attempting request until successful
+        # or the retry policy gives up.
+        method.retry_policy.record_request()
+        # a probe of a half open circuit is given back when the attempt ends without
+        # an outcome, e.g. the task was cancelled, CancelledError is no Exception
+        try:
+            while True:
+                # handle running out of api calls
+                sleep_time = method.rate_limit_delay()
+                method.check_deadline(sleep_time)
+                if sleep_time:
+                    await asyncio.sleep(sleep_time)
+
+                method.acquire_circuit()
+                method.emit('send', attempt=method.retries)
+                started = clock()
+                try:
+                    resp = await self._send(method, full_url, body)
+                except Exception as e:
+                    method.sent(started, error=e)
+                    retry_delay = method.check_error(e, method.retries)
+                    method.retrying(retry_delay, error=e)
+                    await asyncio.sleep(retry_delay)
+                    continue
+                method.sent(started, resp)
+
+                action, retry_delay = method.check_response(resp, method.retries)
+                if action == 'done':
+                    break
+                elif action == 'wait':
+                    continue
+
+                # Sleep before retrying request again
+                method.retrying(retry_delay, resp)
+                await asyncio.sleep(retry_delay)
+        finally:
+            method.release_circuit()
+
+        return method.handle_response(resp)
+
+
+class AsyncBulkIngest(BulkIngest):
+    """sensetdp.ingest.BulkIngest for AsyncAPI, with up to max_workers chunk uploads as tasks."""
+
+    async def upload(self, chunk, results):
+        """Upload one chunk, retrying retryable failures."""
+        started = time.time()
+        while True:
+            chunk.attempts += 1
+            try:
+                chunk.response = await self.api.create_observations(streamid=chunk.streamid, results=results,
+                                                                    **self.kwargs)
+                chunk.error = None
+                break
+            except Exception as e:
+                chunk.error = e
+                if not self.should_retry(chunk, e):
+                    log.warning('Uploading chunk %d of %s failed: %s', chunk.index, chunk.streamid, e)
+                    break
+                await asyncio.sleep(self.backoff(chunk))
+        chunk.elapsed = time.time() - started
+        return chunk
+
+    async def run(self, observations):
+        stats = IngestStats()
+        chunks = []
+        pending = set()
+        try:
+            for chunk, results in self.chunks(observations):
+                if len(pending) >= self.max_workers:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        self.completed(task.result(), stats)
+                chunks.append(chunk)
+                stats.chunks_total = len(chunks)
+                pending.add(asyncio.ensure_future(self.upload(chunk, results)))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    self.completed(task.result(), stats)
+        finally:
+            for task in pending:
+                task.cancel()
+        return IngestReport(chunks, stats)
+
+
+class AsyncObservationWriter(object):
+    """
+    asyncio counterpart of sensetdp.writer.ObservationWriter for AsyncAPI,
+    uploading from a task on the running loop:
+
+        async with AsyncObservationWriter(api, max_batch=500, max_latency=5) as writer:
+            await writer.write('stream_1', datetime.datetime.utcnow(), {'v': 21.5})
+
+    write() waits while the queue of max_queue results is full.
+    """
+
+    def __init__(self, api, max_batch=500, max_latency=1.0, max_queue=10000, on_error=None, **kwargs):
+        self.api = api
+        self.on_error = on_error
+        self.kwargs = kwargs
+        self.stats = WriterStats()
+        self.closed = False
+        self._batcher = Batcher(max_batch, max_latency)
+        self._max_queue = max_queue
+        self._queue = None
+        self._task = None
+
+    def _ensure_task(self):
+        # the queue and task belong to the loop of the first write
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self._max_queue)
+            self._task = asyncio.ensure_future(self._run())
+
+    async def write(self, streamid, t, v):
+        """
+        Queue an observation.
+        :param streamid: stream id
+        :param t: datetime (naive UTC) or API timestamp string
+        :param v: result value as sent to create_observations, e.g. {'v': 21.5}
+        """
+        if self.closed:
+            raise SenseTError('Observation writer is closed.')
+        self._ensure_task()
+        await self._queue.put((streamid, make_result(t, v)))
+
+    async def flush(self):
+        """Send everything written so far, waiting until it is uploaded."""
+        if self.closed:
+            raise SenseTError('Observation writer is closed.')
+        self._ensure_task()
+        done = asyncio.get_event_loop().create_future()
+        await self._queue.put((_FLUSH, done))
+        await done
+
+    async def close(self):
+        """Send everything pending and stop the upload task."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._task is not None:
+            await self._queue.put((_CLOSE, None))
+            await self._task
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _send(self, streamid, results):
+        try:
+            await self.api.create_observations(streamid=streamid, results=results, **self.kwargs)
+            self.stats.points += len(results)
+            self.stats.batches += 1
+        except Exception as e:
+            self.stats.errors += 1
+            if self.on_error is not None:
+                self.on_error(streamid, results, e)
+            else:
+                log.error('Uploading %d observations of %s failed: %s', len(results), streamid, e)
+
+    async def _run(self):
+        batcher = self._batcher
+        while True:
+            deadline = batcher.next_deadline()
+            try:
+                if deadline is None:
+                    item = await self._queue.get()
+                else:
+                    item = await asyncio.wait_for(self._queue.get(), max(deadline - time.time(), 0))
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is not None:
+                key, value = item
+                if key is _FLUSH or key is _CLOSE:
+                    for streamid, results in batcher.drain():
+                        await self._send(streamid, results)
+                    if key is _CLOSE:
+                        return
+                    value.set_result(None)
+                    continue
+                batch = batcher.add(key, value, time.time())
+                if batch is not None:
+                    await self._send(key, batch)
+
+            for streamid, results in batcher.due(time.time()):
+                await self._send(streamid, results)
@@ -23,40 +23,88 @@ THE SOFTWARE.
 """
 from __future__ import unicode_literals, absolute_import, print_function
 
+import threading
+
+import requests
+
 from sensetdp.binder import bind_api
 from sensetdp.error import SenseTError
 from sensetdp.parsers import ModelParser, Parser
-from sensetdp.utils import list_to_csv
+from sensetdp.session import build_session
+from sensetdp.ingest import BulkIngest
+from sensetdp.jsonlib import get_backend
+from sensetdp.ratelimit import RateLimiter
+from sensetdp.retry import RetryPolicy
+from sensetdp.models import BulkResult, IdentityMap, Observation
+from sensetdp.utils import list_to_csv, memoized_property, map_concurrently, chunk_results
 
 
 class API(object):
     """Sense-T API"""
+
+    # failures to send a request worth retrying
+    transient_errors = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
     def __init__(self, auth_handler=None,
                  host='data.sense-t.org.au', cache=None, api_root='/api/sensor/v2',
                  retry_count=0, retry_delay=0, retry_errors=None, timeout=60, parser=None,
                  compression=False, wait_on_rate_limit=False,
-                 wait_on_rate_limit_notify=False, proxy='', verify=True):
+                 wait_on_rate_limit_notify=False, proxy='', verify=True,
+                 pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True,
+                 scheme='https', json_backend='auto', identity_map=None,
+                 rate_limiter=None, retry_policy=None, circuit_breaker=None, observers=None,
+                 connect_timeout=None, read_timeout=None, timeouts=None, deadline=None):
         """ Api instance Constructor
 
         :param auth_handler:
         :param host:  url of the server of the rest api, default:'api.twitter.com'
-        :param cache: Cache to query if a GET method is used, default:None
+        :param cache: Cache to query if a GET method is used, e.g. sensetdp.cache.MemoryCache, default:None
         :param api_root: suffix of the api version, default:'/1.1'
         :param retry_count: number of allowed retries, default:0
-        :param retry_delay: delay in second between retries, default:0
-        :param retry_errors: default:None
-        :param timeout: delay before to consider the request as timed out in seconds, default:60
+        :param retry_delay: delay in second before the first retry, growing with every further retry, default:0
+        :param retry_errors: status codes to retry, default:None (timeouts, throttling and server errors)
+        :param timeout: delay before to consider the request as timed out in seconds, or a (connect, read)
+            tuple, default:60
         :param parser: ModelParser instance to parse the responses, default:None
         :param compression: If the response is compressed, default:False
         :param wait_on_rate_limit: If the api wait when it hits the rate limit, default:False
         :param wait_on_rate_limit_notify: If the api print a notification when the rate limit is hit, default:False
         :param proxy: Url to use as proxy during the HTTP request, default:''
+        :param verify: Verify the server TLS certificate, default:True
+        :param pool_connections: Number of per host connection pools to keep, default:10
+        :param pool_maxsize: Maximum number of connections kept open per host, default:10
+        :param pool_block: Block when a host's connection pool is exhausted, default:False
+        :param keep_alive: Reuse connections between requests, default:True
+        :param scheme: URL scheme used to reach the host, default:'https'
+        :param json_backend: JSON implementation for the default parser and request bodies,
+            a sensetdp.jsonlib backend or name ('json', 'orjson', 'ujson'), default:'auto' (orjson when installed)
+        :param identity_map: Share parsed embedded entities (organisations, groups, locations...) across
+            responses: True for a weak sensetdp.models.IdentityMap, or an IdentityMap instance. Shared
+            entities are updated in place from newer responses. Embedded entities are always shared within
+            one response, default:None
+        :param rate_limiter: sensetdp.ratelimit.RateLimiter pacing the calls when wait_on_rate_limit is set or it
+            has a rate, share one between API instances using the same credentials, default:None (a new one)
+        :param retry_policy: sensetdp.retry.RetryPolicy with the backoff, jitter and retry budget,
+            default:None (a new RetryPolicy)
+        :param circuit_breaker: sensetdp.circuit.CircuitBreaker failing calls fast while the portal is down,
+            default:None
+        :param observers: sensetdp.hooks.Observer instances notified of each phase of every call, e.g. a
+            sensetdp.hooks.MetricsAggregator, default:None
+        :param connect_timeout: seconds to wait for a connection, default:None (timeout)
+        :param read_timeout: seconds to wait for the server to send data, default:None (timeout)
+        :param timeouts: per endpoint timeouts, a number or (connect, read) tuple keyed by endpoint template,
+            e.g. {'GET /streams/{id}': 5, 'GET /observations': (5, 600)}, default:None
+        :param deadline: total seconds a call may take including retries and waits, default:None (no deadline)
+
+        Calls take timeout and deadline arguments overriding these, e.g. api.get_stream(id='s', timeout=2).
 
         :raise TypeError: If the given parser is not a ModelParser instance.
         """
+        self._local = threading.local()
         self.auth = auth_handler
         self.verify = verify
         self.host = host
+        self.scheme = scheme
         self.api_root = api_root
         self.cache = cache
         self.compression = compression
@@ -64,13 +112,31 @@ class API(object):
         self.retry_delay = retry_delay
         self.retry_errors = retry_errors
         self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.timeouts = dict(timeouts or {})
+        self.deadline = deadline
         self.wait_on_rate_limit = wait_on_rate_limit
         self.wait_on_rate_limit_notify = wait_on_rate_limit_notify
-        self.parser = parser or ModelParser()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.observers = list(observers or [])
+        self.json_backend = get_backend(json_backend)
+        self.identity_map = IdentityMap(weak=True) if identity_map is True else identity_map
+        self.parser = parser or ModelParser(json_backend=self.json_backend)
         self.proxy = {}
         if proxy:
             self.proxy['https'] = proxy
 
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        # One connection pool shared by every bound method, so consecutive calls
+        # reuse keep-alive connections instead of paying a new TLS handshake.
+        self.session = self.build_session()
+
         parser_type = Parser
         if not isinstance(self.parser, parser_type):
             raise TypeError(
@@ -81,11 +147,118 @@ class API(object):
                 )
             )
 
+    def build_session(self):
+        """ Build the HTTP session shared by all bound methods """
+        return build_session(pool_connections=self.pool_connections,
+                             pool_maxsize=self.pool_maxsize,
+                             pool_block=self.pool_block,
+                             keep_alive=self.keep_alive,
+                             verify=self.verify)
+
+    @property
+    def pool_stats(self):
+        """ Connection pool hit/miss counters, a hit being a request served on an already open connection
+            :rtype: sensetdp.session.PoolStats
+        """
+        return self.session.get_adapter(self.scheme + '://' + self.host).stats
+
+    @property
+    def cached_result(self):
+        """ True when the last call of this thread was answered from the cache """
+        return getattr(self._local, 'cached_result', False)
+
+    @cached_result.setter
+    def cached_result(self, value):
+        self._local.cached_result = value
+
+    def add_observer(self, observer):
+        """ Notify observer of each phase of every call
+            :param observer: sensetdp.hooks.Observer
+        """
+        # copy on write, calls in flight keep iterating the previous list
+        self.observers = self.observers + [observer]
+
+    def remove_observer(self, observer):
+        self.observers = [o for o in self.observers if o is not observer]
+
+    @property
+    def retry_stats(self):
+        """ Retry counters and time spent waiting to retry, of every call
+            :rtype: sensetdp.retry.RetryStats
+        """
+        return self.retry_policy.stats
+
+    def close(self):
+        """ Close all pooled connections """
+        self.session.close()
+
+    def execute(self, method):
+        """ Run a bound method call built by bind_api, returning its result
+            :param method: binder APIMethod instance
+        """
+        return method.execute()
+
     def me(self):
         """ Get the authenticated user """
         return self.get_user(userid=self.auth.get_username())
 
-    @property
+    def get_streams_many(self, ids, max_workers=None, **kwargs):
+        """ Fetch many streams concurrently with get_stream.
+
+            :param ids: stream ids
+            :param max_workers: maximum number of requests in flight, default: pool_maxsize
+            :param kwargs: extra get_stream arguments, e.g. retry_count
+            :rtype: BulkResult of Stream keyed by stream id, failures keyed by id in .errors
+        """
+        return map_concurrently(lambda id: self.get_stream(id=id, **kwargs), ids,
+                                max_workers or self.pool_maxsize, BulkResult())
+
+    def get_observations_many(self, streamids, max_workers=None, **kwargs):
+        """ Fetch observations of many streams concurrently, one get_observations call per stream.
+
+            :param streamids: stream ids
+            :param max_workers: maximum number of requests in flight, default: pool_maxsize
+            :param kwargs: extra get_observations arguments, e.g. start, end, limit
+            :rtype: BulkResult of observations keyed by stream id, failures keyed by id in .errors
+        """
+        return map_concurrently(lambda streamid: self.get_observations(streamid=streamid, **kwargs), streamids,
+                                max_workers or self.pool_maxsize, BulkResult())
+
+    def ingest_observations(self, observations, max_points=10000, max_bytes=4 * 1024 * 1024, max_workers=None,
+                            retry_count=3, retry_delay=1, progress=None, **kwargs):
+        """ Upload the results of many streams in concurrent, size bounded chunks, see sensetdp.ingest.BulkIngest.
+
+            :param observations: {streamid: Observation, ObservationSeries or list of results}
+            :param max_points: maximum number of results per request
+            :param max_bytes: approximate maximum JSON body size per request
+            :param max_workers: maximum number of chunks in flight, default: pool_maxsize
+            :param retry_count: number of times a chunk failing with a retryable error is sent again
+            :param retry_delay: seconds before the first retry, doubled on every further retry
+            :param progress: callable(chunk_result, stats) called as each chunk completes
+            :param kwargs: extra create_observations arguments
+            :rtype: sensetdp.ingest.IngestReport
+        """
+        return BulkIngest(self, max_points=max_points, max_bytes=max_bytes, max_workers=max_workers,
+                          retry_count=retry_count, retry_delay=retry_delay, progress=progress,
+                          **kwargs).run(observations)
+
+    def upload_dataframe(self, dataframe, max_points=10000, max_bytes=4 * 1024 * 1024, **kwargs):
+        """ Upload a DataFrame with a column per stream id (see Observation.results_from_dataframe),
+            sending each column to create_observations in chunks of {'t': t, 'v': {'v': value}}.
+
+            :param dataframe: pandas DataFrame with a DatetimeIndex
+            :param max_points: maximum number of results per request
+            :param max_bytes: approximate maximum JSON body size per request
+            :param kwargs: extra create_observations arguments, e.g. retry_count
+            :rtype: dict of the create_observations responses per stream id
+        """
+        responses = {}
+        for streamid, results in Observation.results_from_dataframe(dataframe).items():
+            responses[streamid] = [self.create_observations(streamid=streamid, results=chunk, **kwargs)
+                                   for chunk in chunk_results(results, max_points, max_bytes)]
+        return responses
+
+    @memoized_property
     def get_user(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/get_users_userid
             :allowed_param: 'userid'
@@ -98,7 +271,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def platforms(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/put_platforms_id
         """
@@ -110,7 +283,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def create_platform(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/put_platforms_id
             :allowed_param: 'id', 'name', 'organisationid', 'groupids', 'streamids', 'deployments'
@@ -132,7 +305,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def update_platform(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/put_platforms_id
             :allowed_param: 'id', 'name', 'organisationid', 'groupids', 'streamids', 'deployments',
@@ -154,7 +327,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def destroy_platform(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/delete_platforms_id
             :allowed_param: 'id', 'cascade'
@@ -171,7 +344,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def streams(self):
         """ :reference: https://data.sense-t.org.au/api-docs/#!/default/get_streams
             :allowed_param: 'id,limit'
@@ -200,7 +373,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def get_stream(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/get_streams_id
             :allowed_param: 'id'
@@ -214,7 +387,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def create_stream(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/put_streams_id
             :allowed_param: 'id', 'resulttype', 'organisationid', 'groupids', 'procedureid', 'samplePeriod',
@@ -240,11 +413,11 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def update_stream(self):
         return self.create_stream
 
-    @property
+    @memoized_property
     def destroy_stream(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/delete_streams_id
             :allowed_param: 'id', 'cascade'
@@ -263,7 +436,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def create_location(self):
         """ :reference:
         https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/put_location_id
@@ -285,7 +458,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def get_location(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/get_location_id
             :allowed_param: 'id'
@@ -299,7 +472,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def create_observations(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/post_observations
             :allowed_param: 'streamid', 'results'
@@ -320,7 +493,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def get_observations(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/get_observations
             :allowed_param: 'streamid', 'start', 'end', 'time', 'si', 'ei',
@@ -349,7 +522,7 @@ class API(object):
         )
 
 
-    @property
+    @memoized_property
     def destroy_observations(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/delete_observations
             :allowed_param: 'streamid'
@@ -365,7 +538,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def create_group(self):
         """ :reference:
         https://sensor-cloud.io/api-docs/#!/default/put_groups_id
@@ -387,7 +560,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def get_groups(self):
         """ :reference: https://sensor-cloud.io/api-docs/#!/default/get_groups
             :allowed_param: 'id', 'organisationid', 'groupids', 'limit', 'skip', 'expand', 'recursive'
@@ -413,7 +586,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def destroy_group(self):
         """ :reference: https://data.sense-t.org.au/api/sensor/v2/api-docs/#!/default/delete_group
             :allowed_param: 'id', 'cascade'
@@ -430,7 +603,7 @@ class API(object):
             require_auth=True,
         )
 
-    @property
+    @memoized_property
     def get_group(self):
         """ :reference: https://sensor-cloud.io/api-docs/#!/default/get_group
             :allowed_param: 'id', 'recursive'
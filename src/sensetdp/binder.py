@@ -24,35 +24,60 @@ THE SOFTWARE.
 
 from __future__ import print_function
 
+import json
 import time
 import re
 from collections import OrderedDict
 
 import six
-import requests
 import logging
 
-from sensetdp.error import SenseTError, RateLimitError, is_rate_limit_error_message
-from sensetdp.utils import convert_to_utf8_str
-from sensetdp.models import Model
+from sensetdp.error import SenseTError, RateLimitError, DeadlineExceededError, is_rate_limit_error_message
+from sensetdp.utils import convert_to_utf8_str, SenseTEncoder
+from sensetdp.models import Model, Observation, ObservationSeries
+from sensetdp.serializers import observation_state, dumps_observation_results, dumps_results, join_results
+from sensetdp.hooks import Event, notify, clock, body_size, response_size
 
 if six.PY2:
-    from urllib import quote
+    from urllib import quote, urlencode
 else:
-    from urllib.parse import quote
+    from urllib.parse import quote, urlencode
 
 
-re_path_template = re.compile('{\w+}')
+re_path_template = re.compile(r'{\w+}')
 
 log = logging.getLogger('senset.binder')
 
 
+def compile_path(path):
+    """
+    Pre-parse a path template once so building a request path is a single join.
+
+    :param path: path template, e.g. '/streams/{id}'
+    :return: tuple of (literal segments, variable names), e.g. (['/streams/', ''], ['id'])
+    """
+    literals = re_path_template.split(path)
+    names = [variable.strip('{}') for variable in re_path_template.findall(path)]
+    return literals, names
+
+
+def split_timeout(timeout):
+    """(connect, read) of a timeout given as a number for both or a (connect, read) tuple."""
+    if isinstance(timeout, (tuple, list)):
+        return tuple(timeout)
+    return timeout, timeout
+
+
 def bind_api(**config):
 
+    path_literals, path_variables = compile_path(config['path'])
+
     class APIMethod(object):
 
         api = config['api']
         path = config['path']
+        # endpoint name, e.g. 'GET /streams/{id}'
+        endpoint = '%s %s' % (config.get('method', 'GET'), config['path'])
         action = config.get('action', None)
         payload_type = config.get('payload_type', None)
         payload_list = config.get('payload_list', False)
@@ -61,12 +86,11 @@ def bind_api(**config):
         method = config.get('method', 'GET')
         require_auth = config.get('require_auth', False)
         use_cache = config.get('use_cache', True)
-        session = requests.Session()
 
         def __init__(self, args, kwargs):
             api = self.api
             self.api_root = api.api_root
-            self.session.verify = api.verify
+            self.session = api.session
 
             # If authentication is required and no credentials
             # are provided, throw an error.
@@ -88,8 +112,12 @@ def bind_api(**config):
                                                  api.wait_on_rate_limit)
             self.wait_on_rate_limit_notify = kwargs.pop('wait_on_rate_limit_notify',
                                                         api.wait_on_rate_limit_notify)
+            self.retry_policy = kwargs.pop('retry_policy', api.retry_policy)
+            self.timeout = kwargs.pop('timeout', None)
+            self.deadline = kwargs.pop('deadline', api.deadline)
             self.parser = kwargs.pop('parser', api.parser)
-            self.session.headers = kwargs.pop('headers', {})
+            # a copy, conditional and content headers are set per request
+            self.headers = dict(kwargs.pop('headers', None) or {})
 
             self.build_data(args, kwargs)
             self.build_query_params(kwargs)
@@ -97,7 +125,14 @@ def bind_api(**config):
             # Perform any path variable substitution
             self.build_path()
 
+            if not self.use_json:
+                # without a json body the remaining parameters go in the query string
+                for k, v in self.params.items():
+                    if self.query_params.get(k) is None:
+                        self.query_params[k] = v
+
             self.host = api.host
+            self.scheme = api.scheme
 
             # TODO: test and remove below.
             # Manually set Host header to fix an issue in python 2.5
@@ -106,12 +141,17 @@ def bind_api(**config):
             # See Issue https://github.com/tweepy/tweepy/issues/12
             # self.session.headers['Host'] = self.host
 
-            # Monitoring rate limits
-            self._remaining_calls = None
-            self._reset_time = None
+            # Rate limits are tracked by the api, shared by all its calls
+            self.rate_limiter = api.rate_limiter
 
         def build_data(self, args, kwargs):
-            if len(args) == 1 and isinstance(args[0], Model):
+            # observation whose results build_body encodes straight to JSON
+            self.observation = None
+            if len(args) == 1 and isinstance(args[0], (Observation, ObservationSeries)) and self.sends_results:
+                self.observation = args[0]
+                kwargs.update(observation_state(args[0], self.action))
+                args = list()
+            elif len(args) == 1 and isinstance(args[0], Model):
                 # explode model.to_state() of model instance into kwargs, clear args
                 kwargs.update(args[0].to_state(self.action))
                 args = list()
@@ -126,21 +166,28 @@ def bind_api(**config):
             if self.use_json:
                 self.json_data = dict([(k, v) for k, v in kwargs.items() if k not in self.query_only_param])
 
-            self.session.params = OrderedDict()
+            self.params = OrderedDict()
             for idx, arg in enumerate(args):
                 if arg is None:
                     continue
                 try:
-                    self.session.params[self.allowed_param[idx]] = convert_to_utf8_str(arg)
+                    self.params[self.allowed_param[idx]] = arg
                 except IndexError:
                     raise SenseTError('Too many parameters supplied!')
 
             for k, arg in kwargs.items():
                 if arg is None:
                     continue
-                if k in self.session.params:
+                if k in self.params:
                     raise SenseTError('Multiple values for parameter %s supplied!' % k)
-                self.session.params[k] = convert_to_utf8_str(arg)
+                # values are only stringified when substituted into the path, large
+                # json bodies (e.g. observation results) are never converted.
+                self.params[k] = arg
+
+        @property
+        def sends_results(self):
+            """True when observation results are part of the json body."""
+            return self.use_json and 'results' in self.allowed_param and 'results' not in self.query_only_param
 
         def build_query_params(self, kwargs):
             for param in self.query_only_param:
@@ -150,130 +197,250 @@ def bind_api(**config):
                     raise SenseTError("A required API.bind() method query_param was missing from the kwargs.")
 
         def build_path(self):
-            for variable in re_path_template.findall(self.path):
-                name = variable.strip('{}')
-
-                if name == 'user' and 'user' not in self.session.params and self.api.auth:
+            parts = [path_literals[0]]
+            for name, literal in zip(path_variables, path_literals[1:]):
+                if name == 'user' and 'user' not in self.params and self.api.auth:
                     # No 'user' parameter provided, fetch it from Auth instead.
                     value = self.api.auth.get_username()
                 else:
                     try:
-                        value = quote(self.session.params[name])
+                        value = quote(convert_to_utf8_str(self.params[name]))
                     except KeyError:
                         raise SenseTError('No parameter value found for path variable: %s' % name)
-                    del self.session.params[name]
+                    del self.params[name]
 
-                self.path = self.path.replace(variable, value)
+                parts.append(value)
+                parts.append(literal)
+            self.path = ''.join(parts)
 
             log.info("PATH: %r", self.path)
 
-        def execute(self):
-            self.api.cached_result = False
-
-            # Build the request URL
-            url = self.api_root + self.path
-            full_url = 'https://' + self.host + url
+        def cache_key(self):
+            """
+            Key of this request in api.cache: the full URL including the query
+            string, plus the json body when one is sent with the GET.
+            """
+            key = self.scheme + '://' + self.host + self.api_root + self.path
+            query = [(k, v) for k, v in sorted(self.query_params.items()) if v is not None]
+            if query:
+                key += '?' + urlencode(query, doseq=True)
+            if self.use_json and self.json_data:
+                key += '#' + json.dumps(self.json_data, sort_keys=True, cls=SenseTEncoder)
+            return key
+
+        def restore_cached(self, cache_result):
+            """Prepare a result served from api.cache to be returned to the caller."""
+            if getattr(self.api.cache, 'raw', False):
+                # raw payload caches hold the response body, parse it again
+                cache_result = self.parser.parse(self, cache_result)
+            # must restore api reference
+            if isinstance(cache_result, list):
+                for result in cache_result:
+                    if isinstance(result, Model):
+                        result._api = self.api
+            else:
+                if isinstance(cache_result, Model):
+                    cache_result._api = self.api
+            self.api.cached_result = True
+            self.cached = True
+            return cache_result
+
+        @staticmethod
+        def response_validators(resp):
+            """ETag and Last-Modified headers of a response, used to revalidate cache entries."""
+            validators = {}
+            for header in ('ETag', 'Last-Modified'):
+                value = resp.headers.get(header)
+                if value:
+                    validators[header] = value
+            return validators
+
+        def lookup_cache(self):
+            """
+            Look this request up in api.cache.
+
+            :return: the cached result, or None on a miss. On a miss with an
+                expired but revalidatable entry, conditional request headers are set.
+            """
+            self.cacheable = bool(self.use_cache and self.api.cache and self.method == 'GET')
+            if self.parser.stream and not getattr(self.api.cache, 'raw', False):
+                # a parsed entry is not what a streaming parser returns, raw payloads are re-parsed
+                self.cacheable = False
+            self.revalidate = self.cacheable and getattr(self.api.cache, 'revalidate', False)
+            self.stale = None
+            if not self.cacheable:
+                return None
+
+            self.cache_id = self.cache_key()
+            cache_result = self.api.cache.get(self.cache_id)
+            # if cache result found and not expired, return it
+            if cache_result:
+                return self.restore_cached(cache_result)
+
+            # if an expired entry is still around, ask the server whether it changed
+            if self.revalidate:
+                self.stale = self.api.cache.get_stale(self.cache_id)
+                if self.stale:
+                    validators = self.stale[1]
+                    if 'ETag' in validators:
+                        self.headers['If-None-Match'] = validators['ETag']
+                    if 'Last-Modified' in validators:
+                        self.headers['If-Modified-Since'] = validators['Last-Modified']
+            return None
+
+        def rate_limit_delay(self):
+            """Seconds to wait before the next attempt, pacing calls to the shared rate limit."""
+            if not (self.wait_on_rate_limit or self.rate_limiter.rate):
+                return 0
+            sleep_time, exhausted = self.rate_limiter.reserve()
+            if exhausted and self.wait_on_rate_limit_notify:
+                print("Rate limit reached. Sleeping for:", int(sleep_time))
+            return sleep_time
+
+        def update_rate_limit(self, resp):
+            self.rate_limiter.update(resp.headers, resp.status_code)
+
+        def check_response(self, resp, retries=0):
+            """
+            Decide what the retry loop does with a response.
+
+            :param resp: response, anything with status_code and headers
+            :param retries: number of retries performed so far
+            :return: tuple of (action, delay), action being 'done' to stop, 'wait'
+                to try again after the rate limit wait without counting a retry,
+                or 'retry' to try again after delay seconds.
+            """
+            self.update_rate_limit(resp)
+            self.record_circuit(response=resp)
+            if self.wait_on_rate_limit and (resp.status_code == 429 or resp.status_code == 420) and \
+                    self.rate_limiter.exhausted():
+                # ran out of calls, try again once the budget is reset without counting a retry
+                return 'wait', 0
+            retry_delay = self.retry_policy.retry_delay(self, retries, response=resp)
+            if retry_delay is None:
+                return 'done', 0
+            return 'retry', retry_delay
+
+        def check_error(self, error, retries=0):
+            """
+            Decide what the retry loop does when sending a request raised error.
+
+            :return: seconds to wait before trying again
+            :raise SenseTError: when the request is not retried
+            """
+            self.record_circuit(error=error)
+            retry_delay = self.retry_policy.retry_delay(self, retries, error=error)
+            if retry_delay is None:
+                raise SenseTError('Failed to send request: %s' % error, cause=error)
+            log.info('Retrying %s %s in %.2fs: %s', self.method, self.path, retry_delay, error)
+            return retry_delay
+
+        def deadline_remaining(self):
+            """Seconds left of the call's total deadline, None without one."""
+            if not self.deadline:
+                return None
+            return self.started + self.deadline - clock()
+
+        def within_deadline(self, delay=0):
+            """True when waiting delay seconds still leaves time for an attempt before the deadline."""
+            remaining = self.deadline_remaining()
+            return remaining is None or delay < remaining
+
+        def check_deadline(self, delay=0):
+            """:raise DeadlineExceededError: when waiting delay seconds would reach the deadline"""
+            if not self.within_deadline(delay):
+                raise DeadlineExceededError('Deadline of %ss exceeded for %s' % (self.deadline, self.endpoint))
+
+        def request_timeout(self):
+            """
+            (connect, read) timeouts of the next attempt: the timeout given to the
+            call, else the api's timeout profile of this endpoint, else the api's
+            connect and read timeouts, none longer than what is left of the deadline.
+            A number is both timeouts, None is no timeout.
+            """
+            timeout = self.timeout
+            if timeout is None:
+                timeout = self.api.timeouts.get(self.endpoint)
+            connect, read = split_timeout(self.api.timeout if timeout is None else timeout)
+            if timeout is None:
+                if self.api.connect_timeout is not None:
+                    connect = self.api.connect_timeout
+                if self.api.read_timeout is not None:
+                    read = self.api.read_timeout
+
+            remaining = self.deadline_remaining()
+            if remaining is not None:
+                connect = remaining if connect is None else min(connect, remaining)
+                read = remaining if read is None else min(read, remaining)
+            return connect, read
+
+        def acquire_circuit(self):
+            """Fail fast with CircuitOpenError while the api's circuit breaker is open for this endpoint."""
+            if self.api.circuit_breaker is not None:
+                self.api.circuit_breaker.acquire(self.host, self.endpoint)
+                self.circuit_acquired = True
+
+        def record_circuit(self, response=None, error=None):
+            if self.api.circuit_breaker is not None:
+                self.circuit_acquired = False
+                self.api.circuit_breaker.record(self.host, self.endpoint, response, error)
+
+        def release_circuit(self):
+            """Give back the circuit acquired by an attempt that ended without a recorded outcome."""
+            if self.circuit_acquired:
+                self.circuit_acquired = False
+                self.api.circuit_breaker.release(self.host, self.endpoint)
+
+        def build_body(self):
+            """
+            Request body, encoded once for all attempts: the json_data encoded with
+            api.json_backend, or post_data when the method does not use json.
+            Observation results are encoded with sensetdp.serializers instead,
+            without building a state dict per result.
+            """
+            if not self.use_json:
+                return self.post_data
+            try:
+                results = None
+                if self.observation is not None:
+                    results = dumps_observation_results(self.observation, self.action, allow_nan=False)
+                elif self.sends_results and isinstance(self.json_data.get('results'), list):
+                    results = dumps_results(self.json_data['results'], self.action, allow_nan=False)
+                if results is None:
+                    body = self.api.json_backend.dumps(self.json_data)
+                else:
+                    data = dict((k, v) for k, v in self.json_data.items() if k != 'results')
+                    body = join_results(self.api.json_backend.dumps(data), results)
+            except Exception as e:
+                raise SenseTError('Failed to encode request body: %s' % e)
+            self.headers['Content-Type'] = 'application/json'
+            return body
+
+        def build_auth(self):
+            # Apply authentication
+            auth = None
+            if self.api.auth:
+                auth = self.api.auth.apply_auth()
+
+            # Request compression if configured
+            if self.api.compression:
+                self.headers['Accept-encoding'] = 'gzip'
+            return auth
+
+        def handle_response(self, resp):
+            """
+            Turn the final response of the retry loop into the call result.
+
+            :param resp: response, anything with status_code, headers and text
+            """
+            self.api.last_response = resp
 
-            # Query the cache if one is available
-            # and this request uses a GET method.
-            if self.use_cache and self.api.cache and self.method == 'GET':
-                cache_result = self.api.cache.get(url)
-                # if cache result found and not expired, return it
-                if cache_result:
-                    # must restore api reference
-                    if isinstance(cache_result, list):
-                        for result in cache_result:
-                            if isinstance(result, Model):
-                                result._api = self.api
-                    else:
-                        if isinstance(cache_result, Model):
-                            cache_result._api = self.api
-                    self.api.cached_result = True
-                    return cache_result
+            # Not modified, the stale cache entry is current again
+            if resp.status_code == 304 and self.stale:
+                cache_result = self.api.cache.refresh(self.cache_id, self.response_validators(resp))
+                return self.restore_cached(cache_result if cache_result is not None else self.stale[0])
 
-            # Continue attempting request until successful
-            # or maximum number of retries is reached.
-            retries_performed = 0
-            while retries_performed < self.retry_count + 1:
-                # handle running out of api calls
-                if self.wait_on_rate_limit:
-                    if self._reset_time is not None:
-                        if self._remaining_calls is not None:
-                            if self._remaining_calls < 1:
-                                sleep_time = self._reset_time - int(time.time())
-                                if sleep_time > 0:
-                                    if self.wait_on_rate_limit_notify:
-                                        print("Rate limit reached. Sleeping for:", sleep_time)
-                                    time.sleep(sleep_time + 5)  # sleep for few extra sec
-
-                # if self.wait_on_rate_limit and self._reset_time is not None and \
-                #                 self._remaining_calls is not None and self._remaining_calls < 1:
-                #     sleep_time = self._reset_time - int(time.time())
-                #     if sleep_time > 0:
-                #         if self.wait_on_rate_limit_notify:
-                #             print("Rate limit reached. Sleeping for: " + str(sleep_time))
-                #         time.sleep(sleep_time + 5)  # sleep for few extra sec
-
-                # Apply authentication
-                if self.api.auth:
-                    auth = self.api.auth.apply_auth()
-
-                # Request compression if configured
-                if self.api.compression:
-                    self.session.headers['Accept-encoding'] = 'gzip'
-
-                # Execute request
-                try:
-                    if self.use_json:
-                        self.session.params = OrderedDict()
-                        resp = self.session.request(self.method,
-                                                    full_url,
-                                                    json=self.json_data,
-                                                    params=self.query_params,
-                                                    timeout=self.api.timeout,
-                                                    auth=auth,
-                                                    proxies=self.api.proxy)
-                    else:
-                        resp = self.session.request(self.method,
-                                                    full_url,
-                                                    data=self.post_data,
-                                                    params=self.query_params,
-                                                    timeout=self.api.timeout,
-                                                    auth=auth,
-                                                    proxies=self.api.proxy)
-                except Exception as e:
-                    raise SenseTError('Failed to send request: %s' % e)
-                rem_calls = resp.headers.get('x-rate-limit-remaining')
-                if rem_calls is not None:
-                    self._remaining_calls = int(rem_calls)
-                elif isinstance(self._remaining_calls, int):
-                    self._remaining_calls -= 1
-                reset_time = resp.headers.get('x-rate-limit-reset')
-                if reset_time is not None:
-                    self._reset_time = int(reset_time)
-                if self.wait_on_rate_limit and self._remaining_calls == 0 and (
-                        # if ran out of calls before waiting switching retry last call
-                                resp.status_code == 429 or resp.status_code == 420):
-                    continue
-                retry_delay = self.retry_delay
-                # Exit request loop if non-retry error code
-                if resp.status_code == 200:
-                    break
-                elif (resp.status_code == 429 or resp.status_code == 420) and self.wait_on_rate_limit:
-                    if 'retry-after' in resp.headers:
-                        retry_delay = float(resp.headers['retry-after'])
-                elif self.retry_errors and resp.status_code not in self.retry_errors:
-                    break
-
-                retries_performed += 1
-
-                # Sleep before retrying request again
-                if retries_performed < self.retry_count + 1:  # Only sleep when not on the last retry
-                    time.sleep(retry_delay)
-            
-            
             # If an error was returned, throw an exception
-            self.api.last_response = resp
             if resp.status_code and not 200 <= resp.status_code < 300:
                 try:
                     error_msg, api_error_code = \
@@ -287,21 +454,169 @@ def bind_api(**config):
                 else:
                     raise SenseTError(error_msg, resp, api_code=api_error_code)
 
+            # Streaming parsers consume the body themselves, results can't be cached
+            if self.parser.stream:
+                started = clock()
+                result = self.parser.parse_stream(self, resp)
+                self.emit('parse', clock() - started, stream=True)
+                return result
+
             # Parse the response payload
-            result = self.parser.parse(self, resp.text)
+            payload = resp.text
+            started = clock()
+            result = self.parser.parse(self, payload)
+            self.emit('parse', clock() - started, stream=False)
 
             # Store result into cache if one is available.
-            if self.use_cache and self.api.cache and self.method == 'GET' and result:
-                self.api.cache.store(url, result)
+            if self.cacheable and result:
+                value = payload if getattr(self.api.cache, 'raw', False) else result
+                validators = self.response_validators(resp) if self.revalidate else None
+                if validators:
+                    self.api.cache.store(self.cache_id, value, validators=validators)
+                else:
+                    self.api.cache.store(self.cache_id, value)
 
             return result
 
+        @property
+        def observed(self):
+            return bool(self.api.observers)
+
+        def emit(self, phase, elapsed=0, **fields):
+            """Notify the api observers of a phase of this call, see sensetdp.hooks.Event."""
+            if self.api.observers:
+                notify(self.api.observers, Event(phase, self, elapsed, **fields))
+
+        def begin(self):
+            """Start of the call, before the cache lookup."""
+            self.api.cached_result = False
+            self.cached = False
+            self.started = clock()
+            self.retries = 0
+            self.circuit_acquired = False
+            self.status_code = None
+            self.bytes_sent = self.bytes_received = 0
+
+        def lookup_cache_observed(self):
+            started = clock()
+            cache_result = self.lookup_cache()
+            if self.cacheable:
+                self.emit('cache', clock() - started, hit=cache_result is not None)
+            return cache_result
+
+        def build_body_observed(self):
+            started = clock()
+            body = self.build_body()
+            if self.observed:
+                self.bytes_sent = body_size(body)
+                self.emit('build', clock() - started, bytes=self.bytes_sent)
+            return body
+
+        def sent(self, started, resp=None, error=None):
+            """Record an attempt sent at started, with its response or the error raised sending it."""
+            if not self.observed:
+                return
+            if error is not None:
+                self.emit('receive', clock() - started, attempt=self.retries, error=error)
+                return
+            self.status_code = resp.status_code
+            self.bytes_received = response_size(resp, self.parser.stream)
+            self.emit('receive', clock() - started, attempt=self.retries,
+                      status_code=resp.status_code, bytes=self.bytes_received)
+
+        def retrying(self, delay, resp=None, error=None):
+            self.retries += 1
+            self.emit('retry', attempt=self.retries, delay=delay,
+                      status_code=resp.status_code if resp is not None else None, error=error)
+
+        def complete(self, error=None):
+            self.emit('complete', clock() - self.started, status_code=self.status_code, retries=self.retries,
+                      cached=self.cached, bytes_sent=self.bytes_sent, bytes_received=self.bytes_received,
+                      error=error)
+
+        def execute(self):
+            self.begin()
+            try:
+                result = self.send()
+            except Exception as e:
+                self.complete(e)
+                raise
+            self.complete()
+            return result
+
+        def send(self):
+            # Build the request URL
+            url = self.api_root + self.path
+            full_url = self.scheme + '://' + self.host + url
+
+            # Query the cache if one is available
+            # and this request uses a GET method.
+            cache_result = self.lookup_cache_observed()
+            if cache_result is not None:
+                return cache_result
+
+            body = self.build_body_observed()
+
+            # Continue attempting request until successful
+            # or the retry policy gives up.
+            self.retry_policy.record_request()
+            # a probe of a half open circuit is given back when the attempt ends
+            # without an outcome, e.g. build_auth() raised
+            try:
+                while True:
+                    # handle running out of api calls
+                    sleep_time = self.rate_limit_delay()
+                    self.check_deadline(sleep_time)
+                    if sleep_time:
+                        time.sleep(sleep_time)
+
+                    self.acquire_circuit()
+                    auth = self.build_auth()
+
+                    # Execute request
+                    self.emit('send', attempt=self.retries)
+                    started = clock()
+                    try:
+                        resp = self.session.request(self.method,
+                                                    full_url,
+                                                    data=body,
+                                                    params=self.query_params,
+                                                    headers=self.headers,
+                                                    timeout=self.request_timeout(),
+                                                    auth=auth,
+                                                    proxies=self.api.proxy,
+                                                    verify=self.api.verify,
+                                                    stream=self.parser.stream)
+                    except Exception as e:
+                        self.sent(started, error=e)
+                        retry_delay = self.check_error(e, self.retries)
+                        self.retrying(retry_delay, error=e)
+                        time.sleep(retry_delay)
+                        continue
+                    self.sent(started, resp)
+
+                    action, retry_delay = self.check_response(resp, self.retries)
+                    if action == 'done':
+                        break
+                    elif action == 'wait':
+                        resp.close()  # hand the connection back to the pool
+                        continue
+
+                    # Sleep before retrying request again
+                    self.retrying(retry_delay, resp)
+                    resp.close()
+                    time.sleep(retry_delay)
+            finally:
+                self.release_circuit()
+
+            return self.handle_response(resp)
+
     def _call(*args, **kwargs):
         method = APIMethod(args, kwargs)
         if kwargs.get('create'):
             return method
         else:
-            return method.execute()
+            return method.api.execute(method)
 
     # Set pagination mode
     if 'cursor' in APIMethod.allowed_param:
@@ -311,5 +626,7 @@ def bind_api(**config):
             _call.pagination_mode = 'id'
     elif 'page' in APIMethod.allowed_param:
         _call.pagination_mode = 'page'
+    elif 'skip' in APIMethod.query_only_param:
+        _call.pagination_mode = 'skip'
 
     return _call
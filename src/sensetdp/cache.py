@@ -0,0 +1,396 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+Copyright (c) 2009-2014 Joshua Roesslein
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import six
+
+
+class Cache(object):
+    """Cache interface"""
+
+    # True when the cache stores the raw response payload instead of the parsed
+    # result, the binder then parses the payload again on a cache hit.
+    raw = False
+
+    # True when the cache keeps expired entries along with their ETag and
+    # Last-Modified validators, so the binder can revalidate them with a
+    # conditional GET instead of downloading the payload again.
+    revalidate = False
+
+    def __init__(self, timeout=60):
+        """Initialize the cache
+            timeout: number of seconds to keep a cached entry
+        """
+        self.timeout = timeout
+
+    def store(self, key, value):
+        """Add new record to cache
+            key: entry key
+            value: data of entry
+        """
+        raise NotImplementedError
+
+    def get(self, key, timeout=None):
+        """Get cached entry if exists and not expired
+            key: which entry to get
+            timeout: override timeout with this value [optional]
+        """
+        raise NotImplementedError
+
+    def get_stale(self, key):
+        """Get an entry regardless of expiry, for revalidation
+            key: which entry to get
+            returns (value, validators) or None if there is nothing to revalidate
+        """
+        return None
+
+    def refresh(self, key, validators=None):
+        """Restart the timeout of an entry that the server confirmed unchanged
+            key: which entry to refresh
+            validators: new response validators [optional]
+            returns the entry value, or None if it is gone
+        """
+        raise NotImplementedError
+
+    def count(self):
+        """Get count of entries currently stored in cache"""
+        raise NotImplementedError
+
+    def cleanup(self):
+        """Delete any expired entries in cache."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Delete all cached entries"""
+        raise NotImplementedError
+
+
+def estimate_size(obj, _seen=None):
+    """Rough deep size in bytes of a parsed response (dicts, lists, models)."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (six.text_type, six.binary_type, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += estimate_size(k, _seen) + estimate_size(v, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_size(item, _seen)
+    elif hasattr(obj, '__dict__'):
+        # models hold a reference to the api, which is not part of the entry
+        size += sum(estimate_size(v, _seen) for k, v in vars(obj).items() if k != '_api')
+    return size
+
+
+class MemoryCache(Cache):
+    """
+    Thread safe in-memory cache with LRU eviction.
+
+    Bounded by entry count (max_entries) and/or an estimated byte budget
+    (max_bytes); entries expire after the cache timeout, or the timeout given
+    when the entry was stored. Expired entries with validators are kept until
+    evicted so they can be revalidated.
+    """
+
+    revalidate = True
+
+    def __init__(self, timeout=60, max_entries=None, max_bytes=None, sizeof=estimate_size):
+        Cache.__init__(self, timeout)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.size = 0
+        self._entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # pickle
+        return {'entries': list(self._entries.items()), 'timeout': self.timeout,
+                'max_entries': self.max_entries, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        # unpickle
+        self.lock = threading.Lock()
+        self.timeout = state['timeout']
+        self.max_entries = state['max_entries']
+        self.max_bytes = state['max_bytes']
+        self.sizeof = estimate_size
+        self._entries = OrderedDict(state['entries'])
+        self.size = sum(entry[3] for entry in self._entries.values())
+
+    def _is_expired(self, entry, timeout):
+        created, ttl = entry[0], entry[1]
+        if timeout is None:
+            timeout = ttl
+        return timeout > 0 and (time.time() - created) >= timeout
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.size -= entry[3]
+
+    def store(self, key, value, timeout=None, validators=None):
+        """Add new record to cache
+            key: entry key
+            value: data of entry
+            timeout: seconds to keep this entry, defaults to the cache timeout [optional]
+            validators: dict of ETag/Last-Modified response headers [optional]
+        """
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self._entries:
+                self._remove(key)
+            ttl = self.timeout if timeout is None else timeout
+            self._entries[key] = (time.time(), ttl, value, size, validators)
+            self.size += size
+
+            # evict least recently used entries until within budget
+            while self._entries and (
+                    (self.max_entries and len(self._entries) > self.max_entries) or
+                    (self.max_bytes and self.size > self.max_bytes)):
+                self._remove(next(iter(self._entries)))
+
+    def get(self, key, timeout=None):
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if self._is_expired(entry, timeout):
+                if not entry[4]:
+                    self._remove(key)
+                return None
+
+            # mark as most recently used
+            del self._entries[key]
+            self._entries[key] = entry
+            return entry[2]
+
+    def get_stale(self, key):
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry[4]:
+                return None
+            return entry[2], entry[4]
+
+    def refresh(self, key, validators=None):
+        with self.lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            created, ttl, value, size, old_validators = entry
+            self._entries[key] = (time.time(), ttl, value, size, validators or old_validators)
+            return value
+
+    def count(self):
+        return len(self._entries)
+
+    def cleanup(self):
+        with self.lock:
+            for key, entry in list(self._entries.items()):
+                if self._is_expired(entry, None):
+                    self._remove(key)
+
+    def flush(self):
+        with self.lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DiskCache(Cache):
+    """
+    Persistent cache of raw response payloads in a sqlite database.
+
+    Storing the payload (not pickled models) keeps entries valid across code
+    upgrades. The database is opened in WAL mode with a busy timeout, so several
+    processes can share one cache file. Bounded by max_entries and/or max_bytes
+    of payload, evicting the least recently used entries first. Expired entries
+    with validators are kept until evicted so they can be revalidated.
+    """
+
+    raw = True
+    revalidate = True
+    schema_version = 2
+
+    def __init__(self, path, timeout=60, max_entries=None, max_bytes=None, busy_timeout=30):
+        Cache.__init__(self, timeout)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._init_schema(self._connection())
+
+    def __getstate__(self):
+        # pickle
+        return {'path': self.path, 'timeout': self.timeout, 'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes, 'busy_timeout': self.busy_timeout}
+
+    def __setstate__(self, state):
+        # unpickle
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self):
+        # sqlite connections can not be shared between threads, keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self, conn):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != self.schema_version:
+                # entries are only a cache, start over rather than migrating them
+                conn.execute('DROP TABLE IF EXISTS entries')
+                conn.execute(
+                    'CREATE TABLE entries ('
+                    ' key TEXT PRIMARY KEY,'
+                    ' value BLOB,'
+                    ' size INTEGER NOT NULL,'
+                    ' created REAL NOT NULL,'
+                    ' ttl REAL NOT NULL,'
+                    ' accessed REAL NOT NULL,'
+                    ' validators TEXT)'
+                )
+                conn.execute('CREATE INDEX entries_accessed ON entries (accessed)')
+                conn.execute('PRAGMA user_version = %d' % self.schema_version)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _is_expired(self, created, ttl, timeout):
+        if timeout is None:
+            timeout = ttl
+        return timeout > 0 and (time.time() - created) >= timeout
+
+    def _evict(self, conn):
+        if self.max_entries:
+            conn.execute(
+                'DELETE FROM entries WHERE key IN ('
+                ' SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,))
+        if self.max_bytes:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed').fetchall():
+                    conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+
+    def store(self, key, value, timeout=None, validators=None):
+        """Add new record to cache
+            key: entry key
+            value: raw response payload
+            timeout: seconds to keep this entry, defaults to the cache timeout [optional]
+            validators: dict of ETag/Last-Modified response headers [optional]
+        """
+        # bytes, not characters, of the (utf-8 stored) payload
+        size = len(value.encode('utf-8') if isinstance(value, six.text_type) else value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        now = time.time()
+        ttl = self.timeout if timeout is None else timeout
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT OR REPLACE INTO entries (key, value, size, created, ttl, accessed, validators)'
+                         ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (key, value, size, now, ttl, now, json.dumps(validators) if validators else None))
+            self._evict(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self, key, timeout=None):
+        conn = self._connection()
+        row = conn.execute('SELECT value, created, ttl, validators FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        value, created, ttl, validators = row
+        if self._is_expired(created, ttl, timeout):
+            if not validators:
+                conn.execute('DELETE FROM entries WHERE key = ? AND created = ?', (key, created))
+            return None
+
+        conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+        return value
+
+    def get_stale(self, key):
+        row = self._connection().execute('SELECT value, validators FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None or not row[1]:
+            return None
+        return row[0], json.loads(row[1])
+
+    def refresh(self, key, validators=None):
+        now = time.time()
+        conn = self._connection()
+        if validators:
+            conn.execute('UPDATE entries SET created = ?, accessed = ?, validators = ? WHERE key = ?',
+                         (now, now, json.dumps(validators), key))
+        else:
+            conn.execute('UPDATE entries SET created = ?, accessed = ? WHERE key = ?', (now, now, key))
+        row = conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def count(self):
+        return self._connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def cleanup(self):
+        now = time.time()
+        self._connection().execute('DELETE FROM entries WHERE ttl > 0 AND created + ttl <= ?', (now,))
+
+    def flush(self):
+        self._connection().execute('DELETE FROM entries')
@@ -0,0 +1,155 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import time
+import threading
+
+from sensetdp.error import CircuitOpenError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class Circuit(object):
+    """State of one circuit, see CircuitBreaker."""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+        self.trips = 0
+
+    def to_dict(self):
+        return {'state': self.state, 'failures': self.failures, 'trips': self.trips}
+
+
+class CircuitBreaker(object):
+    """
+    Fails calls fast while the portal is down instead of letting each of them
+    wait for a timeout.
+
+    A circuit, per host and endpoint ("GET /streams/{id}") or per host only,
+    opens after failure_threshold consecutive failures: connection errors,
+    timeouts and server errors. While open, calls raise CircuitOpenError without
+    sending anything. After recovery_timeout seconds the circuit half opens
+    and lets up to half_open_probes calls through: it closes again when one
+    succeeds and reopens when one fails.
+
+        api = API(auth, circuit_breaker=CircuitBreaker(failure_threshold=5, recovery_timeout=30))
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30, half_open_probes=1, per_endpoint=True,
+                 clock=time.time):
+        """
+        :param failure_threshold: consecutive failures opening a circuit, default:5
+        :param recovery_timeout: seconds an open circuit fails calls before probing, default:30
+        :param half_open_probes: calls let through at once to probe a half open circuit, default:1
+        :param per_endpoint: track each endpoint of a host separately, default:True
+        :param clock: time source in seconds
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_probes = half_open_probes
+        self.per_endpoint = per_endpoint
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.circuits = {}
+
+    def key(self, host, endpoint):
+        return (host, endpoint) if self.per_endpoint else (host,)
+
+    def _circuit(self, host, endpoint):
+        key = self.key(host, endpoint)
+        circuit = self.circuits.get(key)
+        if circuit is None:
+            circuit = self.circuits[key] = Circuit()
+        return circuit
+
+    def state(self, host, endpoint=None):
+        with self.lock:
+            circuit = self.circuits.get(self.key(host, endpoint))
+            return circuit.state if circuit is not None else CLOSED
+
+    def acquire(self, host, endpoint):
+        """
+        Called before sending a request.
+        :raise CircuitOpenError: when the circuit is open, or half open with all probes in flight
+        """
+        with self.lock:
+            circuit = self._circuit(host, endpoint)
+            if circuit.state == CLOSED:
+                return
+            now = self.clock()
+            if circuit.state == OPEN:
+                retry_after = circuit.opened_at + self.recovery_timeout - now
+                if retry_after > 0:
+                    raise CircuitOpenError(host, endpoint, retry_after)
+                circuit.state = HALF_OPEN
+                circuit.probes = 0
+            if circuit.probes >= self.half_open_probes:
+                raise CircuitOpenError(host, endpoint, 0)
+            circuit.probes += 1
+
+    def release(self, host, endpoint):
+        """
+        Called instead of record() when a call acquired the circuit but ended
+        without an outcome, e.g. it was cancelled: gives back its half open probe.
+        """
+        with self.lock:
+            circuit = self.circuits.get(self.key(host, endpoint))
+            if circuit is not None and circuit.state == HALF_OPEN and circuit.probes > 0:
+                circuit.probes -= 1
+
+    def is_failure(self, response=None, error=None):
+        if error is not None:
+            return True
+        return response.status_code >= 500 or response.status_code == 408
+
+    def record(self, host, endpoint, response=None, error=None):
+        """Called with the response, or the error raised sending the request."""
+        failed = self.is_failure(response, error)
+        with self.lock:
+            circuit = self._circuit(host, endpoint)
+            if not failed:
+                circuit.state = CLOSED
+                circuit.failures = 0
+                circuit.probes = 0
+                return
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN or circuit.failures >= self.failure_threshold:
+                if circuit.state != OPEN:
+                    circuit.trips += 1
+                circuit.state = OPEN
+                circuit.opened_at = self.clock()
+                circuit.probes = 0
+
+    def reset(self):
+        with self.lock:
+            self.circuits = {}
+
+    def to_dict(self):
+        with self.lock:
+            return dict((' '.join(key), circuit.to_dict()) for key, circuit in self.circuits.items())
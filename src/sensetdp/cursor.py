@@ -0,0 +1,310 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+Copyright (c) 2009-2014 Joshua Roesslein
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from sensetdp.error import SenseTError
+from sensetdp.utils import format_timestamp, parse_timestamp
+
+
+class Cursor(object):
+    """Pagination helper class
+
+        for stream in Cursor(api.streams, expand=True).items():
+            ...
+    """
+
+    def __init__(self, method, *args, **kwargs):
+        if hasattr(method, 'pagination_mode'):
+            if method.pagination_mode == 'skip':
+                self.iterator = SkipIterator(method, args, kwargs)
+            else:
+                raise SenseTError('Unsupported pagination mode: %s' % method.pagination_mode)
+        else:
+            raise SenseTError('This method does not perform pagination')
+
+    def pages(self, limit=0):
+        """Return iterator for pages"""
+        if limit > 0:
+            self.iterator.limit = limit
+        return self.iterator
+
+    def items(self, limit=0):
+        """Return iterator for items in each page"""
+        i = ItemIterator(self.iterator)
+        i.limit = limit
+        return i
+
+
+def page_items(page):
+    """The list of items in a page, for model result sets as well as raw json listings."""
+    if isinstance(page, list):
+        return page
+    if isinstance(page, dict):
+        embedded = page.get('_embedded')
+        if isinstance(embedded, dict):
+            for value in embedded.values():
+                if isinstance(value, list):
+                    return value
+        if isinstance(page.get('results'), list):
+            return page['results']
+    return []
+
+
+class BaseIterator(object):
+
+    def __init__(self, method, args, kwargs):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.limit = 0
+
+    def __next__(self):
+        return self.next()
+
+    def next(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        return self
+
+
+class SkipIterator(BaseIterator):
+    """
+    Walks skip/limit endpoints page by page.
+
+    While a page is being consumed the next one is fetched in the background
+    (prefetch=True), so at most two pages are held in memory at a time.
+    """
+
+    default_page_size = 100
+
+    def __init__(self, method, args, kwargs, prefetch=True):
+        BaseIterator.__init__(self, method, args, dict(kwargs))
+        self.page_size = int(self.kwargs.pop('limit', None) or self.default_page_size)
+        self.skip = int(self.kwargs.pop('skip', None) or 0)
+        self.prefetch = prefetch
+        self.num_pages = 0
+        self._executor = None
+        self._pending = None
+        self._done = False
+
+    def _fetch(self, skip):
+        return self.method(*self.args, skip=skip, limit=self.page_size, **self.kwargs)
+
+    def _request_next(self):
+        skip = self.skip
+        self.skip += self.page_size
+        if not self.prefetch:
+            return skip
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        return self._executor.submit(self._fetch, skip)
+
+    def _result(self, pending):
+        if not self.prefetch:
+            return self._fetch(pending)
+        return pending.result()
+
+    def close(self):
+        """Stop paging, dropping any prefetched page."""
+        self._done = True
+        if self._pending is not None and self.prefetch:
+            self._pending.cancel()
+        self._pending = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def next(self):
+        if self._done or (self.limit > 0 and self.num_pages >= self.limit):
+            self.close()
+            raise StopIteration
+
+        pending = self._pending if self._pending is not None else self._request_next()
+        self._pending = None
+        try:
+            page = self._result(pending)
+        except Exception:
+            self.close()
+            raise
+
+        count = len(page_items(page))
+        if count == 0:
+            self.close()
+            raise StopIteration
+
+        self.num_pages += 1
+        if count < self.page_size or (self.limit > 0 and self.num_pages >= self.limit):
+            # short page, nothing left to fetch
+            self._done = True
+        elif self.prefetch:
+            self._pending = self._request_next()
+        return page
+
+
+class ItemIterator(BaseIterator):
+
+    def __init__(self, page_iterator):
+        self.page_iterator = page_iterator
+        self.limit = 0
+        self.current_page = None
+        self.page_index = -1
+        self.num_items = 0
+
+    def next(self):
+        if self.limit > 0:
+            if self.num_items == self.limit:
+                if hasattr(self.page_iterator, 'close'):
+                    self.page_iterator.close()
+                raise StopIteration
+        while self.current_page is None or self.page_index == len(self.current_page) - 1:
+            # Reached end of current page, get the next page...
+            self.current_page = page_items(self.page_iterator.next())
+            self.page_index = -1
+        self.page_index += 1
+        self.num_items += 1
+        return self.current_page[self.page_index]
+
+
+class ObservationWindowIterator(BaseIterator):
+    """
+    Streams the observations of one stream between start and end, oldest first,
+    by splitting the range into time windows sized to hold about target_rows.
+
+        for result in ObservationWindowIterator(api.get_observations, 'stream_1', start, end):
+            ...
+
+    The next `prefetch` windows are fetched in parallel, results are still yielded
+    strictly in time order. Window sizes adapt to the observed data density; a
+    window that hits the `limit` row cap is continued from its last timestamp.
+    Memory stays bounded by roughly prefetch * limit results whatever the range.
+
+    A failed window is retried up to retry_count times; after that the error is
+    raised, and calling next() again resumes from the last yielded timestamp
+    (also available as `position`).
+    """
+
+    def __init__(self, method, streamid, start, end, target_rows=10000, limit=None,
+                 window=datetime.timedelta(days=1), min_window=datetime.timedelta(seconds=1),
+                 max_window=datetime.timedelta(days=366), prefetch=2, retry_count=2, **kwargs):
+        BaseIterator.__init__(self, method, (), kwargs)
+        self.streamid = streamid
+        self.start = start
+        self.end = end
+        self.target_rows = target_rows
+        self.row_limit = limit or target_rows * 2
+        self.window = window
+        self.min_window = min_window
+        self.max_window = max_window
+        self.prefetch = max(1, prefetch)
+        self.retry_count = retry_count
+        # last yielded timestamp, observations up to and including it are done
+        self.position = None
+        self._scheduled = start
+        self._failures = 0
+        self._windows = deque()
+        self._page = deque()
+        self._executor = None
+
+    def _fetch(self, start, end, start_inclusive):
+        result = self.method(streamid=self.streamid,
+                             start=format_timestamp(start),
+                             end=format_timestamp(end),
+                             si='true' if start_inclusive else 'false',
+                             ei='false',
+                             limit=self.row_limit,
+                             **self.kwargs)
+        return page_items(result)
+
+    def _submit(self, start, end, start_inclusive=True):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.prefetch)
+        return start, end, self._executor.submit(self._fetch, start, end, start_inclusive)
+
+    def _fill(self):
+        while len(self._windows) < self.prefetch and self._scheduled < self.end:
+            end = min(self._scheduled + self.window, self.end)
+            # resuming at the last yielded timestamp, which must not be yielded twice
+            start_inclusive = self._scheduled != self.position
+            self._windows.append(self._submit(self._scheduled, end, start_inclusive))
+            self._scheduled = end
+
+    def _resize(self, start, end, rows):
+        # aim the next windows at target_rows given the density just seen
+        duration = end - start
+        if rows:
+            window = datetime.timedelta(seconds=duration.total_seconds() * self.target_rows / float(rows))
+        else:
+            window = duration * 2
+        self.window = max(self.min_window, min(self.max_window, window))
+
+    def _reset(self):
+        # drop in flight windows and start over from the last yielded timestamp
+        for start, end, future in self._windows:
+            future.cancel()
+        self._windows.clear()
+        self._scheduled = self.position if self.position is not None else self.start
+
+    def close(self):
+        self._reset()
+        self._scheduled = self.end
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def next(self):
+        while not self._page:
+            self._fill()
+            if not self._windows:
+                self.close()
+                raise StopIteration
+
+            start, end, future = self._windows.popleft()
+            try:
+                results = future.result()
+            except Exception:
+                self._failures += 1
+                self._reset()
+                if self._failures > self.retry_count:
+                    self._failures = 0
+                    raise
+                continue
+            self._failures = 0
+
+            if len(results) >= self.row_limit:
+                # window truncated by the row cap, continue it from its last timestamp
+                last = parse_timestamp(results[-1]['t'])
+                self._windows.appendleft(self._submit(last, end, start_inclusive=False))
+            else:
+                self._resize(start, end, len(results))
+
+            self._page.extend(results)
+
+        result = self._page.popleft()
+        self.position = parse_timestamp(result['t'])
+        return result
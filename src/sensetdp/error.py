@@ -30,10 +30,12 @@ import six
 class SenseTError(Exception):
     """SenseT exception"""
 
-    def __init__(self, reason, response=None, api_code=None):
+    def __init__(self, reason, response=None, api_code=None, cause=None):
         self.reason = six.text_type(reason)
         self.response = response
         self.api_code = api_code
+        # the exception raised sending the request, when there was no response
+        self.cause = cause
         Exception.__init__(self, reason)
 
     def __str__(self):
@@ -53,3 +55,18 @@ class RateLimitError(SenseTError):
     # RateLimitError has the exact same properties and inner workings
     # as SenseTError for backwards compatibility reasons.
     pass
+
+
+class CircuitOpenError(SenseTError):
+    """Exception for calls failed fast by an open sensetdp.circuit.CircuitBreaker."""
+
+    def __init__(self, host, endpoint, retry_after):
+        self.host = host
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        SenseTError.__init__(self, 'Circuit open for %s %s, retry in %.1fs' % (host, endpoint, retry_after))
+
+
+class DeadlineExceededError(SenseTError):
+    """Exception for calls that ran out of their total deadline, retries included."""
+    pass
@@ -0,0 +1,193 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+
+log = logging.getLogger('sensetdp.hooks')
+
+# clock of event timings, monotonic where available
+clock = getattr(time, 'perf_counter', time.time)
+
+PHASES = ('cache', 'build', 'send', 'receive', 'retry', 'parse', 'complete')
+
+
+class Event(object):
+    """
+    What happened in one phase of a bound method call:
+
+    - cache: hit
+    - build: bytes (request body size)
+    - send: attempt (0 for the first one)
+    - receive: attempt, status_code, bytes, or error when sending raised
+    - retry: attempt, delay, status_code or error
+    - parse: stream
+    - complete: status_code, retries, cached, bytes_sent, bytes_received, error
+
+    Every event has the endpoint template (e.g. 'GET /streams/{id}'), the
+    APIMethod instance of the call (the same object for all events of a call),
+    and elapsed: seconds the phase took, or since the call started for complete.
+    """
+
+    def __init__(self, phase, method, elapsed=0, **fields):
+        self.phase = phase
+        self.method = method
+        self.endpoint = method.endpoint
+        self.elapsed = elapsed
+        self.__dict__.update(fields)
+
+    def get(self, name, default=None):
+        return self.__dict__.get(name, default)
+
+    def to_dict(self):
+        return dict((k, v) for k, v in self.__dict__.items() if k != 'method')
+
+    def __repr__(self):
+        return 'Event(%s)' % ', '.join('%s=%r' % item for item in sorted(self.to_dict().items()))
+
+
+class Observer(object):
+    """Base of API observers, called with an Event for every phase of every call. Must be thread safe."""
+
+    def on_event(self, event):
+        pass
+
+
+def notify(observers, event):
+    for observer in observers:
+        try:
+            observer.on_event(event)
+        except Exception:
+            # a broken observer must not break the call
+            log.exception('Observer %r failed on %r', observer, event)
+
+
+def percentile(ordered, p):
+    """Nearest rank percentile p (0-100) of a sorted list."""
+    if not ordered:
+        return None
+    rank = int(math.ceil(p / 100.0 * len(ordered))) - 1
+    return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+class EndpointMetrics(object):
+    def __init__(self, max_samples):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.parse_time = 0.0
+        self.latencies = deque(maxlen=max_samples)
+
+    def to_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'cache_hits': self.cache_hits,
+            'retries': self.retries,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'parse_time': self.parse_time,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+        }
+
+
+class MetricsAggregator(Observer):
+    """
+    Observer keeping per endpoint template call counts, errors, cache hits,
+    retries, bytes and parse time, and the p50/p95/p99 latency of the last
+    max_samples calls:
+
+        metrics = MetricsAggregator()
+        api = API(auth, observers=[metrics])
+        ...
+        metrics.summary()['GET /streams/{id}']['p95']
+    """
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def on_event(self, event):
+        if event.phase not in ('parse', 'complete'):
+            return
+        with self.lock:
+            metrics = self.endpoints.get(event.endpoint)
+            if metrics is None:
+                metrics = self.endpoints[event.endpoint] = EndpointMetrics(self.max_samples)
+            if event.phase == 'parse':
+                metrics.parse_time += event.elapsed
+                return
+            metrics.calls += 1
+            metrics.latencies.append(event.elapsed)
+            metrics.retries += event.get('retries', 0)
+            metrics.bytes_sent += event.get('bytes_sent', 0)
+            metrics.bytes_received += event.get('bytes_received', 0)
+            if event.get('cached'):
+                metrics.cache_hits += 1
+            if event.get('error') is not None:
+                metrics.errors += 1
+
+    def summary(self):
+        """{endpoint template: metrics dict}"""
+        with self.lock:
+            return dict((endpoint, metrics.to_dict()) for endpoint, metrics in self.endpoints.items())
+
+    def reset(self):
+        with self.lock:
+            self.endpoints = {}
+
+
+def body_size(body):
+    """Bytes of a request body, 0 unless it is encoded text or bytes."""
+    if isinstance(body, bytes):
+        return len(body)
+    if isinstance(body, type(u'')):
+        return len(body.encode('utf-8'))
+    return 0
+
+
+def response_size(resp, stream=False):
+    """Bytes of a response body, from Content-Length when given, without reading a streamed body."""
+    length = resp.headers.get('Content-Length')
+    if length is not None:
+        try:
+            return int(length)
+        except ValueError:
+            pass
+    if stream:
+        return 0
+    content = getattr(resp, 'content', None)
+    if content is None:
+        content = resp.text.encode('utf-8')
+    return len(content)
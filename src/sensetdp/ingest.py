@@ -0,0 +1,248 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from sensetdp.error import SenseTError, CircuitOpenError, DeadlineExceededError
+from sensetdp.models import Model
+from sensetdp.retry import is_retryable_status
+from sensetdp.utils import chunk_results
+
+log = logging.getLogger('sensetdp.ingest')
+
+
+class ChunkResult(object):
+    """Outcome of uploading one chunk of a stream's results."""
+
+    def __init__(self, streamid, index, points, size):
+        self.streamid = streamid
+        self.index = index
+        self.points = points
+        self.size = size
+        self.attempts = 0
+        self.elapsed = 0.0
+        self.response = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return 'ChunkResult(streamid=%r, index=%d, points=%d, attempts=%d, ok=%r)' % (
+            self.streamid, self.index, self.points, self.attempts, self.ok)
+
+
+class IngestStats(object):
+    """Running totals of an ingest, updated as chunks complete."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        # chunks built so far, chunks are built as the upload goes
+        self.chunks_total = 0
+        self.chunks_done = 0
+        self.chunks_failed = 0
+        self.points_done = 0
+        self.bytes_done = 0
+        self.retries = 0
+
+    def record(self, chunk):
+        with self.lock:
+            self.retries += max(chunk.attempts - 1, 0)
+            if chunk.ok:
+                self.chunks_done += 1
+                self.points_done += chunk.points
+                self.bytes_done += chunk.size
+            else:
+                self.chunks_failed += 1
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started
+
+    @property
+    def points_per_second(self):
+        return self.points_done / max(self.elapsed, 1e-9)
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes_done / max(self.elapsed, 1e-9)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'chunks_total': self.chunks_total,
+                'chunks_done': self.chunks_done,
+                'chunks_failed': self.chunks_failed,
+                'points_done': self.points_done,
+                'bytes_done': self.bytes_done,
+                'retries': self.retries,
+                'elapsed': self.elapsed,
+                'points_per_second': self.points_per_second,
+                'bytes_per_second': self.bytes_per_second,
+            }
+
+    def __repr__(self):
+        return 'IngestStats(chunks=%d/%d, failed=%d, points=%d, %.0f points/s)' % (
+            self.chunks_done, self.chunks_total, self.chunks_failed, self.points_done, self.points_per_second)
+
+
+class IngestReport(object):
+    """All chunk results of an ingest, in upload order per stream."""
+
+    def __init__(self, chunks, stats):
+        self.chunks = chunks
+        self.stats = stats
+
+    @property
+    def failed(self):
+        return [chunk for chunk in self.chunks if not chunk.ok]
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def raise_for_errors(self):
+        failed = self.failed
+        if failed:
+            raise SenseTError('%d of %d observation chunks failed, first error: %s'
+                              % (len(failed), len(self.chunks), failed[0].error))
+
+
+def is_retryable(error, transient_errors=()):
+    """
+    True for failures that may succeed when sent again: timeouts, throttling and
+    server errors, or no response because of one of transient_errors (see
+    API.transient_errors). Open circuits, exceeded deadlines and requests that
+    could not be built are not retried.
+    """
+    if isinstance(error, (CircuitOpenError, DeadlineExceededError)):
+        return False
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return is_retryable_status(response.status_code)
+    return isinstance(error, transient_errors) or isinstance(getattr(error, 'cause', None), transient_errors)
+
+
+def _payload_results(observation):
+    if isinstance(observation, Model):
+        return observation.to_state('create').get('results', [])
+    return [r.to_state('create') if isinstance(r, Model) else r for r in observation]
+
+
+class BulkIngest(object):
+    """
+    Upload the results of many streams with create_observations, split into
+    chunks of at most max_points results and about max_bytes of JSON, with up
+    to max_workers chunks in flight. Chunks are only built as workers free up,
+    so a large ingest doesn't hold all of its chunks at once:
+
+        report = BulkIngest(api, progress=print).run({'stream_1': observation, ...})
+        report.raise_for_errors()
+
+    A chunk that fails with a retryable error (see is_retryable) is sent again
+    after an exponential backoff. Posting the same results twice is harmless,
+    observations are keyed by stream and timestamp, so retries are idempotent.
+
+    progress is called with (chunk_result, stats) as each chunk completes.
+    """
+
+    def __init__(self, api, max_points=10000, max_bytes=4 * 1024 * 1024, max_workers=None,
+                 retry_count=3, retry_delay=1, progress=None, **kwargs):
+        self.api = api
+        self.max_points = max_points
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers or api.pool_maxsize
+        self.retry_count = retry_count
+        self.retry_delay = retry_delay
+        self.progress = progress
+        self.kwargs = kwargs
+
+    def chunks(self, observations):
+        """Yield (ChunkResult, results) for every chunk, streams in the given order."""
+        items = observations.items() if hasattr(observations, 'items') else observations
+        for streamid, observation in items:
+            chunks = chunk_results(_payload_results(observation), self.max_points, self.max_bytes, sizes=True)
+            for index, (results, size) in enumerate(chunks):
+                yield ChunkResult(streamid, index, len(results), size), results
+
+    def should_retry(self, chunk, error):
+        return chunk.attempts <= self.retry_count and is_retryable(error, self.api.transient_errors)
+
+    def backoff(self, chunk):
+        """Seconds to wait before sending chunk again."""
+        return self.retry_delay * 2 ** (chunk.attempts - 1)
+
+    def completed(self, chunk, stats):
+        stats.record(chunk)
+        if self.progress is not None:
+            self.progress(chunk, stats)
+
+    def upload(self, chunk, results):
+        """Upload one chunk, retrying retryable failures."""
+        started = time.time()
+        while True:
+            chunk.attempts += 1
+            try:
+                chunk.response = self.api.create_observations(streamid=chunk.streamid, results=results,
+                                                              **self.kwargs)
+                chunk.error = None
+                break
+            except Exception as e:
+                chunk.error = e
+                if not self.should_retry(chunk, e):
+                    log.warning('Uploading chunk %d of %s failed: %s', chunk.index, chunk.streamid, e)
+                    break
+                time.sleep(self.backoff(chunk))
+        chunk.elapsed = time.time() - started
+        return chunk
+
+    def run(self, observations):
+        """
+        :param observations: mapping or (streamid, results) pairs, results being an
+            Observation, ObservationSeries or list of results
+        :rtype: IngestReport
+        """
+        stats = IngestStats()
+        chunks = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            for chunk, results in self.chunks(observations):
+                if len(pending) >= self.max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.completed(future.result(), stats)
+                chunks.append(chunk)
+                stats.chunks_total = len(chunks)
+                pending.add(executor.submit(self.upload, chunk, results))
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.completed(future.result(), stats)
+        return IngestReport(chunks, stats)
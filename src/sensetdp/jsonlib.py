@@ -0,0 +1,149 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import enum
+
+from sensetdp.utils import SenseTEncoder, import_simplejson
+
+
+class JSONBackend(object):
+    """
+    JSON implementation used by an API for parsing responses and encoding
+    request bodies. This one wraps simplejson, or the stdlib json module.
+
+    Request bodies are strict JSON with every backend: NaN and infinite floats
+    raise ValueError, which the binder reports as a SenseTError before
+    anything is sent. Leave missing values out instead, as ObservationSeries
+    does with its NaN values.
+    """
+
+    name = 'json'
+
+    def __init__(self):
+        self.module = import_simplejson()
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return self.module.loads(data)
+
+    def dumps(self, obj):
+        """Encode a request body, as utf-8 bytes. :raise ValueError: for NaN and infinite floats"""
+        return self.module.dumps(obj, cls=SenseTEncoder, allow_nan=False).encode('utf-8')
+
+    def raw_decoder(self):
+        """Decoder with raw_decode(), for incremental parsing (see parsers.iter_json_array)."""
+        return self.module.JSONDecoder()
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.name)
+
+
+def _non_finite(obj):
+    """True when obj holds a NaN or infinite float, NumPy arrays included."""
+    if isinstance(obj, dict):
+        return any(_non_finite(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_non_finite(v) for v in obj)
+    if isinstance(obj, float):
+        return not obj - obj == 0
+    if getattr(getattr(obj, 'dtype', None), 'kind', None) == 'f':
+        return not (obj - obj == 0).all()
+    return False
+
+
+def _enum_default(obj):
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    raise TypeError('%r is not JSON serializable' % (obj,))
+
+
+class OrjsonBackend(JSONBackend):
+    """orjson, which handles Enum and NumPy values natively."""
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        JSONBackend.__init__(self)
+        self.orjson = orjson
+        self.option = orjson.OPT_SERIALIZE_NUMPY
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+    def dumps(self, obj):
+        body = self.orjson.dumps(obj, default=_enum_default, option=self.option)
+        # orjson encodes NaN and infinite floats as null, look for them only when there is one
+        if b'null' in body and _non_finite(obj):
+            raise ValueError('Out of range float values are not JSON compliant')
+        return body
+
+
+class UjsonBackend(JSONBackend):
+    """ujson, version 5 or later for its default= hook"""
+
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        JSONBackend.__init__(self)
+        self.ujson = ujson
+
+    def loads(self, data):
+        return self.ujson.loads(data)
+
+    def dumps(self, obj):
+        try:
+            body = self.ujson.dumps(obj, default=_enum_default, ensure_ascii=False, allow_nan=False)
+        except OverflowError as e:
+            # ujson's error for NaN and infinite floats
+            raise ValueError(str(e))
+        return body.encode('utf-8')
+
+
+BACKENDS = {
+    'json': JSONBackend,
+    'orjson': OrjsonBackend,
+    'ujson': UjsonBackend,
+}
+
+
+def get_backend(backend='auto'):
+    """
+    :param backend: a JSONBackend instance, a name in BACKENDS, or 'auto' for
+        orjson when it is installed and json otherwise
+    :rtype: JSONBackend
+    """
+    if isinstance(backend, JSONBackend):
+        return backend
+    if backend in (None, 'auto'):
+        try:
+            return OrjsonBackend()
+        except ImportError:
+            return JSONBackend()
+    try:
+        return BACKENDS[backend]()
+    except KeyError:
+        raise ValueError('Unknown JSON backend: %r' % (backend,))
@@ -28,9 +28,25 @@ import json
 
 import datetime
 import enum
+import weakref
+import threading
+from array import array
+from contextlib import contextmanager
 
 from sensetdp.error import SenseTError
-from sensetdp.utils import SenseTEncoder
+from sensetdp.serializers import dumps_observation
+from sensetdp.utils import SenseTEncoder, TIMESTAMP_FORMAT, timestamp_to_ns, format_timestamp_ns
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    array('q')
+    INT64_TYPECODE = 'q'
+except ValueError:
+    INT64_TYPECODE = 'l'  # python 2, 64 bit on the platforms we support
 from sensetdp.vocabulary import find_unit_of_measurement, find_observed_property
 
 
@@ -87,6 +103,102 @@ class ResultSet(list):
         return [item.id for item in self if hasattr(item, 'id')]
 
 
+class BulkResult(dict):
+    """Results of a bulk call keyed by item id, with the per item errors in `errors`."""
+    def __init__(self, *args, **kwargs):
+        super(BulkResult, self).__init__(*args, **kwargs)
+        self.errors = {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+class IdentityMap(object):
+    """
+    Parsed instances by (model class, id), so an entity embedded many times in
+    a response (or across responses, see API identity_map) is parsed once and
+    shared. With weak=True instances are only kept while in use elsewhere.
+    Shared instances are seen by every model embedding them, so changing one
+    changes it everywhere. An entity parsed again from different JSON is
+    updated in place: the server data wins over the attributes of the
+    instance, of compact models too, whose hydrated attributes are dropped.
+    """
+
+    def __init__(self, weak=False):
+        self.lock = threading.Lock()
+        self._instances = weakref.WeakValueDictionary() if weak else {}
+
+    def get_or_parse(self, cls, api, json):
+        id = json.get('id') if isinstance(json, dict) else None
+        if id is None:
+            return cls.parse(api, json)
+        key = (cls, id)
+        with self.lock:
+            instance = self._instances.get(key)
+        if instance is None:
+            instance = cls.parse(api, json)
+            instance.__dict__['_identity_json'] = json
+            with self.lock:
+                instance = self._instances.setdefault(key, instance)
+        elif instance.__dict__.get('_identity_json') != json:
+            self.refresh(instance, cls.parse(api, json), json)
+        return instance
+
+    def refresh(self, instance, parsed, json):
+        """Make instance a copy of parsed, an instance of the same entity parsed from newer json."""
+        attributes = dict(parsed.__dict__, _identity_json=json)
+        with self.lock:
+            instance.__dict__.clear()
+            instance.__dict__.update(attributes)
+
+    def __len__(self):
+        return len(self._instances)
+
+    def clear(self):
+        with self.lock:
+            self._instances.clear()
+
+
+_identity = threading.local()
+
+
+def current_identity_map():
+    """The IdentityMap embedded entities are parsed into on this thread, or None."""
+    return getattr(_identity, 'map', None)
+
+
+@contextmanager
+def identity_scope(identity_map):
+    """Parse embedded entities into identity_map (None: no sharing) on this thread within the block."""
+    previous = current_identity_map()
+    _identity.map = identity_map
+    try:
+        yield identity_map
+    finally:
+        _identity.map = previous
+
+
+def parse_shared(cls, api, json):
+    """cls.parse(api, json), reusing the instance of the current identity map if there is one."""
+    identity_map = current_identity_map()
+    if identity_map is None:
+        return cls.parse(api, json)
+    return identity_map.get_or_parse(cls, api, json)
+
+
+def parse_shared_list(cls, api, json_list):
+    """cls.parse_list(api, json_list) of embedded entities, through the current identity map."""
+    identity_map = current_identity_map()
+    if identity_map is None or not isinstance(json_list, list):
+        return cls.parse_list(api, json_list)
+    results = ResultSet()
+    for obj in json_list:
+        if obj:
+            results.append(identity_map.get_or_parse(cls, api, obj))
+    return results
+
+
 class Model(object):
 
     misspellings = {
@@ -98,9 +210,13 @@ class Model(object):
         self._api = api
         self._fix_spellings = False
 
+    def _attributes(self):
+        """The instance attributes, the base of __getstate__."""
+        return dict(self.__dict__)
+
     def __getstate__(self, action=None):
         # pickle
-        pickle = dict(self.__dict__)
+        pickle = self._attributes()
         try:
             for key in [k for k in pickle.keys() if k.startswith('_')]:
                 del pickle[key]  # do not pickle private attrs
@@ -203,9 +319,9 @@ class Platform(Model):
             if k == "_embedded":
                 for ek, ev in v.items():
                     if ek == "organisation":
-                        setattr(platform, "organisations", Organisation.parse_list(api, ev))
+                        setattr(platform, "organisations", parse_shared_list(Organisation, api, ev))
                     elif ek == "groups":
-                        setattr(platform, "groups", Group.parse_list(api, ev))
+                        setattr(platform, "groups", parse_shared_list(Group, api, ev))
                     elif ek == "deployments":
                         setattr(platform, "deployments", Deployment.parse_list(api, ev))
             else:
@@ -468,11 +584,11 @@ class Stream(Model):
             elif k == "_embedded":
                 for ek, ev in v.items():
                     if ek == "organisation":
-                        setattr(stream, "organisations", Organisation.parse_list(api, ev))
+                        setattr(stream, "organisations", parse_shared_list(Organisation, api, ev))
                     elif ek == "groups":
-                        setattr(stream, "groups", Group.parse_list(api, ev))
+                        setattr(stream, "groups", parse_shared_list(Group, api, ev))
                     elif ek == "location":
-                        setattr(stream, "location", Location.parse(api, ev[0]))
+                        setattr(stream, "location", parse_shared(Location, api, ev[0]))
                     elif ek == "metadata":
                         # metadata is also a list ?????
                         setattr(stream, "metadata", StreamMetaData.parse(api, ev[0]))
@@ -559,6 +675,19 @@ class Procedure(Model):
     pass
 
 
+def _dataframe_columns(dataframe):
+    """Yield (column, timestamps, values) of the cells of each DataFrame column that are not NaN."""
+    index = dataframe.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_convert('UTC')
+    # format every timestamp once, not once per cell
+    timestamps = numpy.asarray(index.strftime(TIMESTAMP_FORMAT), dtype=object)
+    for series_id in dataframe.columns:
+        column = dataframe[series_id]
+        present = column.notna().to_numpy()
+        yield series_id, timestamps[present].tolist(), column.to_numpy()[present].tolist()
+
+
 class Observation(Model):
     def __init__(self, api=None):
         super(Observation, self).__init__(api=api)
@@ -568,11 +697,19 @@ class Observation(Model):
     def __getstate__(self, action=None):
         pickled = super(Observation, self).__getstate__(action)
 
-        pickled["results"] = [r.to_state(action) for r in self.results] if self.results else []
+        # results are models, or already the payload dicts (see results_from_dataframe)
+        pickled["results"] = [r.to_state(action) if isinstance(r, Model) else r
+                              for r in self.results] if self.results else []
         if self.stream:
             pickled["streamid"] = self.stream.to_state(action).get("id")
         return pickled
 
+    def to_json(self, action=None, indent=None):
+        if indent is None:
+            # same output as Model.to_json, without a state dict and strftime per result
+            return dumps_observation(self, action)
+        return super(Observation, self).to_json(action, indent)
+
     @classmethod
     def parse(cls, api, json):
         stream = cls(api)
@@ -601,16 +738,27 @@ class Observation(Model):
     
     @classmethod
     def from_dataframe(cls, dataframe):
+        """
+        Convert a DataFrame with a DatetimeIndex (UTC) and a column per stream id
+        into {stream id: Observation} of UnivariateResult, NaN cells are skipped.
+        """
         result = {}
-         
-        for timestamp, series in dataframe.iterrows():
-            timestamp = timestamp.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-            
-            for series_id, value in series.iteritems():
-                observation = UnivariateResult(t=timestamp, v=value)
-                result.setdefault(series_id, Observation()).results.append(observation)
+        for series_id, timestamps, values in _dataframe_columns(dataframe):
+            observation = cls()
+            observation.results = [UnivariateResult(t=t, v=v) for t, v in zip(timestamps, values)]
+            result[series_id] = observation
         return result
 
+    @classmethod
+    def results_from_dataframe(cls, dataframe):
+        """
+        Like from_dataframe, but {stream id: [result payload dict]} as sent to
+        create_observations, e.g. {'t': '2016-02-15T00:00:00.000000Z', 'v': {'v': 1.5}},
+        built column wise without a model per cell.
+        """
+        return dict((series_id, [{'t': t, 'v': {'v': v}} for t, v in zip(timestamps, values)])
+                    for series_id, timestamps, values in _dataframe_columns(dataframe))
+
     @property
     def results(self):
         return self._results
@@ -645,6 +793,149 @@ class UnivariateResult(JSONModel):
         return pickled
 
 
+def column_array(values, typecode, dtype):
+    # NumPy array when available, stdlib array otherwise
+    if numpy is not None:
+        return numpy.asarray(values, dtype=dtype)
+    if isinstance(values, array) and values.typecode == typecode:
+        return values
+    return array(typecode, values)
+
+
+class SeriesResults(object):
+    """
+    Read only per point view of an ObservationSeries, compatible with
+    Observation.results. Points are built on access, never stored.
+    """
+
+    def __init__(self, series):
+        self._series = series
+
+    def __len__(self):
+        return len(self._series)
+
+    def _point(self, idx):
+        series = self._series
+        return UnivariateResult(api=series._api, t=format_timestamp_ns(series.timestamps[idx]),
+                                v={'v': float(series.values[idx])})
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._point(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('series index out of range')
+        return self._point(idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._point(idx)
+
+    def __repr__(self):
+        return '<SeriesResults of %d points>' % len(self)
+
+
+class ObservationSeries(Model):
+    """
+    Scalar observations of a stream stored column wise: `timestamps` holds epoch
+    nanoseconds (int64) and `values` the values (float64), as NumPy arrays when
+    NumPy is installed and stdlib arrays otherwise.
+
+    A point costs 16 bytes instead of a model instance. `results` is a lazy per
+    point view for code written against Observation. Series can be passed to
+    create_observations like an Observation.
+    """
+
+    def __init__(self, api=None, timestamps=(), values=(), streamid=None):
+        super(ObservationSeries, self).__init__(api=api)
+        if len(timestamps) != len(values):
+            raise SenseTError('ObservationSeries needs as many timestamps as values.')
+        self.streamid = streamid
+        self._timestamps = column_array(timestamps, INT64_TYPECODE, 'int64')
+        self._values = column_array(values, 'd', 'float64')
+
+    def __getstate__(self, action=None):
+        pickled = super(ObservationSeries, self).__getstate__(action)
+        if self.streamid is None:
+            del pickled['streamid']
+
+        if numpy is not None:
+            # NaN marks a missing value, it is not sent
+            present = ~numpy.isnan(self._values)
+            times = numpy.datetime_as_string(self._timestamps[present].view('datetime64[ns]'), unit='us')
+            values = self._values[present].tolist()
+            pickled['results'] = [{'t': t + 'Z', 'v': {'v': v}} for t, v in zip(times.tolist(), values)]
+        else:
+            pickled['results'] = [{'t': format_timestamp_ns(t), 'v': {'v': v}}
+                                  for t, v in zip(self._timestamps, self._values) if v == v]
+        return pickled
+
+    def to_json(self, action=None, indent=None):
+        if indent is None:
+            return dumps_observation(self, action)
+        return super(ObservationSeries, self).to_json(action, indent)
+
+    @classmethod
+    def parse(cls, api, json):
+        streamid = json.get('streamid')
+        if streamid is None and isinstance(json.get('stream'), dict):
+            streamid = json['stream'].get('id')
+        return cls.from_results(api, json.get('results') or [], streamid=streamid)
+
+    @classmethod
+    def from_results(cls, api, results, streamid=None):
+        """
+        Build a series from get_observations result dicts, e.g. {'t': '2016-01-01T00:00:00.000Z', 'v': {'v': 1.5}}.
+        results may be any iterable (like the StreamingJSONParser generator), it is consumed once.
+        """
+        timestamps = array(INT64_TYPECODE)
+        values = array('d')
+        for result in results:
+            value = result['v']
+            if isinstance(value, dict):
+                if 'v' not in value:
+                    raise SenseTError('ObservationSeries only holds scalar values, got %r' % (value,))
+                value = value['v']
+            timestamps.append(timestamp_to_ns(result['t']))
+            values.append(float('nan') if value is None else value)
+        return cls.from_arrays(api, timestamps, values, streamid=streamid)
+
+    @classmethod
+    def from_arrays(cls, api, timestamps, values, streamid=None):
+        # stdlib arrays are handed to NumPy without a copy
+        if numpy is not None and isinstance(timestamps, array):
+            timestamps = numpy.frombuffer(timestamps, dtype='int64') if len(timestamps) else ()
+            values = numpy.frombuffer(values, dtype='float64') if len(values) else ()
+        return cls(api, timestamps, values, streamid=streamid)
+
+    @classmethod
+    def from_observation(cls, observation, streamid=None):
+        """Convert an Observation with scalar results."""
+        results = (r.to_state() if isinstance(r, Model) else r for r in observation.results)
+        if streamid is None and observation.stream is not None:
+            streamid = getattr(observation.stream, 'id', None)
+        return cls.from_results(observation._api, results, streamid=streamid)
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    @property
+    def timestamps(self):
+        return self._timestamps
+
+    @property
+    def values(self):
+        return self._values
+
+    @property
+    def results(self):
+        return SeriesResults(self)
+
+    def __repr__(self):
+        return '%s(streamid=%r, points=%d)' % (self.__class__.__name__, self.streamid, len(self))
+
+
 class Deployment(Model):
     @classmethod
     def parse(cls, api, json):
@@ -734,6 +1025,101 @@ class User(Model):
         pass
 
 
+def _embedded(key, parse, default=None):
+    # hydrate a CompactModel attribute from the response's _embedded[key]
+    def hydrate(api, json):
+        embedded = json.get('_embedded') or {}
+        if key in embedded:
+            return parse(api, embedded[key])
+        return default() if callable(default) else default
+    return hydrate
+
+
+class CompactModel(object):
+    """
+    Mixin making a model a thin view over its response dict: attributes are read
+    from the dict when accessed, and embedded objects are only parsed on first
+    access (then kept). An instance holds the dict and what was assigned or
+    hydrated, instead of a copy of every key and all children up front.
+    to_state()/to_json() give the same output as the eagerly parsed model.
+    """
+
+    # private attribute: function(api, json) building its value on first access
+    _hydrators = {}
+
+    # response keys which are not plain attributes
+    _special_keys = frozenset(['_embedded'])
+
+    _excluded_cache = None
+
+    @classmethod
+    def parse(cls, api, json):
+        model = cls.__new__(cls)
+        model.__dict__.update(_api=api, _fix_spellings=False, _json=json)
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            # embedded entities are hydrated later, into the same identity map
+            model.__dict__['_identity_map'] = identity_map
+        return model
+
+    @classmethod
+    def _excluded_keys(cls):
+        # keys named like a property end up in its private attribute when parsed eagerly
+        if cls.__dict__.get('_excluded_cache') is None:
+            properties = [name for name in dir(cls) if isinstance(getattr(cls, name, None), property)]
+            cls._excluded_cache = cls._special_keys.union(properties)
+        return cls._excluded_cache
+
+    def __getattr__(self, name):
+        # only called when name is not an instance attribute (yet)
+        attributes = self.__dict__
+        json = attributes.get('_json')
+        if json is None:
+            raise AttributeError(name)
+        hydrate = self._hydrators.get(name)
+        if hydrate is not None:
+            with identity_scope(attributes.get('_identity_map')):
+                value = attributes[name] = hydrate(attributes.get('_api'), json)
+            return value
+        if name in json and name not in self._excluded_keys():
+            return json[name]
+        raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, name))
+
+    def _attributes(self):
+        excluded = self._excluded_keys()
+        attributes = dict((k, v) for k, v in self.__dict__['_json'].items() if k not in excluded)
+        attributes.update(self.__dict__)
+        return attributes
+
+
+class CompactGroup(CompactModel, Group):
+    _special_keys = frozenset()
+
+
+class CompactLocation(CompactModel, Location):
+    _special_keys = frozenset()
+
+
+class CompactStream(CompactModel, Stream):
+    _special_keys = frozenset(['_embedded', 'resulttype'])
+    _hydrators = {
+        '_result_type': lambda api, json: StreamResultType(json['resulttype']) if 'resulttype' in json else None,
+        '_organisations': _embedded('organisation', lambda api, v: parse_shared_list(Organisation, api, v), list),
+        '_groups': _embedded('groups', lambda api, v: parse_shared_list(CompactGroup, api, v), list),
+        '_location': _embedded('location', lambda api, v: parse_shared(CompactLocation, api, v[0])),
+        '_metadata': _embedded('metadata', lambda api, v: StreamMetaData.parse(api, v[0])),
+    }
+
+
+class CompactPlatform(CompactModel, Platform):
+    _hydrators = {
+        '_organisations': _embedded('organisation', lambda api, v: parse_shared_list(Organisation, api, v), list),
+        '_groups': _embedded('groups', lambda api, v: parse_shared_list(CompactGroup, api, v), list),
+        '_deployments': _embedded('deployments', lambda api, v: Deployment.parse_list(api, v), list),
+        '_streams': lambda api, json: list(),
+    }
+
+
 class ModelFactory(object):
     """
     Used by parsers for creating instances
@@ -750,6 +1136,20 @@ class ModelFactory(object):
     location = Location
     procedure = Procedure
     observation = Observation
+    observation_series = ObservationSeries
     aggregation = Aggregation
 
     json = JSONModel
+
+
+class CompactModelFactory(ModelFactory):
+    """
+    Model factory using the compact (lazily hydrated) models for streams,
+    platforms, groups and locations, for large listings:
+
+        api = API(auth, parser=ModelParser(model_factory=CompactModelFactory))
+    """
+    stream = CompactStream
+    platform = CompactPlatform
+    group = CompactGroup
+    location = CompactLocation
@@ -24,10 +24,18 @@ THE SOFTWARE.
 
 from __future__ import print_function, unicode_literals, absolute_import
 
+import io
+import csv
+import codecs
+import itertools
+from array import array
+from collections import OrderedDict
+
 import six
 
-from sensetdp.models import ModelFactory
-from sensetdp.utils import import_simplejson
+from sensetdp.models import ModelFactory, IdentityMap, identity_scope, INT64_TYPECODE, column_array
+from sensetdp.utils import timestamp_to_ns
+from sensetdp.jsonlib import get_backend
 from sensetdp.error import SenseTError
 
 
@@ -38,6 +46,10 @@ else:
 
 class Parser(object):
 
+    # True when the parser consumes the response body incrementally, the binder
+    # then sends the request with stream=True and calls parse_stream()
+    stream = False
+
     def parse(self, method, payload):
         """
         Parse the response payload and return the result.
@@ -46,6 +58,13 @@ class Parser(object):
         """
         raise NotImplementedError
 
+    def parse_stream(self, method, response):
+        """
+        Parse a streamed response (see `stream`), reading its body with
+        response.iter_content(), and return the result.
+        """
+        raise NotImplementedError
+
     def parse_error(self, payload):
         """
         Parse the error message and api error code from payload.
@@ -71,8 +90,11 @@ class JSONParser(Parser):
 
     payload_format = 'json'
 
-    def __init__(self):
-        self.json_lib = import_simplejson()
+    def __init__(self, json_backend='auto'):
+        """
+        :param json_backend: sensetdp.jsonlib backend or name, default: orjson when installed
+        """
+        self.json_lib = get_backend(json_backend)
 
     def parse(self, method, payload):
         try:
@@ -80,7 +102,7 @@ class JSONParser(Parser):
         except Exception as e:
             raise SenseTError('Failed to parse JSON payload: %s' % e)
 
-        needs_cursors = 'cursor' in method.session.params
+        needs_cursors = 'cursor' in method.params
         if needs_cursors and isinstance(json, dict):
             if 'previous_cursor' in json:
                 if 'next_cursor' in json:
@@ -101,10 +123,161 @@ class JSONParser(Parser):
         return reason, api_code
 
 
+def iter_json_array(chunks, key, decoder):
+    """
+    Yield the items of the array under the top level `key` of a JSON object
+    delivered in chunks (bytes or text), without holding the whole document.
+
+    :param chunks: iterable of bytes or text chunks
+    :param key: top level key of the array, e.g. 'results'
+    :param decoder: JSONDecoder instance, used for its raw_decode()
+    """
+    chunks = iter(chunks)
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+
+    def read():
+        for chunk in chunks:
+            if isinstance(chunk, six.binary_type):
+                chunk = utf8.decode(chunk)
+            if chunk:
+                return chunk
+        return utf8.decode(b'', True) or None
+
+    # Scan up to the opening bracket of the array, tracking strings and nesting
+    # so keys of nested objects are not mistaken for the top level key.
+    buf = ''
+    pos = 0
+    depth = 0
+    in_string = escape = False
+    string_start = 0
+    last_string = current_key = None
+    while True:
+        if pos == len(buf):
+            chunk = read()
+            if chunk is None:
+                return
+            buf += chunk
+        c = buf[pos]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == '\\':
+                escape = True
+            elif c == '"':
+                in_string = False
+                last_string = buf[string_start + 1:pos]
+        elif c == '"':
+            in_string = True
+            string_start = pos
+        elif c == ':':
+            current_key = last_string if depth == 1 else current_key
+        elif c == ',':
+            current_key = last_string = None
+        elif c == '[' and depth == 1 and current_key == key:
+            break
+        elif c in '{[':
+            depth += 1
+        elif c in '}]':
+            depth -= 1
+        pos += 1
+
+    buf = buf[pos + 1:]
+    idx = 0
+    eof = False
+    while True:
+        # skip separators, then decode the next item once it is complete
+        while idx < len(buf) and buf[idx] in ' \t\r\n,':
+            idx += 1
+        if idx < len(buf) and buf[idx] == ']':
+            return
+        try:
+            if idx == len(buf):
+                raise ValueError('Unterminated array')
+            item, end = decoder.raw_decode(buf, idx)
+            if isinstance(item, (int, float)) and not eof and (end == len(buf) or buf[end] in '.eE+-'):
+                raise ValueError('Number may continue in the next chunk')
+        except ValueError:
+            chunk = read()
+            if chunk is None:
+                if eof:
+                    raise
+                eof = True
+            else:
+                buf = buf[idx:] + chunk
+                idx = 0
+            continue
+        yield item
+        idx = end
+
+
+class StreamingJSONParser(JSONParser):
+    """
+    Yields the items of a json listing while the response is still downloading,
+    by default the 'results' of get_observations. The full payload is never held
+    in memory, and the result is a generator:
+
+        parser = StreamingJSONParser()
+        for result in api.get_observations(streamid='stream_1', parser=parser):
+            ...
+    """
+
+    stream = True
+
+    def __init__(self, key='results', chunk_size=64 * 1024, json_backend='auto'):
+        JSONParser.__init__(self, json_backend)
+        self.key = key
+        self.chunk_size = chunk_size
+
+    def _iter_items(self, chunks):
+        try:
+            for item in iter_json_array(chunks, self.key, self.json_lib.raw_decoder()):
+                yield item
+        except ValueError as e:
+            raise SenseTError('Failed to parse JSON payload: %s' % e)
+
+    def parse(self, method, payload):
+        return self._iter_items([payload])
+
+    def parse_stream(self, method, response):
+        chunks = response.iter_content(self.chunk_size)
+        try:
+            for item in self._iter_items(chunks):
+                yield item
+            # read the few bytes after the array so the connection can be reused
+            for _ in chunks:
+                pass
+        finally:
+            response.close()
+
+
+class ObservationSeriesParser(StreamingJSONParser):
+    """
+    Builds an ObservationSeries from get_observations, straight from the
+    streamed 'results' into arrays without a dict or model per point:
+
+        series = api.get_observations(streamid='stream_1', parser=ObservationSeriesParser())
+    """
+
+    def __init__(self, chunk_size=64 * 1024, model_factory=None, json_backend='auto'):
+        StreamingJSONParser.__init__(self, key='results', chunk_size=chunk_size, json_backend=json_backend)
+        self.model_factory = model_factory or ModelFactory
+
+    def _series(self, method, results):
+        streamid = method.query_params.get('streamid') if method is not None else None
+        return self.model_factory.observation_series.from_results(
+            getattr(method, 'api', None), results, streamid=streamid)
+
+    def parse(self, method, payload):
+        return self._series(method, StreamingJSONParser.parse(self, method, payload))
+
+    def parse_stream(self, method, response):
+        return self._series(method, StreamingJSONParser.parse_stream(self, method, response))
+
+
 class ModelParser(JSONParser):
 
-    def __init__(self, model_factory=None):
-        JSONParser.__init__(self)
+    def __init__(self, model_factory=None, json_backend='auto'):
+        JSONParser.__init__(self, json_backend)
         self.model_factory = model_factory or ModelFactory
 
     def parse(self, method, payload):
@@ -122,39 +295,92 @@ class ModelParser(JSONParser):
         else:
             cursors = None
 
-        if method.payload_list:
-            result = model.parse_list(method.api, json)
-        else:
-            result = model.parse(method.api, json)
+        # entities embedded many times in the payload are parsed once and shared
+        identity_map = getattr(method.api, 'identity_map', None)
+        with identity_scope(IdentityMap() if identity_map is None else identity_map):
+            if method.payload_list:
+                result = model.parse_list(method.api, json)
+            else:
+                result = model.parse(method.api, json)
 
         if cursors:
             return result, cursors
         else:
             return result
 
+def csv_stream_ids(method):
+    """Stream ids of a get_observations call, parsing a comma separated streamid as CSV so ids may be quoted."""
+    stream_ids = method.query_params['streamid']
+    if isinstance(stream_ids, (list, tuple)):
+        return [six.text_type(s) for s in stream_ids]
+    return [s.strip() for s in next(csv.reader([stream_ids]))]
+
+
+def check_csv_media(parser, method):
+    media_type = method.query_params.get('media', None)
+    if media_type != 'csv':
+        raise SenseTError('{} requires CSV media type (media type "{}" is not supported).'.format(
+            type(parser).__name__, media_type))
+
+
+def read_csv_header(readline, stream_ids):
+    """
+    Skip the information lines before the column header of a CSV observations
+    payload, returning the header cells. readline() returns '' at the end.
+    """
+    column_headers = frozenset(['timestamp'] + stream_ids)
+    for line in iter(readline, ''):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        cells = [c.strip() for c in next(csv.reader([line]))]
+        if frozenset(cells) == column_headers:
+            return cells
+    raise SenseTError('Column header not found in CSV payload.')
+
+
+class IterStream(io.RawIOBase):
+    """Readable binary file over an iterable of byte (or text) chunks, e.g. response.iter_content()."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.pending:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                return 0
+            self.pending = chunk.encode('utf-8') if isinstance(chunk, six.text_type) else chunk
+        n = min(len(b), len(self.pending))
+        b[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+
 class PandasObservationParser(Parser):
-    def __init__(self):
+    def __init__(self, json_backend='auto'):
         import pandas # NOTE: import here means we don't require pandas to be installed unless we actually instantiate this class.
         self.pandas = pandas
         
-        self.json_lib = import_simplejson()
+        self.json_lib = get_backend(json_backend)
     
     def parse(self, method, payload):
         # Validate media type.
-        media_type = method.query_params.get('media', None)
-        if media_type != 'csv':
-            raise SenseTError('PandasObservationParser requires CSV media type (media type "{}" is not supported).'.format(media_type))
+        check_csv_media(self, method)
         
-        # Skip header information.
-        stream_ids = method.query_params['streamid'].split(',') # NOTE: this WILL break if stream IDs contain commas (need to properly parse as CSV).
-        column_headers = frozenset(['timestamp'] + stream_ids)
-        lines = payload.splitlines()
-        for i, row in enumerate(lines):
-            if set(s.strip() for s in row.split(',')) == column_headers:
-                break
+        # Skip header information, read_csv continues from the same buffer.
+        stream_ids = csv_stream_ids(method)
+        buf = StringIO(payload)
+        header = read_csv_header(buf.readline, stream_ids)
         
         # Parse CSV payload.
-        df = self.pandas.read_csv(StringIO('\n'.join(lines[i:])), parse_dates=True, index_col='timestamp')
+        df = self.pandas.read_csv(buf, names=header, header=None, parse_dates=True, index_col='timestamp')
         
         # SensorCloud returns columns in random (alphabetic?) order - reorder to
         # match the order the stream IDs were originally given in.
@@ -173,3 +399,78 @@ class PandasObservationParser(Parser):
             api_code = error_object.get('status', None)
         
         return reason, api_code
+
+
+class CSVObservationParser(PandasObservationParser):
+    """
+    Reads a media='csv' get_observations response while it downloads, yielding
+    chunks of at most chunk_rows rows:
+
+        parser = CSVObservationParser(chunk_rows=100000)
+        for chunk in api.get_observations(streamid='stream_1,stream_2', media='csv', parser=parser):
+            ...
+
+    With pandas a chunk is a DataFrame indexed by timestamp, as returned by
+    PandasObservationParser. Without pandas (or with use_pandas=False) it is an
+    OrderedDict of columns: 'timestamp' as int64 epoch nanoseconds, then a
+    float64 column per stream id (NaN for blank cells), NumPy arrays when
+    NumPy is installed and stdlib arrays otherwise.
+    """
+
+    stream = True
+
+    def __init__(self, chunk_rows=10000, chunk_size=64 * 1024, use_pandas=None, json_backend='auto'):
+        self.pandas = None
+        if use_pandas is not False:
+            try:
+                PandasObservationParser.__init__(self, json_backend)
+            except ImportError:
+                # only required when use_pandas=True, by default fall back to columns
+                if use_pandas:
+                    raise
+        if self.pandas is None:
+            self.json_lib = get_backend(json_backend)
+        self.chunk_rows = chunk_rows
+        self.chunk_size = chunk_size
+
+    def _chunks(self, method, raw):
+        check_csv_media(self, method)
+        stream_ids = csv_stream_ids(method)
+        buf = io.BufferedReader(raw, self.chunk_size)
+        header = read_csv_header(lambda: buf.readline().decode('utf-8'), stream_ids)
+
+        if self.pandas is not None:
+            reader = self.pandas.read_csv(buf, names=header, header=None, parse_dates=True,
+                                          index_col='timestamp', chunksize=self.chunk_rows)
+            for df in reader:
+                yield df[stream_ids] if len(stream_ids) > 1 else df
+            return
+
+        positions = [header.index(stream_id) for stream_id in stream_ids]
+        rows = csv.reader(io.TextIOWrapper(buf, encoding='utf-8', newline=''))
+        while True:
+            timestamps = array(INT64_TYPECODE)
+            columns = [array('d') for _ in stream_ids]
+            for row in itertools.islice(rows, self.chunk_rows):
+                if not row:
+                    continue
+                timestamps.append(timestamp_to_ns(row[0].strip()))
+                for column, position in zip(columns, positions):
+                    cell = row[position].strip() if position < len(row) else ''
+                    column.append(float(cell) if cell else float('nan'))
+            if not timestamps:
+                return
+            chunk = OrderedDict([('timestamp', column_array(timestamps, INT64_TYPECODE, 'int64'))])
+            for stream_id, column in zip(stream_ids, columns):
+                chunk[stream_id] = column_array(column, 'd', 'float64')
+            yield chunk
+
+    def parse(self, method, payload):
+        return self._chunks(method, io.BytesIO(payload.encode('utf-8')))
+
+    def parse_stream(self, method, response):
+        try:
+            for chunk in self._chunks(method, IterStream(response.iter_content(self.chunk_size))):
+                yield chunk
+        finally:
+            response.close()
@@ -0,0 +1,142 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import time
+import threading
+
+
+class RateLimiter(object):
+    """
+    Client side rate limit shared by every bound method of an API, across threads
+    and asyncio tasks.
+
+    A token bucket (as a virtual scheduling clock) that spaces requests so the
+    budget reported by the server's x-rate-limit-remaining and x-rate-limit-reset
+    headers lasts until the reset, letting burst requests through back to back.
+    While plenty of the budget is left the burst grows to burst_ratio of it, so
+    requests are only spaced once they are about to use the budget up before
+    the reset; near the end of the budget they are spread evenly.
+    Each request takes its slot when it is sent, so parallel workers share the
+    budget before any response arrives instead of all hitting a 429 and sleeping
+    together. With no budget known requests are limited to rate per second, or
+    not at all when rate is None.
+
+    reserve() never blocks, callers sleep (or await asyncio.sleep) the delay it
+    returns.
+    """
+
+    def __init__(self, rate=None, burst=10, burst_ratio=0.5, reset_margin=5, clock=time.time):
+        """
+        :param rate: maximum requests per second when the server budget is unknown, default:None (unlimited)
+        :param burst: number of requests let through without spacing, default:10
+        :param burst_ratio: share of the server budget left let through without spacing when that is more
+            than burst, default:0.5
+        :param reset_margin: seconds to wait past the reset time once the budget is used up, default:5
+        :param clock: time source in epoch seconds, like the x-rate-limit-reset header
+        """
+        self.rate = rate
+        self.burst = max(int(burst), 1)
+        self.burst_ratio = burst_ratio
+        self.reset_margin = reset_margin
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.remaining = None
+        self.reset_time = None
+        self._next = 0  # theoretical send time of the next request
+
+    def _budget_known(self, at):
+        return self.remaining is not None and self.reset_time is not None and at < self.reset_time
+
+    def _interval(self, at):
+        if self._budget_known(at) and self.remaining > 0:
+            return float(self.reset_time - at) / self.remaining
+        if self.rate:
+            return 1.0 / self.rate
+        return 0
+
+    def _burst(self, at):
+        if self._budget_known(at):
+            return max(self.burst, int(self.remaining * self.burst_ratio))
+        return self.burst
+
+    def exhausted(self):
+        """True when the server budget is used up until a reset still to come."""
+        with self.lock:
+            return self._budget_known(self.clock()) and self.remaining < 1
+
+    def reserve(self):
+        """
+        Take the slot of one request.
+        :return: tuple of (seconds to wait before sending, True when waiting for the budget to reset)
+        """
+        with self.lock:
+            now = self.clock()
+            if self._budget_known(now) and self.remaining < 1:
+                # wait for the next window, whose budget the next response reports
+                start = self.reset_time + self.reset_margin
+                self.remaining = self.reset_time = None
+                self._next = start
+                return start - now, True
+
+            # spread what is left of the budget from the next free slot on
+            slot = max(now, self._next)
+            interval = self._interval(slot)
+            start = max(now, slot - (self._burst(slot) - 1) * interval)
+            self._next = slot + interval
+            if self._budget_known(start):
+                self.remaining -= 1
+            return max(start - now, 0), False
+
+    def update(self, headers, status_code=None):
+        """
+        Learn the server budget from a response.
+        :param headers: response headers
+        :param status_code: response status, a 429 or 420 without headers means the budget is used up
+        """
+        remaining = headers.get('x-rate-limit-remaining')
+        reset_time = headers.get('x-rate-limit-reset')
+        with self.lock:
+            if reset_time is not None:
+                reset_time = int(reset_time)
+                if reset_time != self.reset_time:
+                    # a new window, its budget replaces the one counted so far
+                    self.remaining = None
+                self.reset_time = reset_time
+            if remaining is not None:
+                remaining = int(remaining)
+                # responses of requests sent before others in flight report more than is left
+                if self.remaining is None or remaining < self.remaining:
+                    self.remaining = remaining
+            elif status_code in (420, 429):
+                self.remaining = 0
+                if self.reset_time is None and 'retry-after' in headers:
+                    self.reset_time = self.clock() + float(headers['retry-after'])
+
+    def reset(self):
+        with self.lock:
+            self.remaining = self.reset_time = None
+            self._next = 0
+
+    def __repr__(self):
+        return 'RateLimiter(remaining=%s, reset_time=%s)' % (self.remaining, self.reset_time)
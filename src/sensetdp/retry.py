@@ -0,0 +1,215 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import time
+import random
+import threading
+import email.utils
+from collections import deque
+
+
+def is_retryable_status(status_code):
+    """True for responses worth sending again: timeouts, throttling and server errors."""
+    return status_code >= 500 or status_code in (408, 420, 429)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header, either seconds or an HTTP date, None if invalid."""
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(email.utils.mktime_tz(parsed) - time.time(), 0)
+
+
+class RetryStats(object):
+    """Thread safe retry counters of an API."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.error_retries = 0
+        self.sleep_time = 0.0
+        self.budget_exhausted = 0
+
+    def record_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def record_retry(self, delay, error=False):
+        with self.lock:
+            self.retries += 1
+            self.sleep_time += delay
+            if error:
+                self.error_retries += 1
+
+    def record_budget_exhausted(self):
+        with self.lock:
+            self.budget_exhausted += 1
+
+    def reset(self):
+        with self.lock:
+            self.requests = self.retries = self.error_retries = self.budget_exhausted = 0
+            self.sleep_time = 0.0
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'error_retries': self.error_retries,
+                'sleep_time': self.sleep_time,
+                'budget_exhausted': self.budget_exhausted,
+            }
+
+    def __repr__(self):
+        return 'RetryStats(requests=%d, retries=%d, sleep_time=%.3f)' % (self.requests, self.retries, self.sleep_time)
+
+
+class RetryBudget(object):
+    """
+    Limits retries to a share of the requests made, so a degraded portal isn't
+    sent several times its usual load: within the last window seconds, retries
+    are allowed up to min_retries plus ratio of the requests.
+    """
+
+    def __init__(self, ratio=0.2, min_retries=10, window=10, clock=time.time):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._requests = deque()
+        self._retries = deque()
+
+    def _prune(self, now):
+        horizon = now - self.window
+        for times in (self._requests, self._retries):
+            while times and times[0] <= horizon:
+                times.popleft()
+
+    def record_request(self):
+        with self.lock:
+            now = self.clock()
+            self._prune(now)
+            self._requests.append(now)
+
+    def try_retry(self):
+        """Take one retry from the budget, False when it is used up."""
+        with self.lock:
+            now = self.clock()
+            self._prune(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Decides whether and when a bound method sends a failed request again.
+
+    A method retries up to its retry_count times (see API retry_count), after
+    retry_delay * backoff ** (retries so far) seconds, at most max_delay, with
+    full jitter: the actual delay is uniformly random up to that, so clients
+    failing together don't retry together. A Retry-After header is honoured
+    instead. Responses are retried when their status is in the method's
+    retry_errors, or by default on timeouts, throttling and server errors;
+    requests that got no response are retried on the api's transient_errors
+    (connection errors and timeouts). Retries are taken from budget, shared by
+    every call of the api, when there is one.
+
+    Subclass and override is_retryable or backoff to change the behaviour.
+    """
+
+    def __init__(self, backoff=2, max_delay=60, jitter=True, budget=None, rng=None):
+        """
+        :param backoff: factor the delay grows by with every retry, default:2
+        :param max_delay: maximum seconds between two attempts, default:60
+        :param jitter: randomize the delay, default:True
+        :param budget: RetryBudget shared by all calls, default:None (a new RetryBudget), False for none
+        :param rng: random.Random used for the jitter
+        """
+        self.backoff_factor = backoff
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.budget = RetryBudget() if budget is None else budget
+        self.random = rng or random.Random()
+        self.stats = RetryStats()
+
+    def record_request(self):
+        """Called once per call, before its first attempt."""
+        self.stats.record_request()
+        if self.budget:
+            self.budget.record_request()
+
+    def is_retryable(self, method, response=None, error=None):
+        if error is not None:
+            return isinstance(error, method.api.transient_errors)
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            return False
+        if response.status_code in (420, 429) and method.wait_on_rate_limit:
+            return True
+        if method.retry_errors:
+            return response.status_code in method.retry_errors
+        return is_retryable_status(response.status_code)
+
+    def backoff(self, method, retries):
+        """Seconds to wait before retry number retries + 1."""
+        delay = min(method.retry_delay * self.backoff_factor ** retries, self.max_delay)
+        if self.jitter:
+            delay = self.random.uniform(0, delay)
+        return delay
+
+    def retry_delay(self, method, retries, response=None, error=None):
+        """
+        :param method: binder APIMethod instance
+        :param retries: number of retries performed so far
+        :param response: the failed response, or
+        :param error: the exception raised sending the request
+        :return: seconds to wait before sending again, or None to give up, also
+            when waiting would reach the method's deadline
+        """
+        if retries >= method.retry_count or not self.is_retryable(method, response, error):
+            return None
+
+        delay = None
+        if response is not None:
+            delay = parse_retry_after(response.headers.get('retry-after'))
+        if delay is None:
+            delay = self.backoff(method, retries)
+        # a retry the deadline leaves no time for is neither counted nor taken from the budget
+        if not method.within_deadline(delay):
+            return None
+        if self.budget and not self.budget.try_retry():
+            self.stats.record_budget_exhausted()
+            return None
+        self.stats.record_retry(delay, error is not None)
+        return delay
@@ -0,0 +1,189 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Fast JSON serialization of observation payloads, producing exactly the output
+of Model.to_json (sorted keys, default separators) without building the
+intermediate state dicts or calling strftime per point. The binder encodes
+create_observations request bodies with it too.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import json
+import datetime
+from json.encoder import encode_basestring_ascii
+
+import six
+
+from sensetdp.utils import SenseTEncoder, TIMESTAMP_FORMAT, format_timestamp_ns
+
+_date_prefixes = {}
+
+
+def _dumps(obj, allow_nan=True):
+    return json.dumps(obj, sort_keys=True, cls=SenseTEncoder, allow_nan=allow_nan)
+
+
+def format_datetime(dt):
+    """datetime.strftime(TIMESTAMP_FORMAT) with the date part cached, for naive or aware datetimes."""
+    ordinal = dt.toordinal()
+    prefix = _date_prefixes.get(ordinal)
+    if prefix is None:
+        if len(_date_prefixes) > 4096:
+            _date_prefixes.clear()
+        prefix = _date_prefixes[ordinal] = dt.strftime('%Y-%m-%dT')
+    return '%s%02d:%02d:%02d.%06dZ' % (prefix, dt.hour, dt.minute, dt.second, dt.microsecond)
+
+
+def _float(value, allow_nan=True):
+    # as json.dumps, which uses float.__repr__ and spells out the special values
+    if not allow_nan and (value != value or value in (float('inf'), -float('inf'))):
+        raise ValueError('Out of range float values are not JSON compliant: %r' % value)
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return 'Infinity'
+    if value == -float('inf'):
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+def dumps_value(value, allow_nan=True):
+    """JSON of a result value, fast for numbers and {'v': number}."""
+    kind = type(value)
+    if kind is float:
+        return _float(value, allow_nan)
+    if kind is int:
+        return int.__repr__(value)
+    if kind is dict and len(value) == 1 and 'v' in value:
+        return '{"v": %s}' % dumps_value(value['v'], allow_nan)
+    return _dumps(value, allow_nan)
+
+
+def dumps_timestamp(t):
+    """JSON of a result timestamp, formatting datetimes like UnivariateResult.__getstate__."""
+    if type(t) is datetime.datetime:
+        return '"%s"' % format_datetime(t)
+    if isinstance(t, datetime.datetime):
+        return encode_basestring_ascii(t.strftime(TIMESTAMP_FORMAT))
+    if isinstance(t, six.text_type):
+        return encode_basestring_ascii(t)
+    return _dumps(t)
+
+
+def dumps_results(results, action=None, allow_nan=True):
+    """
+    JSON array of results (UnivariateResult or payload dicts), as sent to create_observations.
+
+    :param allow_nan: spell out NaN and infinite values like json.dumps, else raise ValueError
+    """
+    from sensetdp.models import Model, UnivariateResult  # models imports this module
+
+    parts = []
+    append = parts.append
+    for result in results:
+        if type(result) is UnivariateResult and len(result.__dict__) == 4 and not result._fix_spellings:
+            # a plain t/v model, anything else goes through to_state
+            t, v = result.t, result.v
+            if type(t) is datetime.datetime and t.tzinfo is None and t.year >= 1000:
+                # isoformat is the strftime output for these, minus an all zero fraction
+                t = '"%s.000000Z"' % t.isoformat() if not t.microsecond else '"%sZ"' % t.isoformat()
+            else:
+                t = dumps_timestamp(t)
+            if type(v) is dict and len(v) == 1 and type(v.get('v')) is float and v['v'] - v['v'] == 0:
+                v = '{"v": %s}' % float.__repr__(v['v'])
+            else:
+                v = dumps_value(v, allow_nan)
+            append('{"t": %s, "v": %s}' % (t, v))
+        elif type(result) is dict and len(result) == 2 and isinstance(result.get('t'), six.text_type) \
+                and 'v' in result:
+            append('{"t": %s, "v": %s}' % (dumps_timestamp(result['t']), dumps_value(result['v'], allow_nan)))
+        elif isinstance(result, Model):
+            append(_dumps(result.to_state(action), allow_nan))
+        else:
+            append(_dumps(result, allow_nan))
+    return '[%s]' % ', '.join(parts)
+
+
+def dumps_series_results(series, allow_nan=True):
+    """JSON array of an ObservationSeries' results, see ObservationSeries.__getstate__."""
+    from sensetdp import models
+
+    numpy = models.numpy
+    if numpy is not None:
+        present = ~numpy.isnan(series.values)
+        times = numpy.datetime_as_string(series.timestamps[present].view('datetime64[ns]'), unit='us').tolist()
+        times = [t + 'Z' for t in times]
+        values = series.values[present].tolist()
+    else:
+        pairs = [(format_timestamp_ns(t), v) for t, v in zip(series.timestamps, series.values) if v == v]
+        times = [t for t, v in pairs]
+        values = [v for t, v in pairs]
+    return '[%s]' % ', '.join(['{"t": "%s", "v": {"v": %s}}' % (t, _float(v, allow_nan))
+                               for t, v in zip(times, values)])
+
+
+def observation_state(observation, action=None):
+    """Model.to_state(action) of an Observation or ObservationSeries, without its results."""
+    from sensetdp.models import Model, ObservationSeries
+
+    state = Model.__getstate__(observation, action)
+    state.pop('results', None)
+    if isinstance(observation, ObservationSeries):
+        if observation.streamid is None:
+            del state['streamid']
+    elif observation.stream:
+        state['streamid'] = observation.stream.to_state(action).get('id')
+    return state
+
+
+def dumps_observation_results(observation, action=None, allow_nan=True):
+    """JSON array of the results of an Observation or ObservationSeries."""
+    from sensetdp.models import ObservationSeries
+
+    if isinstance(observation, ObservationSeries):
+        return dumps_series_results(observation, allow_nan)
+    return dumps_results(observation.results or [], action, allow_nan)
+
+
+def join_results(body, results):
+    """
+    Add a "results" member, JSON encoded apart, to an encoded JSON object.
+
+    :param body: utf-8 bytes of a JSON object
+    :param results: JSON array text, see dumps_results
+    :return: utf-8 bytes
+    """
+    body = body.rstrip()
+    separator = b'' if body[:-1].rstrip() == b'{' else b', '
+    return body[:-1] + separator + b'"results": ' + results.encode('utf-8') + b'}'
+
+
+def dumps_observation(observation, action=None):
+    """Model.to_json(action) of an Observation or ObservationSeries."""
+    state = observation_state(observation, action)
+    state['results'] = None
+    results = dumps_observation_results(observation, action)
+    parts = []
+    for key in sorted(state):
+        value = results if key == 'results' else _dumps(state[key])
+        parts.append('%s: %s' % (encode_basestring_ascii(key), value))
+    return '{%s}' % ', '.join(parts)
@@ -0,0 +1,126 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PoolStats(object):
+    """Thread safe connection pool hit/miss counters, overall and per host."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hosts = {}
+
+    def record(self, host, hit):
+        with self.lock:
+            counters = self.hosts.setdefault(host, {'hits': 0, 'misses': 0})
+            if hit:
+                self.hits += 1
+                counters['hits'] += 1
+            else:
+                self.misses += 1
+                counters['misses'] += 1
+
+    def reset(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+            self.hosts = {}
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hosts': dict((host, dict(counters)) for host, counters in self.hosts.items()),
+            }
+
+    def __repr__(self):
+        return 'PoolStats(hits=%d, misses=%d)' % (self.hits, self.misses)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that records whether each request was served from an already
+    open (keep-alive) connection or had to open a new one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.stats = PoolStats()
+        super(PooledHTTPAdapter, self).__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PooledHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager._new_pool = self._counting_pool_factory(self.poolmanager._new_pool)
+
+    def _counting_pool_factory(self, new_pool):
+        stats = self.stats
+
+        def _new_pool(*args, **kwargs):
+            pool = new_pool(*args, **kwargs)
+            host = '%s:%s' % (pool.host, pool.port)
+            get_conn = pool._get_conn
+
+            def _get_conn(*conn_args, **conn_kwargs):
+                conn = get_conn(*conn_args, **conn_kwargs)
+                # a connection with a live socket is a keep-alive reuse, anything
+                # else (fresh or dropped by the server) needs a new handshake.
+                stats.record(host, getattr(conn, 'sock', None) is not None)
+                return conn
+
+            pool._get_conn = _get_conn
+            return pool
+
+        return _new_pool
+
+
+def build_session(pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True, verify=True):
+    """
+    Build the long lived requests session shared by every bound API method.
+
+    :param pool_connections: number of per host connection pools to keep
+    :param pool_maxsize: maximum number of open connections kept per host
+    :param pool_block: block when a host's pool is exhausted instead of opening extra connections
+    :param keep_alive: reuse connections between requests
+    :param verify: verify TLS certificates
+    :return: requests.Session
+    """
+    session = requests.Session()
+    # Only send the headers the binder asks for, same as the previous per method sessions.
+    session.headers.clear()
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    session.verify = verify
+
+    adapter = PooledHTTPAdapter(pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize,
+                                pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
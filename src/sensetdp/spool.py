@@ -0,0 +1,261 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import os
+import io
+import json
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger('sensetdp.spool')
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+class Spool(object):
+    """
+    Durable append only spool of create_observations batches, so points survive
+    the portal being unreachable and the process restarting.
+
+    Batches are appended as checksummed JSON lines to numbered segment files in
+    `path`, a new segment being started once the current one reaches
+    segment_bytes. Every append is flushed to the OS, and fsynced at most every
+    fsync_interval seconds (0 fsyncs every append), trading the last moments of
+    data on power loss for throughput. The replay position is kept in a cursor
+    file; segments before it are deleted. See Replayer for sending the backlog.
+    """
+
+    suffix = '.seg'
+
+    def __init__(self, path, segment_bytes=64 * 1024 * 1024, fsync_interval=1.0):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.lock = threading.RLock()
+        self._last_sync = time.time()
+        self._dirty = False
+
+        if not os.path.exists(path):
+            os.makedirs(path)
+        segments = self.segments()
+        # after the cursor when starting empty, so new batches are never skipped
+        self._active_seq = segments[-1] if segments else self.position()[0] + 1
+        self._active = io.open(self._segment_path(self._active_seq), 'ab')
+
+    def _segment_path(self, seq):
+        return os.path.join(self.path, '%012d%s' % (seq, self.suffix))
+
+    def _cursor_path(self):
+        return os.path.join(self.path, 'cursor.json')
+
+    def segments(self):
+        """Sequence numbers of the segment files, oldest first."""
+        return sorted(int(name[:-len(self.suffix)]) for name in os.listdir(self.path)
+                      if name.endswith(self.suffix) and name[:-len(self.suffix)].isdigit())
+
+    def append(self, streamid, results):
+        """
+        Append a batch of results for a stream.
+        :raise ValueError: for NaN and infinite values, which could never be sent
+        """
+        data = json.dumps({'streamid': streamid, 'results': results}, separators=(',', ':'),
+                          allow_nan=False).encode('utf-8')
+        record = ('%08x ' % (zlib.crc32(data) & 0xffffffff)).encode('ascii') + data + b'\n'
+        with self.lock:
+            self._active.write(record)
+            self._active.flush()
+            self._dirty = True
+            if self.fsync_interval <= 0 or time.time() - self._last_sync >= self.fsync_interval:
+                self.sync()
+            if self._active.tell() >= self.segment_bytes:
+                self._roll()
+
+    def _roll(self):
+        self.sync()
+        self._active.close()
+        self._active_seq += 1
+        self._active = io.open(self._segment_path(self._active_seq), 'ab')
+
+    def sync(self):
+        """fsync the active segment."""
+        with self.lock:
+            if self._dirty:
+                self._active.flush()
+                os.fsync(self._active.fileno())
+                self._dirty = False
+            self._last_sync = time.time()
+
+    def close(self):
+        with self.lock:
+            if not self._active.closed:
+                self.sync()
+                self._active.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def position(self):
+        """(segment, offset) of the first batch not replayed yet."""
+        try:
+            with io.open(self._cursor_path(), 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+            return cursor['segment'], cursor['offset']
+        except (IOError, OSError, ValueError, KeyError):
+            segments = self.segments()
+            return (segments[0] if segments else 0), 0
+
+    def commit(self, position):
+        """Record that everything before position was replayed, deleting replayed segments."""
+        with self.lock:
+            tmp = self._cursor_path() + '.tmp'
+            with io.open(tmp, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'segment': position[0], 'offset': position[1]}))
+                f.flush()
+                os.fsync(f.fileno())
+            _replace(tmp, self._cursor_path())
+            for seq in self.segments():
+                if seq < position[0]:
+                    os.remove(self._segment_path(seq))
+
+    def pending(self):
+        """True when there are batches that were not replayed yet."""
+        with self.lock:
+            segment, offset = self.position()
+            return segment < self._active_seq or offset < self._active.tell()
+
+    def read(self, position=None):
+        """
+        Yield (streamid, results, next position) for the batches from position
+        (default: the cursor) on, one line in memory at a time. Stops at an
+        incomplete last line, that is a batch still being written.
+        """
+        segment, offset = position or self.position()
+        for seq in self.segments():
+            if seq < segment:
+                continue
+            start = offset if seq == segment else 0
+            with io.open(self._segment_path(seq), 'rb') as f:
+                f.seek(start)
+                while True:
+                    line = f.readline()
+                    if not line:
+                        break
+                    if not line.endswith(b'\n'):
+                        if seq == self._active_seq:
+                            return  # being appended
+                        log.warning('Skipping truncated record in spool segment %d', seq)
+                        break
+                    batch = self._decode(line, seq)
+                    if batch is not None:
+                        yield batch[0], batch[1], (seq, f.tell())
+            # move past a fully read segment so it is deleted on commit
+            if seq < self._active_seq:
+                segment, offset = seq + 1, 0
+
+    def _decode(self, line, seq):
+        checksum, _, data = line.rstrip(b'\n').partition(b' ')
+        try:
+            if int(checksum, 16) != zlib.crc32(data) & 0xffffffff:
+                raise ValueError('checksum mismatch')
+            batch = json.loads(data.decode('utf-8'))
+            return batch['streamid'], batch['results']
+        except (ValueError, KeyError) as e:
+            log.warning('Skipping corrupt record in spool segment %d: %s', seq, e)
+            return None
+
+
+class Replayer(object):
+    """
+    Sends the batches of a Spool with create_observations, in the order they
+    were spooled, committing the spool cursor after each successful upload:
+
+        sent = Replayer(spool, api).replay()
+
+    Consecutive batches are coalesced per stream into requests of up to
+    max_points results, holding only those in memory. Results already sent
+    are skipped by (streamid, t), remembering the last dedupe_window of them.
+    replay() stops at the first failed upload, leaving the rest in the spool.
+    """
+
+    def __init__(self, spool, api, max_points=10000, dedupe_window=100000, **kwargs):
+        self.spool = spool
+        self.api = api
+        self.max_points = max_points
+        self.dedupe_window = dedupe_window
+        self.kwargs = kwargs
+        self._seen = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _mark_sent(self, streamid, results):
+        for result in results:
+            self._seen[(streamid, result['t'])] = None
+        while len(self._seen) > self.dedupe_window:
+            self._seen.popitem(last=False)
+
+    def _next_group(self, records):
+        groups = OrderedDict()
+        keys = set()
+        count = 0
+        position = None
+        for streamid, results, next_position in records:
+            group = groups.setdefault(streamid, [])
+            for result in results:
+                key = (streamid, result['t'])
+                if key not in self._seen and key not in keys:
+                    keys.add(key)
+                    group.append(result)
+                    count += 1
+            position = next_position
+            if count >= self.max_points:
+                break
+        return groups, position
+
+    def replay(self):
+        """
+        Send the spooled backlog.
+        :return: number of results sent
+        :raises: the upload error, after sending and committing what came before it
+        """
+        sent = 0
+        with self.lock:
+            while True:
+                records = self.spool.read()
+                try:
+                    groups, position = self._next_group(records)
+                finally:
+                    records.close()
+                if position is None:
+                    return sent
+                for streamid, results in groups.items():
+                    if results:
+                        self.api.create_observations(streamid=streamid, results=results, **self.kwargs)
+                        self._mark_sent(streamid, results)
+                        sent += len(results)
+                self.spool.commit(position)
@@ -24,9 +24,11 @@ THE SOFTWARE.
 
 from __future__ import print_function
 
+import re
 import json
 import enum
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
 import six
 
@@ -37,6 +39,54 @@ def parse_datetime(string):
     return datetime(*(parsedate(string)[:6]))
 
 
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+
+def format_timestamp(dt):
+    """Format a datetime the way the API expects observation timestamps."""
+    return dt.strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(string):
+    """Parse an API timestamp, e.g. '2016-02-15T00:00:00.000Z', into a naive UTC datetime."""
+    string = string.rstrip('Z')
+    if '.' in string:
+        string, fraction = string.split('.', 1)
+        microsecond = int((fraction + '000000')[:6])
+    else:
+        microsecond = 0
+    return datetime.strptime(string, '%Y-%m-%dT%H:%M:%S').replace(microsecond=microsecond)
+
+
+EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = EPOCH.toordinal()
+_re_timestamp = re.compile(r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:\.(\d+))?Z?$')
+
+
+def timestamp_to_ns(value):
+    """Epoch nanoseconds of an API timestamp string or a UTC datetime (naive or aware)."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None) - value.utcoffset()
+        days = value.toordinal() - _EPOCH_ORDINAL
+        seconds = value.hour * 3600 + value.minute * 60 + value.second
+        return (days * 86400 + seconds) * 1000000000 + value.microsecond * 1000
+
+    match = _re_timestamp.match(value)
+    if match is None:
+        raise ValueError('Invalid timestamp: %r' % value)
+    year, month, day, hour, minute, second, fraction = match.groups()
+    days = date(int(year), int(month), int(day)).toordinal() - _EPOCH_ORDINAL
+    seconds = int(hour) * 3600 + int(minute) * 60 + int(second)
+    nanoseconds = int((fraction + '00000000')[:9]) if fraction else 0
+    return (days * 86400 + seconds) * 1000000000 + nanoseconds
+
+
+def format_timestamp_ns(ns):
+    """Format epoch nanoseconds like format_timestamp, truncated to microseconds."""
+    return format_timestamp(EPOCH + timedelta(microseconds=int(ns) // 1000))
+
+
 def parse_html_value(html):
     return html[html.find('>')+1:html.rfind('<')]
 
@@ -82,3 +132,73 @@ class SenseTEncoder(json.JSONEncoder):
         if isinstance(obj, enum.Enum):
             return obj.value
         return json.JSONEncoder.default(self, obj)
+
+
+class memoized_property(object):
+    """
+    Like @property, but the value is computed once per instance and then stored
+    in the instance __dict__, so later lookups are plain attribute reads.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.__name__] = self.func(instance)
+        return value
+
+
+def chunk_results(results, max_points=None, max_bytes=None, sizes=False):
+    """
+    Split observation result dicts into lists of at most max_points results and
+    about max_bytes of JSON each (estimated from the default json.dumps output).
+    A single result larger than max_bytes still gets a chunk of its own.
+
+    :param sizes: yield (chunk, estimated JSON size) pairs instead of chunks
+    """
+    measure = bool(max_bytes or sizes)
+    chunk = []
+    size = 0
+    for result in results:
+        if measure:
+            # '{"t": "", "v": }, ' around the timestamp and value
+            item_size = 18 + len(result['t']) + len(json.dumps(result['v']))
+            if max_bytes and chunk and size + item_size > max_bytes:
+                yield (chunk, size) if sizes else chunk
+                chunk, size = [], 0
+            size += item_size
+        chunk.append(result)
+        if max_points and len(chunk) >= max_points:
+            yield (chunk, size) if sizes else chunk
+            chunk, size = [], 0
+    if chunk:
+        yield (chunk, size) if sizes else chunk
+
+
+def unique(items):
+    """Items without duplicates, in their original order."""
+    seen = set()
+    return [item for item in items if not (item in seen or seen.add(item))]
+
+
+def map_concurrently(func, items, max_workers, result):
+    """
+    Call func(item) for every item on a bounded thread pool.
+
+    :param result: dict like to collect into, keyed by item; exceptions are
+        collected per item in result.errors instead of aborting the batch
+    :return: result
+    """
+    items = unique(items)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items) or 1))) as executor:
+        futures = [(item, executor.submit(func, item)) for item in items]
+        for item, future in futures:
+            try:
+                result[item] = future.result()
+            except Exception as e:
+                result.errors[item] = e
+    return result
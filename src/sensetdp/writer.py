@@ -0,0 +1,294 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import time
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+
+from six.moves import queue
+
+from sensetdp.error import SenseTError
+from sensetdp.spool import Replayer
+from sensetdp.utils import format_timestamp
+
+log = logging.getLogger('sensetdp.writer')
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+def make_result(t, v):
+    """Observation result payload, t being a datetime (naive UTC) or an API timestamp string."""
+    if isinstance(t, datetime.datetime):
+        t = format_timestamp(t)
+    return {'t': t, 'v': v}
+
+
+class Batcher(object):
+    """
+    Pending results per stream id, deciding when a stream's batch is due: once it
+    holds max_batch results or its oldest result waited max_latency seconds.
+    Not thread safe, owned by the writer's worker.
+    """
+
+    def __init__(self, max_batch, max_latency):
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.pending = OrderedDict()  # streamid: (first added, results)
+
+    def add(self, streamid, result, now):
+        """Add a result, returning the stream's batch when it is full, else None."""
+        entry = self.pending.get(streamid)
+        if entry is None:
+            entry = self.pending[streamid] = (now, [])
+        entry[1].append(result)
+        if len(entry[1]) >= self.max_batch:
+            del self.pending[streamid]
+            return entry[1]
+        return None
+
+    def next_deadline(self):
+        """Time the oldest pending batch is due, None when nothing is pending."""
+        if not self.pending:
+            return None
+        return min(first for first, results in self.pending.values()) + self.max_latency
+
+    def due(self, now):
+        """Remove and return [(streamid, results)] of the batches waiting for max_latency or longer."""
+        batches = [(streamid, results) for streamid, (first, results) in self.pending.items()
+                   if now - first >= self.max_latency]
+        for streamid, results in batches:
+            del self.pending[streamid]
+        return batches
+
+    def drain(self):
+        """Remove and return all pending batches."""
+        batches = [(streamid, results) for streamid, (first, results) in self.pending.items()]
+        self.pending.clear()
+        return batches
+
+
+class WriterStats(object):
+    def __init__(self):
+        self.points = 0
+        self.batches = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return 'WriterStats(points=%d, batches=%d, errors=%d)' % (self.points, self.batches, self.errors)
+
+
+class ObservationWriter(object):
+    """
+    Buffers observations of many streams and uploads them with one
+    create_observations call per stream batch, from a background thread:
+
+        with ObservationWriter(api, max_batch=500, max_latency=5) as writer:
+            for reading in readings:
+                writer.write(reading.streamid, reading.time, reading.value)
+
+    A stream's batch is sent once it holds max_batch results or its oldest result
+    has waited max_latency seconds, and everything pending is sent on flush()
+    and close(). Writes go through a queue of max_queue results; when uploads
+    fall behind and the queue is full, write() blocks (up to put_timeout
+    seconds, then raises SenseTError), or raises at once when block is False.
+
+    Failed uploads are passed to on_error(streamid, results, exception), or
+    logged when it is not given. Errors raised by on_error or the spool are
+    logged and the background thread carries on; should it stop anyway,
+    write(), flush() and close() raise SenseTError instead of waiting for it.
+
+    With a sensetdp.spool.Spool, batches are appended to the spool first and
+    sent from there by a Replayer, in order. When an upload fails the batches
+    stay in the spool and sending is retried every replay_interval seconds,
+    and on_error is not called, unless the batch could not be spooled. Points
+    spooled by an earlier process are sent on the first flush.
+    """
+
+    # seconds between checks that the background thread is alive while waiting on it
+    poll_interval = 1.0
+
+    def __init__(self, api, max_batch=500, max_latency=1.0, max_queue=10000, block=True, put_timeout=None,
+                 on_error=None, spool=None, replay_interval=30, **kwargs):
+        self.api = api
+        self.block = block
+        self.put_timeout = put_timeout
+        self.on_error = on_error
+        self.spool = spool
+        self.replay_interval = replay_interval
+        self.kwargs = kwargs
+        self.stats = WriterStats()
+        self.closed = False
+        self._replayer = Replayer(spool, api, max_points=max_batch, **kwargs) if spool is not None else None
+        self._replay_at = None
+        self._batcher = Batcher(max_batch, max_latency)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name='ObservationWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, streamid, t, v):
+        """
+        Queue an observation.
+        :param streamid: stream id
+        :param t: datetime (naive UTC) or API timestamp string
+        :param v: result value as sent to create_observations, e.g. {'v': 21.5}
+        """
+        self._put((streamid, make_result(t, v)))
+
+    def _put(self, item):
+        if self.closed:
+            raise SenseTError('Observation writer is closed.')
+        if self.block and self.put_timeout is None:
+            self._put_wait(item)
+            return
+        self._check_alive()
+        try:
+            self._queue.put(item, self.block, self.put_timeout)
+        except queue.Full:
+            raise SenseTError('Observation writer queue is full.')
+
+    def _check_alive(self):
+        if not self._thread.is_alive():
+            raise SenseTError('Observation writer thread stopped.')
+
+    def _put_wait(self, item):
+        """Queue item, waiting while the queue is full for as long as the background thread runs."""
+        while True:
+            self._check_alive()
+            try:
+                self._queue.put(item, True, self.poll_interval)
+                return
+            except queue.Full:
+                pass
+
+    def flush(self):
+        """Send everything written so far, waiting until it is uploaded."""
+        if self.closed:
+            raise SenseTError('Observation writer is closed.')
+        done = threading.Event()
+        self._put_wait((_FLUSH, done))
+        while not done.wait(self.poll_interval):
+            self._check_alive()
+
+    def close(self):
+        """Send everything pending and stop the background thread."""
+        if self.closed:
+            return
+        self.closed = True
+        self._put_wait((_CLOSE, None))
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _replay(self, force=False):
+        if not force and self._replay_at is not None and time.time() < self._replay_at:
+            return
+        try:
+            self.stats.points += self._replayer.replay()
+            self._replay_at = None
+        except Exception as e:
+            self.stats.errors += 1
+            self._replay_at = time.time() + self.replay_interval
+            log.warning('Sending spooled observations failed, retrying in %ss: %s', self.replay_interval, e)
+
+    def _send(self, streamid, results):
+        if self.spool is not None:
+            try:
+                self.spool.append(streamid, results)
+            except Exception as e:
+                self._failed(streamid, results, e)
+                return
+            self.stats.batches += 1
+            self._replay()
+            return
+        try:
+            self.api.create_observations(streamid=streamid, results=results, **self.kwargs)
+            self.stats.points += len(results)
+            self.stats.batches += 1
+        except Exception as e:
+            self._failed(streamid, results, e)
+
+    def _failed(self, streamid, results, error):
+        self.stats.errors += 1
+        if self.on_error is None:
+            log.error('Uploading %d observations of %s failed: %s', len(results), streamid, error)
+            return
+        try:
+            self.on_error(streamid, results, error)
+        except Exception:
+            log.exception('on_error failed for %d observations of %s', len(results), streamid)
+
+    def _handle(self, item):
+        batcher = self._batcher
+        if item is not None:
+            key, value = item
+            if key is _FLUSH or key is _CLOSE:
+                try:
+                    for streamid, results in batcher.drain():
+                        self._send(streamid, results)
+                    if self.spool is not None:
+                        self._replay(force=True)
+                        self.spool.sync()
+                finally:
+                    if key is _FLUSH:
+                        value.set()
+                return
+            batch = batcher.add(key, value, time.time())
+            if batch is not None:
+                self._send(key, batch)
+
+        for streamid, results in batcher.due(time.time()):
+            self._send(streamid, results)
+        if self._replay_at is not None and time.time() >= self._replay_at:
+            self._replay()
+
+    def _run(self):
+        batcher = self._batcher
+        while True:
+            deadline = batcher.next_deadline()
+            if self._replay_at is not None:
+                deadline = self._replay_at if deadline is None else min(deadline, self._replay_at)
+            try:
+                if deadline is None:
+                    item = self._queue.get()
+                else:
+                    item = self._queue.get(timeout=max(deadline - time.time(), 0))
+            except queue.Empty:
+                item = None
+
+            try:
+                self._handle(item)
+            except Exception:
+                # keep the thread alive, flush() and close() wait on it
+                self.stats.errors += 1
+                log.exception('Observation writer failed')
+            if item is not None and item[0] is _CLOSE:
+                return
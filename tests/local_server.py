@@ -0,0 +1,109 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import json
+import threading
+
+import six
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import urlparse, parse_qs
+
+from sensetdp.api import API
+
+
+class LocalHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_any(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        request = {
+            'method': self.command,
+            'path': url.path,
+            'query': dict((k, v[0]) for k, v in parse_qs(url.query).items()),
+            'headers': dict(self.headers.items()),
+            'body': body,
+        }
+        self.server.requests.append(request)
+
+        route = self.server.routes.get((self.command, url.path))
+        if route is None:
+            status, headers, payload = 404, {}, {'status': 404, 'message': 'Not found'}
+        elif callable(route):
+            status, headers, payload = route(request)
+        else:
+            status, headers, payload = route
+
+        if not isinstance(payload, six.binary_type):
+            if not isinstance(payload, six.text_type):
+                payload = json.dumps(payload)
+            payload = payload.encode('utf-8')
+
+        self.send_response(status)
+        headers = dict(headers)
+        headers.setdefault('Content-Type', 'application/json')
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(payload)
+
+    do_GET = do_PUT = do_POST = do_DELETE = handle_any
+
+
+class LocalServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Stand-in for the Sense-T portal, serving canned responses keyed by (method, path).
+    A route is either a (status, headers, payload) tuple or a callable taking the
+    recorded request dict and returning one.
+    """
+    daemon_threads = True
+
+    def __init__(self, routes=None):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0), LocalHandler)
+        self.routes = routes or {}
+        self.requests = []
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def host(self):
+        return '%s:%s' % self.server_address
+
+    def api(self, **kwargs):
+        kwargs.setdefault('scheme', 'http')
+        return API(host=self.host, **kwargs)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,264 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Python 3 only (async def), tox runs it apart from the other tests, see aio_tests.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import json
+import time
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.cache import MemoryCache
+from sensetdp.circuit import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from sensetdp.error import SenseTError
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    try:
+        import asyncio
+        from sensetdp.aio import AsyncAPI, AsyncObservationWriter
+    except ImportError:
+        AsyncAPI = None
+    try:
+        import pandas
+    except ImportError:
+        pandas = None
+else:
+    import unittest2 as unittest
+    AsyncAPI = None
+    pandas = None
+
+
+STREAM = {'id': 'stream_1', 'resulttype': 'scalarvalue'}
+
+
+@unittest.skipIf(AsyncAPI is None, 'aiohttp is not installed')
+class AsyncAPITestCase(unittest.TestCase):
+    def setUp(self):
+        self.failures = 0
+
+        def flaky(request):
+            if self.failures:
+                self.failures -= 1
+                return 503, {}, {'status': 503, 'message': 'Unavailable'}
+            return 200, {}, {'results': [], 'query': request['query']}
+
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams/stream_1'): (200, {}, STREAM),
+            ('GET', '/api/sensor/v2/observations'): flaky,
+            ('POST', '/api/sensor/v2/observations'): (201, {}, {'status': 201, 'message': 'Observations uploaded'}),
+        }).__enter__()
+        self.auth = HTTPBasicAuth('username', 'password')
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def api(self, **kwargs):
+        return AsyncAPI(self.auth, host=self.server.host, scheme='http', **kwargs)
+
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_get_stream(self):
+        async def run():
+            async with self.api() as api:
+                return await api.get_stream(id='stream_1'), api.pool_stats.to_dict()
+
+        stream, stats = self.run_async(run())
+        self.assertEqual(stream.id, 'stream_1')
+        self.assertEqual(stream.result_type.value, 'scalarvalue')
+        self.assertTrue(self.server.requests[0]['headers']['Authorization'].startswith('Basic '))
+        self.assertEqual(stats['misses'], 1)
+
+    def test_query_params(self):
+        async def run():
+            async with self.api() as api:
+                return await api.get_observations(streamid='stream_1', limit=10, si=True)
+
+        result = self.run_async(run())
+        self.assertEqual(result['query'], {'streamid': 'stream_1', 'limit': '10', 'si': 'True'})
+
+    def test_concurrent_requests_share_pool(self):
+        async def run():
+            async with self.api(pool_maxsize=4) as api:
+                streams = await asyncio.gather(*[api.get_stream(id='stream_1') for _ in range(20)])
+                return streams, api.pool_stats
+
+        streams, stats = self.run_async(run())
+        self.assertEqual(len(streams), 20)
+        self.assertLessEqual(stats.misses, 4)
+        self.assertEqual(stats.hits + stats.misses, 20)
+
+    def test_retry(self):
+        self.failures = 2
+
+        async def run():
+            async with self.api(retry_count=2, retry_delay=0.01) as api:
+                return await api.get_observations(streamid='stream_1')
+
+        self.assertEqual(self.run_async(run())['results'], [])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_error(self):
+        self.failures = 1
+
+        async def run():
+            async with self.api() as api:
+                await api.get_observations(streamid='stream_1')
+
+        with self.assertRaises(SenseTError) as cm:
+            self.run_async(run())
+        self.assertEqual(cm.exception.api_code, 503)
+        self.assertEqual(cm.exception.response.status_code, 503)
+
+    def test_read_timeout(self):
+        def slow(request):
+            time.sleep(0.5)
+            return 200, {}, STREAM
+        self.server.routes[('GET', '/api/sensor/v2/streams/stream_1')] = slow
+
+        async def run():
+            async with self.api(read_timeout=0.1) as api:
+                await api.get_stream(id='stream_1')
+
+        with self.assertRaises(SenseTError) as cm:
+            self.run_async(run())
+        self.assertIn('Failed to send request', str(cm.exception))
+
+    def test_cache(self):
+        async def run():
+            async with self.api(cache=MemoryCache()) as api:
+                await api.get_stream(id='stream_1')
+                await api.get_stream(id='stream_1')
+                return api.cached_result
+
+        self.assertTrue(self.run_async(run()))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_get_streams_many(self):
+        async def run():
+            async with self.api() as api:
+                return await api.get_streams_many(['stream_1', 'missing'])
+
+        result = self.run_async(run())
+        self.assertEqual(list(result.keys()), ['stream_1'])
+        self.assertEqual(list(result.errors.keys()), ['missing'])
+
+    def test_ingest_observations(self):
+        results = [{'t': '2016-02-15T00:0%d:00.000Z' % i, 'v': {'v': i}} for i in range(5)]
+        self.server.routes[('POST', '/api/sensor/v2/observations')] = \
+            (503, {}, {'status': 503, 'message': 'Unavailable'})
+
+        async def run():
+            async with self.api() as api:
+                return await api.ingest_observations({'stream_1': results, 'stream_2': results[:2]},
+                                                     max_points=2, max_workers=2, retry_count=0)
+
+        report = self.run_async(run())
+        # failed uploads are reported, not silently dropped
+        self.assertFalse(report.ok)
+        self.assertEqual(len(self.server.requests), 4)
+
+        self.server.routes[('POST', '/api/sensor/v2/observations')] = \
+            (201, {}, {'status': 201, 'message': 'Observations uploaded'})
+        report = self.run_async(run())
+        self.assertTrue(report.ok)
+        self.assertEqual(report.stats.points_done, 7)
+        self.assertEqual(len(self.server.requests), 8)
+
+    @unittest.skipIf(pandas is None, 'pandas is not installed')
+    def test_upload_dataframe(self):
+        index = pandas.to_datetime(['2016-02-15 00:00:00', '2016-02-15 00:15:00', '2016-02-15 00:30:00'])
+        frame = pandas.DataFrame({'stream_1': [1.5, 2.0, 3.0]}, index=index)
+
+        async def run():
+            async with self.api() as api:
+                return await api.upload_dataframe(frame, max_points=2)
+
+        responses = self.run_async(run())
+        self.assertEqual(len(responses['stream_1']), 2)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual([json.loads(r['body'].decode('utf-8'))['results'][0] for r in self.server.requests],
+                         [{'t': '2016-02-15T00:00:00.000000Z', 'v': {'v': 1.5}},
+                          {'t': '2016-02-15T00:30:00.000000Z', 'v': {'v': 3.0}}])
+
+    def test_observation_writer(self):
+        async def run():
+            async with self.api() as api:
+                async with AsyncObservationWriter(api, max_batch=2, max_latency=60, max_queue=1) as writer:
+                    for i in range(3):
+                        await writer.write('stream_1', '2016-02-15T00:0%d:00.000Z' % i, {'v': i})
+                    await writer.flush()
+                    uploaded = len(self.server.requests)
+                return uploaded, writer.stats
+
+        uploaded, stats = self.run_async(run())
+        self.assertEqual(uploaded, 2)
+        self.assertEqual((stats.points, stats.batches), (3, 2))
+
+
+@unittest.skipIf(AsyncAPI is None, 'aiohttp is not installed')
+class AsyncCircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams/stream_1'): (503, {}, {'status': 503, 'message': 'Unavailable'}),
+        }).__enter__()
+        self.breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_cancelled_probe(self):
+        def slow(request):
+            time.sleep(0.5)
+            return 200, {}, {'id': 'stream_1'}
+
+        async def run():
+            async with AsyncAPI(HTTPBasicAuth('username', 'password'), host=self.server.host, scheme='http',
+                                circuit_breaker=self.breaker) as api:
+                with self.assertRaises(SenseTError):
+                    await api.get_stream(id='stream_1', retry_count=0)
+                self.assertEqual(self.breaker.state(self.server.host, 'GET /streams/{id}'), OPEN)
+
+                # the probe is cancelled before it has an outcome
+                self.server.routes[('GET', '/api/sensor/v2/streams/stream_1')] = slow
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(api.get_stream(id='stream_1'), 0.1)
+                self.assertEqual(self.breaker.state(self.server.host, 'GET /streams/{id}'), HALF_OPEN)
+
+                # and the next call probes again instead of failing fast
+                stream = await api.get_stream(id='stream_1')
+                self.assertEqual(stream.id, 'stream_1')
+                self.assertEqual(self.breaker.state(self.server.host, 'GET /streams/{id}'), CLOSED)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
@@ -0,0 +1,86 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+from sensetdp.api import API
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.binder import compile_path
+from sensetdp.error import SenseTError
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class BinderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = API(HTTPBasicAuth('username', 'password'))
+
+    def test_compile_path(self):
+        self.assertEqual(compile_path('/streams'), (['/streams'], []))
+        self.assertEqual(compile_path('/streams/{id}'), (['/streams/', ''], ['id']))
+        self.assertEqual(compile_path('/a/{x}/b/{y}.json'), (['/a/', '/b/', '.json'], ['x', 'y']))
+
+    def test_bound_methods_memoized(self):
+        self.assertIs(self.api.get_stream, self.api.get_stream)
+        self.assertIs(self.api.update_stream, self.api.create_stream)
+        self.assertIsNot(self.api.get_stream, API().get_stream)
+
+    def test_build_path(self):
+        method = self.api.get_stream(id='a stream/1', create=True)
+        self.assertEqual(method.path, '/streams/a%20stream/1')
+        self.assertNotIn('id', method.params)
+
+        method = self.api.get_stream('stream_1', create=True)
+        self.assertEqual(method.path, '/streams/stream_1')
+
+    def test_build_path_missing_variable(self):
+        with self.assertRaises(SenseTError):
+            self.api.get_stream(create=True)
+
+
+class QueryParamsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('DELETE', '/api/sensor/v2/platforms/platform_1'): (200, {}, {'id': 'platform_1'}),
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def test_params_in_query_without_json(self):
+        self.api.destroy_platform(id='platform_1', cascade=True, use_json=False)
+        request = self.server.requests[-1]
+        self.assertEqual(request['query'], {'cascade': 'True'})
+        self.assertEqual(request['body'], b'')
+
+    def test_params_in_body_with_json(self):
+        self.api.destroy_platform(id='platform_1', cascade=True)
+        request = self.server.requests[-1]
+        self.assertEqual(request['query'], {})
+        self.assertIn(b'"cascade"', request['body'])
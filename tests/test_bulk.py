@@ -0,0 +1,74 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import time
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.error import SenseTError
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+def slow_stream(stream_id):
+    def route(request):
+        time.sleep(0.1)
+        return 200, {}, {'id': stream_id}
+    return route
+
+
+class BulkFetchTestCase(unittest.TestCase):
+    ids = ['stream_%d' % i for i in range(10)]
+
+    def setUp(self):
+        routes = dict((('GET', '/api/sensor/v2/streams/%s' % i), slow_stream(i)) for i in self.ids)
+        routes[('GET', '/api/sensor/v2/observations')] = lambda request: (200, {}, {'streamid': request['query']['streamid']})
+        self.server = LocalServer(routes).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_get_streams_many(self):
+        started = time.time()
+        result = self.api.get_streams_many(self.ids + ['missing', self.ids[0]], max_workers=10)
+        elapsed = time.time() - started
+
+        self.assertEqual(list(result.keys()), self.ids)
+        self.assertEqual(result['stream_3'].id, 'stream_3')
+        self.assertFalse(result.ok)
+        self.assertEqual(list(result.errors.keys()), ['missing'])
+        self.assertIsInstance(result.errors['missing'], SenseTError)
+        # ten 100ms requests in parallel
+        self.assertLess(elapsed, 0.5)
+
+    def test_get_observations_many(self):
+        result = self.api.get_observations_many(['a', 'b'], limit=5)
+        self.assertEqual(result['a'], {'streamid': 'a'})
+        self.assertTrue(result.ok)
+        self.assertEqual(self.server.requests[0]['query']['limit'], '5')
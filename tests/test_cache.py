@@ -0,0 +1,242 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import os
+import time
+import shutil
+import tempfile
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.cache import MemoryCache, DiskCache
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+class MemoryCacheTestCase(unittest.TestCase):
+    def test_store_get(self):
+        cache = MemoryCache()
+        cache.store('a', {'id': 'a'})
+        self.assertEqual(cache.get('a'), {'id': 'a'})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.count(), 1)
+
+    def test_expiry(self):
+        cache = MemoryCache(timeout=60)
+        cache.store('a', 1)
+        cache.store('b', 2, timeout=0.01)
+        time.sleep(0.02)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNone(cache.get('a', timeout=0.01))
+
+    def test_lru_eviction(self):
+        cache = MemoryCache(max_entries=2)
+        cache.store('a', 1)
+        cache.store('b', 2)
+        cache.get('a')
+        cache.store('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_byte_budget(self):
+        cache = MemoryCache(max_bytes=1000, sizeof=len)
+        cache.store('a', 'x' * 400)
+        cache.store('b', 'x' * 400)
+        cache.store('c', 'x' * 400)
+        self.assertEqual(cache.count(), 2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.size, 800)
+
+        cache.store('d', 'x' * 2000)
+        self.assertIsNone(cache.get('d'))
+
+    def test_cleanup_flush(self):
+        cache = MemoryCache(timeout=0.01)
+        cache.store('a', 1)
+        cache.store('b', 2, timeout=60)
+        time.sleep(0.02)
+        cache.cleanup()
+        self.assertEqual(cache.count(), 1)
+        cache.flush()
+        self.assertEqual(cache.count(), 0)
+
+
+class ApiCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        streams = {'_embedded': {'streams': [{'id': 'stream_1', 'resulttype': 'scalarvalue'}]}}
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams/stream_1'): (200, {}, {'id': 'stream_1', 'resulttype': 'scalarvalue'}),
+            ('GET', '/api/sensor/v2/streams'): (200, {}, streams),
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), cache=MemoryCache())
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_get_cached(self):
+        first = self.api.get_stream(id='stream_1')
+        self.assertFalse(self.api.cached_result)
+        second = self.api.get_stream(id='stream_1')
+        self.assertTrue(self.api.cached_result)
+        self.assertIs(first, second)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_query_params_in_key(self):
+        self.api.streams(limit=10)
+        self.api.streams(limit=20)
+        self.api.streams(limit=10)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.api.cache.count(), 2)
+
+
+class DiskCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache', 'sensetdp.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_store_get(self):
+        cache = DiskCache(self.path)
+        cache.store('a', '{"id": "a"}')
+        self.assertEqual(cache.get('a'), '{"id": "a"}')
+        self.assertIsNone(cache.get('b'))
+
+        # survives reopening, e.g. from another process
+        self.assertEqual(DiskCache(self.path).get('a'), '{"id": "a"}')
+
+    def test_expiry(self):
+        cache = DiskCache(self.path, timeout=60)
+        cache.store('a', 'a')
+        cache.store('b', 'b', timeout=0.01)
+        time.sleep(0.02)
+        self.assertEqual(cache.get('a'), 'a')
+        self.assertIsNone(cache.get('b'))
+        cache.store('c', 'c', timeout=0.01)
+        time.sleep(0.02)
+        cache.cleanup()
+        self.assertEqual(cache.count(), 1)
+
+    def test_eviction(self):
+        cache = DiskCache(self.path, max_bytes=1000)
+        cache.store('a', 'x' * 400)
+        time.sleep(0.01)
+        cache.store('b', 'x' * 400)
+        time.sleep(0.01)
+        cache.get('a')
+        cache.store('c', 'x' * 400)
+        self.assertEqual(cache.count(), 2)
+        self.assertIsNone(cache.get('b'))
+
+        cache = DiskCache(self.path, max_entries=1)
+        cache.store('d', 'd')
+        self.assertEqual(cache.count(), 1)
+        self.assertEqual(cache.get('d'), 'd')
+
+    def test_size_in_bytes(self):
+        cache = DiskCache(self.path, max_bytes=1000)
+        # 400 characters, 800 bytes in utf-8
+        cache.store('a', '\u00e9' * 400)
+        self.assertEqual(cache.get('a'), '\u00e9' * 400)
+        cache.store('b', '\u00e9' * 400)
+        self.assertEqual(cache.count(), 1)
+        self.assertIsNone(cache.get('a'))
+        cache.store('c', '\u00e9' * 501)
+        self.assertIsNone(cache.get('c'))
+
+    def test_api_parses_cached_payload(self):
+        payload = {'id': 'stream_1', 'resulttype': 'scalarvalue'}
+        with LocalServer({('GET', '/api/sensor/v2/streams/stream_1'): (200, {}, payload)}) as server:
+            auth = HTTPBasicAuth('username', 'password')
+            server.api(auth_handler=auth, cache=DiskCache(self.path)).get_stream(id='stream_1')
+
+            api = server.api(auth_handler=auth, cache=DiskCache(self.path))
+            stream = api.get_stream(id='stream_1')
+            self.assertTrue(api.cached_result)
+            self.assertEqual(len(server.requests), 1)
+            self.assertEqual(stream.id, 'stream_1')
+            self.assertIs(stream._api, api)
+
+
+class RevalidationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.version = '"v1"'
+
+        def stream(request):
+            if request['headers'].get('If-None-Match') == self.version:
+                return 304, {'ETag': self.version}, b''
+            return 200, {'ETag': self.version}, {'id': 'stream_1', 'version': self.version}
+
+        self.server = LocalServer({('GET', '/api/sensor/v2/streams/stream_1'): stream}).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.directory)
+
+    def check_revalidation(self, cache):
+        api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), cache=cache)
+        self.assertEqual(api.get_stream(id='stream_1').version, '"v1"')
+        time.sleep(0.06)
+
+        # expired, but unchanged on the server
+        stream = api.get_stream(id='stream_1')
+        self.assertTrue(api.cached_result)
+        self.assertEqual(stream.version, '"v1"')
+        self.assertEqual(api.last_response.status_code, 304)
+        self.assertEqual(self.server.requests[1]['headers'].get('If-None-Match'), '"v1"')
+
+        # refreshed entry is served without a request
+        api.get_stream(id='stream_1')
+        self.assertEqual(len(self.server.requests), 2)
+
+        # changed on the server
+        time.sleep(0.06)
+        self.version = '"v2"'
+        stream = api.get_stream(id='stream_1')
+        self.assertFalse(api.cached_result)
+        self.assertEqual(stream.version, '"v2"')
+
+    def test_memory_cache(self):
+        self.check_revalidation(MemoryCache(timeout=0.05))
+
+    def test_disk_cache(self):
+        self.check_revalidation(DiskCache(os.path.join(self.directory, 'cache.sqlite'), timeout=0.05))
+
+    def test_caller_headers_not_modified(self):
+        api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), cache=MemoryCache(timeout=0.05))
+        headers = {'X-Trace': 'abc'}
+        api.get_stream(id='stream_1', headers=headers)
+        time.sleep(0.06)
+        api.get_stream(id='stream_1', headers=headers)
+        self.assertEqual(self.server.requests[1]['headers'].get('If-None-Match'), '"v1"')
+        self.assertEqual(self.server.requests[1]['headers'].get('X-Trace'), 'abc')
+        self.assertEqual(headers, {'X-Trace': 'abc'})
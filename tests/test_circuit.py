@@ -0,0 +1,155 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.circuit import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from sensetdp.error import SenseTError, CircuitOpenError
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+
+class Clock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def response(status_code):
+    return mock.Mock(status_code=status_code)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30, clock=self.clock)
+
+    def fail(self, times, endpoint='GET /streams/{id}'):
+        for _ in range(times):
+            self.breaker.acquire('host', endpoint)
+            self.breaker.record('host', endpoint, error=IOError('timed out'))
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.breaker.record('host', 'GET /streams/{id}', response(404))
+        self.fail(2)
+        self.assertEqual(self.breaker.state('host', 'GET /streams/{id}'), CLOSED)
+        self.fail(1)
+        self.assertEqual(self.breaker.state('host', 'GET /streams/{id}'), OPEN)
+
+        with self.assertRaises(CircuitOpenError) as cm:
+            self.breaker.acquire('host', 'GET /streams/{id}')
+        self.assertEqual(cm.exception.retry_after, 30)
+        self.assertIsInstance(cm.exception, SenseTError)
+
+        # other endpoints are tracked separately
+        self.breaker.acquire('host', 'GET /observations')
+
+    def test_half_open(self):
+        self.fail(3)
+        self.clock.now += 30
+        self.breaker.acquire('host', 'GET /streams/{id}')
+        self.assertEqual(self.breaker.state('host', 'GET /streams/{id}'), HALF_OPEN)
+        # a single probe at a time
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.acquire('host', 'GET /streams/{id}')
+
+        # a failed probe opens the circuit again
+        self.breaker.record('host', 'GET /streams/{id}', response(503))
+        self.assertEqual(self.breaker.state('host', 'GET /streams/{id}'), OPEN)
+        self.clock.now += 29
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.acquire('host', 'GET /streams/{id}')
+
+        # a successful one closes it
+        self.clock.now += 1
+        self.breaker.acquire('host', 'GET /streams/{id}')
+        self.breaker.record('host', 'GET /streams/{id}', response(200))
+        self.assertEqual(self.breaker.state('host', 'GET /streams/{id}'), CLOSED)
+        self.assertEqual(self.breaker.to_dict()['host GET /streams/{id}'],
+                         {'state': CLOSED, 'failures': 0, 'trips': 2})
+
+    def test_release(self):
+        self.fail(3)
+        self.clock.now += 30
+        self.breaker.acquire('host', 'GET /streams/{id}')
+        # the probe ended without an outcome, e.g. it was cancelled
+        self.breaker.release('host', 'GET /streams/{id}')
+        self.assertEqual(self.breaker.state('host', 'GET /streams/{id}'), HALF_OPEN)
+        self.breaker.acquire('host', 'GET /streams/{id}')
+
+    def test_per_host(self):
+        self.breaker.per_endpoint = False
+        self.fail(2, 'GET /streams/{id}')
+        self.fail(1, 'GET /observations')
+        self.assertEqual(self.breaker.state('host'), OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.acquire('host', 'GET /platforms')
+
+
+class CircuitBreakerApiTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams/stream_1'): (503, {}, {'status': 503, 'message': 'Unavailable'}),
+        }).__enter__()
+        self.breaker = CircuitBreaker(failure_threshold=2)
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), circuit_breaker=self.breaker)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def test_fails_fast(self):
+        with mock.patch('time.sleep'):
+            with self.assertRaises(CircuitOpenError):
+                self.api.get_stream(id='stream_1', retry_count=5)
+        self.assertEqual(len(self.server.requests), 2)
+
+        with self.assertRaises(CircuitOpenError):
+            self.api.get_stream(id='stream_1')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.breaker.state(self.server.host, 'GET /streams/{id}'), OPEN)
+
+    def test_build_auth_error_releases_probe(self):
+        self.breaker.failure_threshold = 1
+        self.breaker.recovery_timeout = 0
+        with self.assertRaises(SenseTError):
+            self.api.get_stream(id='stream_1', retry_count=0)
+        self.assertEqual(self.breaker.state(self.server.host, 'GET /streams/{id}'), OPEN)
+
+        with mock.patch.object(self.api.auth, 'apply_auth', side_effect=ValueError('no token')):
+            with self.assertRaises(ValueError):
+                self.api.get_stream(id='stream_1')
+        self.server.routes[('GET', '/api/sensor/v2/streams/stream_1')] = (200, {}, {'id': 'stream_1'})
+        self.api.get_stream(id='stream_1')
+        self.assertEqual(self.breaker.state(self.server.host, 'GET /streams/{id}'), CLOSED)
+
@@ -0,0 +1,150 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import datetime
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.cursor import Cursor, ObservationWindowIterator
+from sensetdp.error import SenseTError
+from sensetdp.utils import format_timestamp, parse_timestamp
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+def listing(key, total):
+    def route(request):
+        skip = int(request['query'].get('skip', 0))
+        limit = int(request['query'].get('limit', 100))
+        items = [{'id': '%s_%d' % (key, i)} for i in range(skip, min(skip + limit, total))]
+        return 200, {}, {'_embedded': {key: items}, 'count': len(items)}
+    return route
+
+
+class CursorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams'): listing('streams', 25),
+            ('GET', '/api/sensor/v2/groups'): listing('groups', 20),
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_pagination_mode(self):
+        self.assertEqual(self.api.streams.pagination_mode, 'skip')
+        self.assertEqual(self.api.get_groups.pagination_mode, 'skip')
+        with self.assertRaises(SenseTError):
+            Cursor(self.api.get_stream)
+
+    def test_pages(self):
+        pages = list(Cursor(self.api.streams, limit=10).pages())
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(pages[2][0].id, 'streams_20')
+        # the short last page ends the walk without another request
+        self.assertEqual([r['query']['skip'] for r in self.server.requests], ['0', '10', '20'])
+
+    def test_items(self):
+        ids = [stream.id for stream in Cursor(self.api.streams, limit=10, expand=True).items()]
+        self.assertEqual(ids, ['streams_%d' % i for i in range(25)])
+        self.assertEqual(self.server.requests[0]['query']['expand'], 'True')
+
+    def test_json_listing(self):
+        groups = list(Cursor(self.api.get_groups, limit=10).items())
+        self.assertEqual(len(groups), 20)
+        self.assertEqual(groups[-1]['id'], 'groups_19')
+        # a full last page needs one more (empty) page to know the listing ended
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_limits(self):
+        self.assertEqual(len(list(Cursor(self.api.streams, limit=10).items(15))), 15)
+        self.assertEqual(len(list(Cursor(self.api.streams, limit=10).pages(1))), 1)
+
+
+EPOCH = datetime.datetime(2016, 1, 1)
+
+
+def minutely_observations(total, failures=None):
+    """One observation per minute from EPOCH, failing the requests numbered in failures."""
+    calls = []
+
+    def route(request):
+        calls.append(request)
+        if failures and len(calls) in failures:
+            return 500, {}, {'status': 500, 'message': 'Internal error'}
+        query = request['query']
+        start, end = parse_timestamp(query['start']), parse_timestamp(query['end'])
+        limit = int(query['limit'])
+        results = []
+        for i in range(total):
+            t = EPOCH + datetime.timedelta(minutes=i)
+            if (start <= t if query['si'] == 'true' else start < t) and t < end:
+                results.append({'t': format_timestamp(t), 'v': {'v': i}})
+                if len(results) == limit:
+                    break
+        return 200, {}, {'results': results}
+    return route
+
+
+class ObservationWindowIteratorTestCase(unittest.TestCase):
+    def run_iterator(self, total, failures=None, **kwargs):
+        route = minutely_observations(total, failures)
+        with LocalServer({('GET', '/api/sensor/v2/observations'): route}) as server:
+            api = server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+            end = EPOCH + datetime.timedelta(days=3)
+            iterator = ObservationWindowIterator(api.get_observations, 'stream_1', EPOCH, end, **kwargs)
+            values = []
+            while True:
+                try:
+                    values.extend(result['v']['v'] for result in iterator)
+                    break
+                except SenseTError:
+                    values.append('error')
+            return values, server.requests
+
+    def test_ordered_and_complete(self):
+        values, requests = self.run_iterator(3 * 24 * 60, target_rows=500, limit=1000)
+        self.assertEqual(values, list(range(3 * 24 * 60)))
+        self.assertTrue(all(int(r['query']['limit']) == 1000 for r in requests))
+
+    def test_adapts_to_sparse_data(self):
+        values, requests = self.run_iterator(30, target_rows=1000, window=datetime.timedelta(hours=1))
+        self.assertEqual(values, list(range(30)))
+        self.assertLess(len(requests), 10)
+
+    def test_retries_failed_window(self):
+        values, requests = self.run_iterator(3 * 24 * 60, failures={2}, target_rows=1000, prefetch=1)
+        self.assertEqual(values, list(range(3 * 24 * 60)))
+
+    def test_resumes_after_failure(self):
+        values, requests = self.run_iterator(3 * 24 * 60, failures={3, 4}, target_rows=1000,
+                                             prefetch=1, retry_count=1)
+        self.assertEqual(values.count('error'), 1)
+        values.remove('error')
+        self.assertEqual(values, list(range(3 * 24 * 60)))
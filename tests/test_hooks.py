@@ -0,0 +1,140 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import threading
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.cache import MemoryCache
+from sensetdp.error import SenseTError
+from sensetdp.hooks import Observer, MetricsAggregator, percentile
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+
+class Recorder(Observer):
+    def __init__(self):
+        self.events = []
+
+    def on_event(self, event):
+        self.events.append(event)
+
+    def phases(self):
+        return [e.phase for e in self.events]
+
+
+class Broken(Observer):
+    def on_event(self, event):
+        raise ValueError('broken')
+
+
+class PercentileTestCase(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, p) for p in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(percentile([3], 99), 3)
+        self.assertIsNone(percentile([], 50))
+
+
+class HooksTestCase(unittest.TestCase):
+    def setUp(self):
+        self.failures = 0
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams/stream_1'): self.get_stream,
+            ('POST', '/api/sensor/v2/observations'): (201, {}, {'status': 201, 'message': 'Observations uploaded'}),
+        }).__enter__()
+        self.recorder = Recorder()
+        self.metrics = MetricsAggregator()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'),
+                                   observers=[self.recorder, self.metrics, Broken()])
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def get_stream(self, request):
+        if self.failures:
+            self.failures -= 1
+            return 503, {}, {'status': 503, 'message': 'Unavailable'}
+        return 200, {}, {'id': 'stream_1', 'resulttype': 'scalarvalue'}
+
+    def test_events(self):
+        self.failures = 1
+        with mock.patch('time.sleep'):
+            self.api.get_stream(id='stream_1', retry_count=1)
+        self.assertEqual(self.recorder.phases(),
+                         ['build', 'send', 'receive', 'retry', 'send', 'receive', 'parse', 'complete'])
+        self.assertTrue(all(e.endpoint == 'GET /streams/{id}' for e in self.recorder.events))
+        self.assertEqual(len(set(id(e.method) for e in self.recorder.events)), 1)
+
+        receive = self.recorder.events[2]
+        self.assertEqual((receive.attempt, receive.status_code), (0, 503))
+        self.assertGreater(receive.bytes, 0)
+        complete = self.recorder.events[-1]
+        self.assertEqual((complete.status_code, complete.retries, complete.cached), (200, 1, False))
+        self.assertIsNone(complete.error)
+        self.assertGreaterEqual(complete.elapsed, receive.elapsed)
+
+    def test_errors(self):
+        self.failures = 1
+        with self.assertRaises(SenseTError):
+            self.api.get_stream(id='stream_1')
+        self.assertIsInstance(self.recorder.events[-1].error, SenseTError)
+        self.assertEqual(self.metrics.summary()['GET /streams/{id}']['errors'], 1)
+
+    def test_metrics(self):
+        self.api.cache = MemoryCache()
+        for _ in range(3):
+            self.api.get_stream(id='stream_1')
+        self.api.create_observations(streamid='stream_1', json_data={'results': []})
+
+        summary = self.metrics.summary()
+        self.assertEqual(sorted(summary), ['GET /streams/{id}', 'POST /observations'])
+        streams = summary['GET /streams/{id}']
+        self.assertEqual((streams['calls'], streams['cache_hits'], streams['errors']), (3, 2, 0))
+        self.assertTrue(streams['p50'] <= streams['p95'] <= streams['p99'])
+        self.assertEqual(summary['POST /observations']['bytes_sent'], len(self.server.requests[-1]['body']))
+        self.assertIn('cache', self.recorder.phases())
+
+        self.api.remove_observer(self.metrics)
+        self.api.get_stream(id='stream_1')
+        self.assertEqual(self.metrics.summary()['GET /streams/{id}']['calls'], 3)
+
+    def test_cached_result_per_thread(self):
+        self.api.cache = MemoryCache()
+        self.api.get_stream(id='stream_1')
+        self.api.get_stream(id='stream_1')
+        self.assertTrue(self.api.cached_result)
+
+        thread = threading.Thread(target=self.api.create_observations,
+                                  kwargs={'streamid': 'stream_1', 'json_data': {'results': []}})
+        thread.start()
+        thread.join()
+        self.assertTrue(self.api.cached_result)
@@ -0,0 +1,153 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import json
+import threading
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.models import Observation, UnivariateResult, ObservationSeries
+from sensetdp.error import SenseTError, CircuitOpenError, DeadlineExceededError
+from sensetdp.ingest import is_retryable
+from tests.local_server import LocalServer
+
+import requests
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+
+def results(count, offset=0):
+    return [{'t': '2016-02-15T00:%02d:00.000000Z' % (i + offset), 'v': {'v': i}} for i in range(count)]
+
+
+class IngestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.failures = {}
+        self.lock = threading.Lock()
+        self.server = LocalServer({
+            ('POST', '/api/sensor/v2/observations'): self.create_observations,
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def create_observations(self, request):
+        streamid = request['query']['streamid']
+        with self.lock:
+            failures = self.failures.get(streamid)
+            if failures:
+                status = failures.pop(0)
+                return status, {}, {'status': status, 'message': 'Failed'}
+        return 201, {}, {'status': 201, 'message': 'Observations uploaded'}
+
+    def uploaded(self):
+        uploads = {}
+        for request in self.server.requests:
+            body = json.loads(request['body'].decode('utf-8'))
+            uploads.setdefault(request['query']['streamid'], []).extend(body['results'])
+        return uploads
+
+    def test_chunks_uploaded(self):
+        observation = Observation()
+        observation.results = [UnivariateResult(t=r['t'], v=r['v']) for r in results(5)]
+        series = ObservationSeries.from_results(None, results(7))
+        progress = []
+
+        report = self.api.ingest_observations({'stream_1': observation, 'stream_2': series, 'stream_3': results(2)},
+                                              max_points=3, max_workers=4,
+                                              progress=lambda chunk, stats: progress.append(stats.chunks_done))
+
+        self.assertTrue(report.ok)
+        self.assertEqual([(c.streamid, c.index, c.points) for c in report.chunks], [
+            ('stream_1', 0, 3), ('stream_1', 1, 2),
+            ('stream_2', 0, 3), ('stream_2', 1, 3), ('stream_2', 2, 1),
+            ('stream_3', 0, 2),
+        ])
+        self.assertEqual(sorted(progress), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(report.stats.points_done, 14)
+        self.assertEqual(report.stats.chunks_total, 6)
+        self.assertGreater(report.stats.bytes_done, 0)
+        self.assertGreater(report.stats.points_per_second, 0)
+
+        uploads = self.uploaded()
+        self.assertEqual(sorted(r['t'] for r in uploads['stream_1']), [r['t'] for r in results(5)])
+        self.assertEqual(len(uploads['stream_2']), 7)
+
+    def test_retry_failed_chunks(self):
+        self.failures = {'stream_1': [503, 502], 'stream_2': [400]}
+        report = self.api.ingest_observations({'stream_1': results(2), 'stream_2': results(2)}, retry_delay=0)
+
+        chunks = dict((c.streamid, c) for c in report.chunks)
+        self.assertTrue(chunks['stream_1'].ok)
+        self.assertEqual(chunks['stream_1'].attempts, 3)
+        # client errors are not retried
+        self.assertFalse(chunks['stream_2'].ok)
+        self.assertEqual(chunks['stream_2'].attempts, 1)
+        self.assertEqual(report.stats.retries, 2)
+        self.assertEqual(report.failed, [chunks['stream_2']])
+        with self.assertRaises(SenseTError):
+            report.raise_for_errors()
+
+    def test_retry_count_exhausted(self):
+        self.failures = {'stream_1': [500, 500, 500]}
+        report = self.api.ingest_observations({'stream_1': results(2)}, retry_count=2, retry_delay=0)
+        self.assertEqual(report.chunks[0].attempts, 3)
+        self.assertEqual(report.chunks[0].error.response.status_code, 500)
+
+    def test_chunks_built_as_workers_free_up(self):
+        sent = []
+
+        def observations():
+            for i in range(4):
+                sent.append(len(self.server.requests))
+                yield 'stream_%d' % i, results(2)
+
+        report = self.api.ingest_observations(observations(), max_workers=1)
+        self.assertTrue(report.ok)
+        self.assertEqual(report.stats.chunks_total, 4)
+        # a chunk is only built once the one before it is uploaded
+        self.assertEqual(sent[2:], [1, 2])
+
+    def test_not_retryable(self):
+        with mock.patch.object(self.api, 'create_observations', side_effect=CircuitOpenError('host', 'POST', 30)):
+            report = self.api.ingest_observations({'stream_1': results(2)}, retry_delay=0)
+        self.assertEqual(report.chunks[0].attempts, 1)
+
+    def test_is_retryable(self):
+        transient = self.api.transient_errors
+        connection_error = requests.exceptions.ConnectionError('refused')
+        self.assertTrue(is_retryable(connection_error, transient))
+        self.assertTrue(is_retryable(SenseTError('Failed to send request', cause=connection_error), transient))
+        self.assertTrue(is_retryable(SenseTError('Unavailable', mock.Mock(status_code=503)), transient))
+        self.assertFalse(is_retryable(SenseTError('Bad request', mock.Mock(status_code=400)), transient))
+        self.assertFalse(is_retryable(CircuitOpenError('host', 'POST /observations', 30), transient))
+        self.assertFalse(is_retryable(DeadlineExceededError('Deadline exceeded'), transient))
+        self.assertFalse(is_retryable(SenseTError('Failed to encode request body'), transient))
+        self.assertFalse(is_retryable(ValueError('Out of range float values are not JSON compliant'), transient))
@@ -0,0 +1,134 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import json
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.error import SenseTError
+from sensetdp.jsonlib import get_backend, JSONBackend, OrjsonBackend, UjsonBackend
+from sensetdp.models import StreamResultType
+from sensetdp.parsers import StreamingJSONParser
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+else:
+    import unittest2 as unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def available(backend):
+    try:
+        backend()
+        return True
+    except ImportError:
+        return False
+
+
+BACKENDS = [backend for backend in (JSONBackend, OrjsonBackend, UjsonBackend) if available(backend)]
+
+
+class JSONBackendTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        payload = {'resulttype': StreamResultType.scalar, 'results': [{'t': '2016-02-15T00:00:00.000Z', 'v': 1.5}],
+                   'name': 'é'}
+        for backend in BACKENDS:
+            encoded = backend().dumps(payload)
+            self.assertIsInstance(encoded, bytes, backend)
+            expected = dict(payload, resulttype='scalarvalue')
+            self.assertEqual(json.loads(encoded.decode('utf-8')), expected, backend)
+            self.assertEqual(backend().loads(encoded), expected, backend)
+            self.assertEqual(backend().loads(encoded.decode('utf-8')), expected, backend)
+
+    def test_non_finite_floats(self):
+        for backend in BACKENDS:
+            for value in (float('nan'), float('inf'), -float('inf')):
+                with self.assertRaises(ValueError):
+                    backend().dumps({'results': [{'t': '2016-02-15T00:00:00.000Z', 'v': {'v': value}}]})
+            self.assertEqual(json.loads(backend().dumps({'v': None, 'w': 1.5}).decode('utf-8')),
+                             {'v': None, 'w': 1.5})
+
+    @unittest.skipIf(numpy is None or not available(OrjsonBackend), 'numpy or orjson is not installed')
+    def test_non_finite_numpy(self):
+        with self.assertRaises(ValueError):
+            OrjsonBackend().dumps({'values': numpy.array([1.5, numpy.nan])})
+        self.assertEqual(OrjsonBackend().dumps({'values': numpy.array([1.5]), 'v': None}), b'{"values":[1.5],"v":null}')
+
+    def test_get_backend(self):
+        self.assertEqual(get_backend('auto').name, 'orjson' if available(OrjsonBackend) else 'json')
+        self.assertEqual(get_backend('json').name, 'json')
+        backend = JSONBackend()
+        self.assertIs(get_backend(backend), backend)
+        with self.assertRaises(ValueError):
+            get_backend('yaml')
+
+
+class APIJSONBackendTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('POST', '/api/sensor/v2/observations'): (201, {}, {'status': 201, 'message': 'Observations uploaded'}),
+            ('GET', '/api/sensor/v2/observations'): (200, {}, {'results': [{'t': '2016-02-15T00:00:00.000Z'}]}),
+        }).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_request_body_and_parsing(self):
+        for backend in BACKENDS:
+            api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), json_backend=backend.name)
+            self.assertEqual(api.parser.json_lib.name, backend.name)
+
+            results = [{'t': '2016-02-15T00:00:00.000Z', 'v': {'v': 1.5}}]
+            self.assertEqual(api.create_observations(streamid='stream_1', results=results)['status'], 201)
+            request = self.server.requests[-1]
+            self.assertEqual(request['headers']['Content-Type'], 'application/json')
+            self.assertEqual(json.loads(request['body'].decode('utf-8')), {'results': results})
+
+            parser = StreamingJSONParser(json_backend=backend.name)
+            self.assertEqual(list(api.get_observations(streamid='stream_1', parser=parser)),
+                             [{'t': '2016-02-15T00:00:00.000Z'}])
+            api.close()
+
+    def test_nan_body(self):
+        for backend in BACKENDS:
+            api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), json_backend=backend.name)
+            with self.assertRaises(SenseTError):
+                api.create_observations(streamid='stream_1', results=[{'t': '2016-02-15T00:00:00.000Z',
+                                                                        'v': {'v': float('nan')}}])
+            with self.assertRaises(SenseTError):
+                api.create_stream(id='stream_1', streamMetadata={'scale': float('nan')})
+            api.close()
+        self.assertEqual(self.server.requests, [])
+
+    def test_unencodable_body(self):
+        api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), json_backend='json')
+        with self.assertRaises(SenseTError):
+            api.create_observations(streamid='stream_1', results=[{'t': '2016-02-15T00:00:00.000Z', 'v': object()}])
+        self.assertEqual(self.server.requests, [])
+        api.close()
@@ -0,0 +1,349 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import json
+import datetime
+from array import array
+
+from sensetdp import models
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.error import SenseTError
+from sensetdp.models import ObservationSeries, Observation, UnivariateResult, Stream, Platform, Group, Location, \
+    CompactStream, CompactPlatform, CompactGroup, CompactLocation, CompactModelFactory, StreamResultType, \
+    IdentityMap, identity_scope
+from sensetdp.parsers import ModelParser
+from sensetdp.parsers import ObservationSeriesParser
+from sensetdp.utils import timestamp_to_ns, format_timestamp_ns, chunk_results
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+RESULTS = [
+    {'t': '2016-02-15T00:00:00.000Z', 'v': {'v': 1.5}},
+    {'t': '2016-02-15T00:15:00.250Z', 'v': {'v': -2}},
+    {'t': '2016-02-15T00:30:00.000Z', 'v': {'v': None}},
+]
+
+
+class TimestampTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        ns = timestamp_to_ns('2016-02-15T00:15:00.250Z')
+        self.assertEqual(ns, 1455495300250000000)
+        self.assertEqual(format_timestamp_ns(ns), '2016-02-15T00:15:00.250000Z')
+        self.assertEqual(timestamp_to_ns(datetime.datetime(2016, 2, 15, 0, 15, 0, 250000)), ns)
+        self.assertEqual(timestamp_to_ns('1969-12-31T23:59:59Z'), -1000000000)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            timestamp_to_ns('15/02/2016')
+
+
+class ObservationSeriesTestCase(unittest.TestCase):
+    def check_series(self, series):
+        self.assertEqual(len(series), 3)
+        self.assertEqual(list(series.timestamps), [timestamp_to_ns(r['t']) for r in RESULTS])
+        self.assertEqual(list(series.values)[:2], [1.5, -2.0])
+
+        # missing values are not sent
+        state = series.to_state('create')
+        self.assertEqual(state, {'streamid': 'stream_1', 'results': [
+            {'t': '2016-02-15T00:00:00.000000Z', 'v': {'v': 1.5}},
+            {'t': '2016-02-15T00:15:00.250000Z', 'v': {'v': -2.0}},
+        ]})
+
+        view = series.results
+        self.assertEqual(len(view), 3)
+        self.assertIsInstance(view[-2], UnivariateResult)
+        self.assertEqual(view[1].to_state(), {'t': '2016-02-15T00:15:00.250000Z', 'v': {'v': -2.0}})
+        self.assertEqual([r.t for r in view[:1]], ['2016-02-15T00:00:00.000000Z'])
+        with self.assertRaises(IndexError):
+            view[3]
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy_columns(self):
+        series = ObservationSeries.from_results(None, iter(RESULTS), streamid='stream_1')
+        self.assertEqual(series.timestamps.dtype.name, 'int64')
+        self.assertEqual(series.values.dtype.name, 'float64')
+        self.check_series(series)
+
+    def test_stdlib_columns(self):
+        with mock.patch.object(models, 'numpy', None):
+            series = ObservationSeries.from_results(None, RESULTS, streamid='stream_1')
+            self.assertIsInstance(series.timestamps, array)
+            self.check_series(series)
+
+    def test_from_observation(self):
+        observation = Observation()
+        observation.results.append(UnivariateResult(t=datetime.datetime(2016, 2, 15), v={'v': 3}))
+        series = ObservationSeries.from_observation(observation, streamid='stream_1')
+        self.assertEqual(series.to_state(), {'streamid': 'stream_1', 'results': [
+            {'t': '2016-02-15T00:00:00.000000Z', 'v': {'v': 3.0}}]})
+
+    def test_scalar_only(self):
+        with self.assertRaises(SenseTError):
+            ObservationSeries.from_results(None, [{'t': '2016-02-15T00:00:00Z', 'v': {'p': {}}}])
+        with self.assertRaises(SenseTError):
+            ObservationSeries(timestamps=[1, 2], values=[1.0])
+
+
+def make_dataframe():
+    index = pandas.to_datetime(['2016-02-15 00:00:00.000', '2016-02-15 00:15:00.500', '2016-02-15 00:30:00.000'])
+    return pandas.DataFrame({'stream_1': [1.5, float('nan'), 3.0], 'stream_2': [1, 2, 3]}, index=index)
+
+
+@unittest.skipIf(pandas is None, 'pandas is not installed')
+class FromDataFrameTestCase(unittest.TestCase):
+    def test_from_dataframe(self):
+        observations = Observation.from_dataframe(make_dataframe())
+        self.assertEqual(sorted(observations), ['stream_1', 'stream_2'])
+        results = observations['stream_1'].results
+        self.assertTrue(all(isinstance(r, UnivariateResult) for r in results))
+        self.assertEqual([(r.t, r.v) for r in results],
+                         [('2016-02-15T00:00:00.000000Z', 1.5), ('2016-02-15T00:30:00.000000Z', 3.0)])
+        self.assertEqual(observations['stream_2'].results[1].t, '2016-02-15T00:15:00.500000Z')
+
+    def test_results_from_dataframe(self):
+        results = Observation.results_from_dataframe(make_dataframe())
+        self.assertEqual(sorted(results), ['stream_1', 'stream_2'])
+        self.assertEqual(results['stream_1'], [
+            {'t': '2016-02-15T00:00:00.000000Z', 'v': {'v': 1.5}},
+            {'t': '2016-02-15T00:30:00.000000Z', 'v': {'v': 3.0}},
+        ])
+        self.assertEqual(results['stream_2'][1], {'t': '2016-02-15T00:15:00.500000Z', 'v': {'v': 2}})
+
+    def test_timezone_aware_index(self):
+        frame = make_dataframe()
+        frame.index = frame.index.tz_localize('UTC').tz_convert('Australia/Hobart')
+        self.assertEqual(Observation.from_dataframe(frame)['stream_1'].results[0].t, '2016-02-15T00:00:00.000000Z')
+        self.assertEqual(Observation.results_from_dataframe(frame)['stream_1'][0]['t'], '2016-02-15T00:00:00.000000Z')
+
+
+class ChunkResultsTestCase(unittest.TestCase):
+    def test_chunks(self):
+        results = [{'t': '2016-02-15T00:00:00.000000Z', 'v': i} for i in range(10)]
+        self.assertEqual([len(c) for c in chunk_results(results, max_points=4)], [4, 4, 2])
+
+        size = len(json.dumps(results[:3])) - 2 + 2  # brackets out, separator in
+        self.assertEqual([len(c) for c in chunk_results(results, max_bytes=size)], [3, 3, 3, 1])
+        self.assertEqual([len(c) for c in chunk_results(results, max_points=2, max_bytes=size)], [2] * 5)
+        self.assertEqual([len(c) for c in chunk_results(results, max_bytes=1)], [1] * 10)
+        self.assertEqual([(len(c), n) for c, n in chunk_results(results, max_points=4, sizes=True)],
+                         [(4, 4 * 46), (4, 4 * 46), (2, 2 * 46)])
+
+
+def stream_json():
+    return {
+        'id': 'stream_1',
+        'resulttype': 'scalarvalue',
+        'reportingPeriod': 'PT15M',
+        '_links': {'self': {'href': 'https://example.com/streams/stream_1'}},
+        '_embedded': {
+            'organisation': [{'id': 'org_1', 'name': 'Org'}],
+            'groups': [{'id': 'group_1'}, {'id': 'group_2'}],
+            'location': [{'id': 'location_1', 'geoJson': {'type': 'Point', 'coordinates': [147.3, -42.8]}}],
+            'metadata': [{
+                'type': '.ScalarStreamMetaData',
+                'cummulative': False,
+                '_embedded': {
+                    'interpolationType': [{'_links': {'self': {'href': 'http://www.opengis.net/def/waterml/2.0/interpolationType/Continuous'}}}],
+                    'observedProperty': [{'_links': {'self': {'href': 'http://registry.it.csiro.au/def/environment/property/air_temperature'}}}],
+                    'unitOfMeasure': [{'_links': {'self': {'href': 'http://registry.it.csiro.au/def/qudt/1.1/qudt-unit/DegreeCelsius'}}}],
+                },
+            }],
+        },
+    }
+
+
+def renamed_stream_json():
+    renamed = stream_json()
+    renamed['_embedded']['groups'][0]['name'] = 'Renamed'
+    renamed['_embedded']['location'][0]['geoJson']['coordinates'] = [147.0, -42.0]
+    return renamed
+
+
+def platform_json():
+    return {
+        'id': 'platform_1',
+        'name': 'Platform',
+        '_embedded': {
+            'organisation': [{'id': 'org_1'}],
+            'groups': [{'id': 'group_1'}],
+            'deployments': [{'name': 'deployment', 'validTime': {}}],
+        },
+    }
+
+
+class CompactModelTestCase(unittest.TestCase):
+    def test_same_state_as_eager_models(self):
+        for eager, compact, make_json in ((Stream, CompactStream, stream_json),
+                                          (Platform, CompactPlatform, platform_json),
+                                          (Group, CompactGroup, lambda: {'id': 'group_1', '_embedded': {}}),
+                                          (Location, CompactLocation, lambda: stream_json()['_embedded']['location'][0])):
+            for action in (None, 'create'):
+                try:
+                    expected = eager.parse(None, make_json()).to_json(action)
+                except Exception as e:
+                    # e.g. a parsed stream can't be re-created as is, neither can the compact one
+                    with self.assertRaises(type(e)):
+                        compact.parse(None, make_json()).to_json(action)
+                else:
+                    self.assertEqual(compact.parse(None, make_json()).to_json(action), expected, compact)
+
+    def test_lazy_hydration(self):
+        stream = CompactStream.parse(None, stream_json())
+        self.assertEqual(sorted(vars(stream)), ['_api', '_fix_spellings', '_json'])
+        self.assertEqual(stream.reportingPeriod, 'PT15M')
+        self.assertEqual(stream.result_type, StreamResultType.scalar)
+        self.assertEqual([g.id for g in stream.groups], ['group_1', 'group_2'])
+        self.assertIs(stream.groups, stream.groups)
+        self.assertIsInstance(stream.location, CompactLocation)
+        self.assertNotIn('_metadata', vars(stream))
+        with self.assertRaises(AttributeError):
+            stream.missing
+
+    def test_assignment_overrides_response(self):
+        stream = CompactStream.parse(None, stream_json())
+        stream.reportingPeriod = 'PT1H'
+        stream.groups = []
+        state = stream.to_state()
+        self.assertEqual(state['reportingPeriod'], 'PT1H')
+        self.assertNotIn('groupids', state)
+
+    def test_model_factory(self):
+        parser = ModelParser(model_factory=CompactModelFactory)
+        self.assertIs(parser.model_factory.stream, CompactStream)
+        streams = CompactStream.parse_list(None, {'_embedded': {'streams': [stream_json(), stream_json()]}})
+        self.assertEqual([s.id for s in streams], ['stream_1', 'stream_1'])
+
+
+class IdentityMapTestCase(unittest.TestCase):
+    def parse_streams(self, api=None, model_factory=None, make_json=stream_json):
+        method = mock.Mock(api=api, params={}, payload_type='stream', payload_list=True)
+        payload = json.dumps({'_embedded': {'streams': [make_json(), make_json()]}})
+        return ModelParser(model_factory=model_factory).parse(method, payload)
+
+    def test_shared_within_response(self):
+        for model_factory in (None, CompactModelFactory):
+            first, second = self.parse_streams(model_factory=model_factory)
+            self.assertIsNot(first, second)
+            self.assertIs(first.organisations[0], second.organisations[0])
+            self.assertIs(first.groups[1], second.groups[1])
+            self.assertIs(first.location, second.location)
+            self.assertEqual(first.to_state(), second.to_state())
+
+    def test_shared_across_responses(self):
+        first = self.parse_streams()[0]
+        self.assertIsNot(first.location, self.parse_streams()[0].location)
+
+        api = mock.Mock(identity_map=IdentityMap())
+        first = self.parse_streams(api)[0]
+        self.assertIs(first.location, self.parse_streams(api)[0].location)
+        self.assertEqual(len(api.identity_map), 4)
+
+    def test_updated_across_responses(self):
+        for model_factory in (None, CompactModelFactory):
+            api = mock.Mock(identity_map=IdentityMap())
+            first = self.parse_streams(api, model_factory)[0]
+            group = first.groups[0]
+            location = first.location
+
+            second = self.parse_streams(api, model_factory, renamed_stream_json)[0]
+            # the server data wins, in the instances already handed out too
+            self.assertIs(second.groups[0], group)
+            self.assertEqual(group.name, 'Renamed')
+            self.assertEqual(second.location.geoJson['coordinates'], [147.0, -42.0])
+            self.assertIs(second.location, location)
+            self.assertEqual(location.to_state(), second.location.to_state())
+
+    def test_weak_entries(self):
+        identity_map = IdentityMap(weak=True)
+        with identity_scope(identity_map):
+            stream = Stream.parse(None, stream_json())
+        self.assertEqual(len(identity_map), 4)
+        del stream
+        self.assertEqual(len(identity_map), 0)
+
+    def test_no_scope(self):
+        streams = Stream.parse_list(None, {'_embedded': {'streams': [stream_json(), stream_json()]}})
+        self.assertIsNot(streams[0].location, streams[1].location)
+
+
+class ObservationSeriesApiTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/observations'): (200, {}, {'results': RESULTS}),
+            ('POST', '/api/sensor/v2/observations'): (201, {}, {'status': 201, 'message': 'Observations uploaded'}),
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def test_get_and_create(self):
+        series = self.api.get_observations(streamid='stream_1', parser=ObservationSeriesParser(chunk_size=10))
+        self.assertIsInstance(series, ObservationSeries)
+        self.assertEqual(series.streamid, 'stream_1')
+        self.assertEqual(len(series), 3)
+
+        self.api.create_observations(series)
+        request = self.server.requests[-1]
+        self.assertEqual(request['query'], {'streamid': 'stream_1'})
+        self.assertEqual(json.loads(request['body'].decode('utf-8')), {'results': series.to_state()['results']})
+
+    @unittest.skipIf(pandas is None, 'pandas is not installed')
+    def test_upload_dataframe(self):
+        responses = self.api.upload_dataframe(make_dataframe(), max_points=2)
+        self.assertEqual(sorted(responses), ['stream_1', 'stream_2'])
+        self.assertEqual(len(responses['stream_1']), 1)
+        self.assertEqual(len(responses['stream_2']), 2)
+
+        uploads = [(r['query']['streamid'], len(json.loads(r['body'].decode('utf-8'))['results']))
+                   for r in self.server.requests]
+        self.assertEqual(sorted(uploads), [('stream_1', 2), ('stream_2', 1), ('stream_2', 2)])
+
+        # the same body as create_observations sends for these results
+        bodies = [json.loads(r['body'].decode('utf-8')) for r in self.server.requests
+                  if r['query']['streamid'] == 'stream_1']
+        self.assertEqual(bodies, [{'results': [
+            {'t': '2016-02-15T00:00:00.000000Z', 'v': {'v': 1.5}},
+            {'t': '2016-02-15T00:30:00.000000Z', 'v': {'v': 3.0}},
+        ]}])
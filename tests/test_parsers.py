@@ -0,0 +1,188 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import json
+import types
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.error import SenseTError
+from sensetdp import models
+from sensetdp.parsers import StreamingJSONParser, iter_json_array, CSVObservationParser, PandasObservationParser
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+RESULTS = [{'t': '2016-01-01T00:%02d:00.000Z' % i, 'v': {'v': i * 1.5}} for i in range(50)]
+PAYLOAD = {
+    # a nested 'results' key must not be mistaken for the top level one
+    'stream': {'id': 'stream_1', 'results': ['nested'], 'name': 'a "quoted" \\ name ]}'},
+    'results': RESULTS + [{'t': '2016-01-02T00:00:00.000Z', 'v': {'v': 12345678}}],
+    'count': 51,
+}
+
+
+def chunked(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterJsonArrayTestCase(unittest.TestCase):
+    def decode(self, chunks, key='results'):
+        return list(iter_json_array(chunks, key, json.JSONDecoder()))
+
+    def test_single_byte_chunks(self):
+        text = json.dumps(PAYLOAD)
+        self.assertEqual(self.decode(chunked(text, 1)), PAYLOAD['results'])
+        self.assertEqual(self.decode([text]), PAYLOAD['results'])
+
+    def test_numbers_and_multibyte_split_across_chunks(self):
+        text = '{"results": [12345, "é漢", 3.25e2, [1, 2]] }'
+        for size in range(1, 8):
+            self.assertEqual(self.decode(chunked(text, size)), [12345, 'é漢', 325.0, [1, 2]])
+
+    def test_missing_or_empty_array(self):
+        self.assertEqual(self.decode(['{"count": 0, "results": null}']), [])
+        self.assertEqual(self.decode(['{"results": []}']), [])
+        self.assertEqual(self.decode(['{"other": {"results": [1]}}']), [])
+
+    def test_truncated_payload(self):
+        text = json.dumps(PAYLOAD)[:-60]
+        with self.assertRaises(ValueError):
+            self.decode(chunked(text, 7))
+
+
+class StreamingJSONParserTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/observations'): (200, {}, PAYLOAD),
+            ('GET', '/api/sensor/v2/broken'): (200, {}, '{"results": [{"t": 1}, {"t"'),
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def test_results_streamed(self):
+        result = self.api.get_observations(streamid='stream_1', parser=StreamingJSONParser(chunk_size=16))
+        self.assertIsInstance(result, types.GeneratorType)
+        self.assertEqual(list(result), PAYLOAD['results'])
+
+        # the connection went back to the pool once the stream was consumed
+        self.api.get_observations(streamid='stream_1')
+        self.assertEqual(self.api.pool_stats.hits, 1)
+
+    def test_parse_whole_payload(self):
+        parser = StreamingJSONParser()
+        self.assertEqual(list(parser.parse(None, json.dumps(PAYLOAD))), PAYLOAD['results'])
+
+    def test_invalid_payload(self):
+        self.server.routes[('GET', '/api/sensor/v2/observations')] = self.server.routes[('GET', '/api/sensor/v2/broken')]
+        result = self.api.get_observations(streamid='stream_1', parser=StreamingJSONParser(chunk_size=4))
+        self.assertEqual(next(result), {'t': 1})
+        with self.assertRaises(SenseTError):
+            list(result)
+
+
+CSV = (
+    'Exported observations\r\n'
+    'streams,2\r\n'
+    '\r\n'
+    'timestamp,"site,1",stream_2\r\n'
+    '2016-02-15T00:00:00.000Z,1.5,10\r\n'
+    '2016-02-15T00:15:00.000Z,,11\r\n'
+    '2016-02-15T00:30:00.000Z,3.5,12\r\n'
+)
+
+
+class CSVObservationParserTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/observations'): (200, {'Content-Type': 'text/csv'}, CSV),
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def get(self, parser):
+        # the stream ids in a different order than the columns
+        return self.api.get_observations(streamid='stream_2,"site,1"', media='csv', parser=parser)
+
+    def check_arrays(self, chunks):
+        self.assertEqual([list(c) for c in chunks], [['timestamp', 'stream_2', 'site,1']] * 2)
+        self.assertEqual([len(c['timestamp']) for c in chunks], [2, 1])
+        self.assertEqual(list(chunks[0]['stream_2']) + list(chunks[1]['stream_2']), [10.0, 11.0, 12.0])
+        self.assertEqual(chunks[0]['site,1'][0], 1.5)
+        self.assertNotEqual(chunks[0]['site,1'][1], chunks[0]['site,1'][1])  # NaN
+        self.assertEqual(chunks[1]['timestamp'][0], 1455496200000000000)
+
+    def test_arrays(self):
+        self.check_arrays(list(self.get(CSVObservationParser(chunk_rows=2, chunk_size=7, use_pandas=False))))
+
+    def test_stdlib_arrays(self):
+        with mock.patch.object(models, 'numpy', None):
+            self.check_arrays(list(self.get(CSVObservationParser(chunk_rows=2, use_pandas=False))))
+
+    def test_without_pandas(self):
+        # None in sys.modules makes the import raise ImportError
+        with mock.patch.dict('sys.modules', {'pandas': None}):
+            parser = CSVObservationParser(chunk_rows=2)
+            with self.assertRaises(ImportError):
+                CSVObservationParser(use_pandas=True)
+        self.assertIsNone(parser.pandas)
+        self.check_arrays(list(self.get(parser)))
+
+    @unittest.skipIf(pandas is None, 'pandas is not installed')
+    def test_dataframes(self):
+        chunks = list(self.get(CSVObservationParser(chunk_rows=2, chunk_size=7)))
+        self.assertEqual([len(c) for c in chunks], [2, 1])
+        df = pandas.concat(chunks)
+        self.assertEqual(list(df.columns), ['stream_2', 'site,1'])
+        self.assertEqual(df.index.name, 'timestamp')
+        self.assertEqual(df['stream_2'].tolist(), [10, 11, 12])
+        self.assertEqual(df.index[1].minute, 15)
+
+    @unittest.skipIf(pandas is None, 'pandas is not installed')
+    def test_pandas_parser(self):
+        df = self.get(PandasObservationParser())
+        self.assertEqual(list(df.columns), ['stream_2', 'site,1'])
+        self.assertEqual(df['site,1'].tolist()[::2], [1.5, 3.5])
+
+    def test_csv_media_required(self):
+        with self.assertRaises(SenseTError):
+            list(self.api.get_observations(streamid='stream_2', parser=CSVObservationParser(use_pandas=False)))
@@ -0,0 +1,160 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import threading
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.ratelimit import RateLimiter
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+
+class Clock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimiterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+
+    def test_unlimited_without_budget(self):
+        limiter = RateLimiter(clock=self.clock)
+        self.assertEqual([limiter.reserve() for _ in range(20)], [(0, False)] * 20)
+
+    def test_fixed_rate(self):
+        limiter = RateLimiter(rate=2, burst=2, clock=self.clock)
+        self.assertEqual([limiter.reserve()[0] for _ in range(5)], [0, 0, 0.5, 1.0, 1.5])
+        self.clock.now += 10
+        self.assertEqual(limiter.reserve(), (0, False))
+
+    def test_spreads_server_budget(self):
+        limiter = RateLimiter(burst=1, burst_ratio=0, clock=self.clock)
+        limiter.update({'x-rate-limit-remaining': '4', 'x-rate-limit-reset': '1020'})
+        self.assertEqual([limiter.reserve()[0] for _ in range(4)], [0, 5, 10, 15])
+        self.assertEqual(limiter.remaining, 0)
+
+        # stale responses of requests sent earlier don't give the budget back
+        limiter.update({'x-rate-limit-remaining': '3', 'x-rate-limit-reset': '1020'})
+        self.assertEqual(limiter.remaining, 0)
+        self.assertTrue(limiter.exhausted())
+
+        # out of calls: wait for the reset
+        self.assertEqual(limiter.reserve(), (25, True))
+
+        # the next window has a new budget
+        self.clock.now = 1025
+        limiter.update({'x-rate-limit-remaining': '100', 'x-rate-limit-reset': '1080'})
+        self.assertEqual(limiter.remaining, 100)
+        self.assertFalse(limiter.exhausted())
+
+    def test_not_paced_with_budget_left(self):
+        limiter = RateLimiter(clock=self.clock)
+        limiter.update({'x-rate-limit-remaining': '1000', 'x-rate-limit-reset': '4600'})
+        self.assertEqual([limiter.reserve()[0] for _ in range(20)], [0] * 20)
+
+        # a burst using up the budget gets spaced, evenly once little is left
+        delays = [limiter.reserve()[0] for _ in range(980)]
+        self.assertEqual(delays[:300], [0] * 300)
+        self.assertGreater(delays[-1], 3000)
+        spacing = [b - a for a, b in zip(delays[-9:], delays[-8:])]
+        self.assertTrue(all(abs(d - spacing[0]) < 1e-6 for d in spacing), spacing)
+        self.assertEqual(limiter.remaining, 0)
+
+    def test_too_many_requests(self):
+        limiter = RateLimiter(clock=self.clock)
+        limiter.update({'retry-after': '30'}, 429)
+        self.assertTrue(limiter.exhausted())
+        self.assertEqual(limiter.reserve(), (35, True))
+
+    def test_thread_safe(self):
+        limiter = RateLimiter(burst=1, burst_ratio=0, clock=self.clock)
+        limiter.update({'x-rate-limit-remaining': '400', 'x-rate-limit-reset': '1400'})
+        delays = []
+
+        def worker():
+            for _ in range(50):
+                delays.append(limiter.reserve()[0])
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(delays), [float(i) for i in range(400)])
+        self.assertEqual(limiter.remaining, 0)
+
+
+class SharedRateLimitTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams/stream_1'): self.get_stream,
+        }).__enter__()
+        self.remaining = 3
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def get_stream(self, request):
+        self.remaining -= 1
+        headers = {'x-rate-limit-remaining': str(self.remaining), 'x-rate-limit-reset': '2000000000'}
+        if self.remaining < 0:
+            return 429, headers, {'status': 429, 'message': 'Too many requests'}
+        return 200, headers, {'id': 'stream_1', 'resulttype': 'scalarvalue'}
+
+    def test_shared_between_calls(self):
+        api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), wait_on_rate_limit=True)
+        with mock.patch('time.sleep') as sleep:
+            api.get_stream(id='stream_1')
+            self.assertEqual(api.rate_limiter.remaining, 2)
+            api.get_stream(id='stream_1')
+            api.get_stream(id='stream_1')
+            self.assertEqual(api.rate_limiter.remaining, 0)
+            self.assertTrue(api.rate_limiter.exhausted())
+
+            # the budget from earlier calls makes the next one wait for the reset up front
+            self.server.routes[('GET', '/api/sensor/v2/streams/stream_1')] = \
+                (200, {}, {'id': 'stream_1', 'resulttype': 'scalarvalue'})
+            api.get_stream(id='stream_1')
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertTrue(any(call[0][0] > 1000 for call in sleep.call_args_list))
+
+    def test_not_paced_without_wait(self):
+        api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+        api.get_stream(id='stream_1')
+        with mock.patch('time.sleep') as sleep:
+            api.get_stream(id='stream_1')
+        self.assertFalse(sleep.called)
+        self.assertEqual(api.rate_limiter.remaining, 1)
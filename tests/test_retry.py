@@ -0,0 +1,177 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import random
+
+import requests
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.error import SenseTError
+from sensetdp.retry import RetryPolicy, RetryBudget, parse_retry_after
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+
+class Clock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+    def method(self, **kwargs):
+        config = dict(retry_count=5, retry_delay=1, retry_errors=None, wait_on_rate_limit=False,
+                      api=mock.Mock(transient_errors=(requests.exceptions.ConnectionError,)))
+        config.update(kwargs)
+        return mock.Mock(**config)
+
+    def response(self, status_code, headers=None):
+        return mock.Mock(status_code=status_code, headers=headers or {})
+
+    def test_backoff(self):
+        policy = RetryPolicy(jitter=False, max_delay=10, budget=False)
+        method = self.method()
+        self.assertEqual([policy.retry_delay(method, n, self.response(503)) for n in range(6)],
+                         [1, 2, 4, 8, 10, None])
+        self.assertEqual(policy.stats.retries, 5)
+        self.assertEqual(policy.stats.sleep_time, 25)
+
+    def test_jitter(self):
+        policy = RetryPolicy(budget=False, rng=random.Random(1))
+        delays = [policy.retry_delay(self.method(), 3, self.response(503)) for _ in range(100)]
+        self.assertTrue(all(0 <= d <= 8 for d in delays))
+        self.assertGreater(len(set(delays)), 90)
+
+    def test_retryable(self):
+        policy = RetryPolicy(jitter=False, budget=False)
+        method = self.method()
+        for status in (200, 201, 204, 304, 400, 401, 404):
+            self.assertIsNone(policy.retry_delay(method, 0, self.response(status)), status)
+        for status in (408, 429, 500, 502, 503, 504):
+            self.assertEqual(policy.retry_delay(method, 0, self.response(status)), 1, status)
+        self.assertEqual(policy.retry_delay(method, 0, error=requests.exceptions.ConnectionError()), 1)
+        self.assertIsNone(policy.retry_delay(method, 0, error=ValueError()))
+        self.assertEqual(policy.retry_delay(self.method(retry_errors=[404]), 0, self.response(404)), 1)
+        self.assertIsNone(policy.retry_delay(self.method(retry_errors=[404]), 0, self.response(503)))
+        self.assertIsNone(policy.retry_delay(self.method(retry_count=0), 0, self.response(503)))
+
+    def test_retry_after(self):
+        policy = RetryPolicy(budget=False)
+        self.assertEqual(policy.retry_delay(self.method(), 0, self.response(429, {'retry-after': '7'})), 7)
+        self.assertEqual(parse_retry_after('Thu, 01 Jan 1970 00:00:00 GMT'), 0)
+        self.assertIsNone(parse_retry_after('soon'))
+
+    def test_budget(self):
+        clock = Clock()
+        budget = RetryBudget(ratio=0.5, min_retries=1, window=10, clock=clock)
+        policy = RetryPolicy(jitter=False, budget=budget)
+        method = self.method()
+        for _ in range(4):
+            policy.record_request()
+        self.assertEqual([policy.retry_delay(method, 0, self.response(503)) for _ in range(4)], [1, 1, 1, None])
+        self.assertEqual(policy.stats.budget_exhausted, 1)
+
+        clock.now += 10
+        policy.record_request()
+        self.assertEqual(policy.retry_delay(method, 0, self.response(503)), 1)
+
+    def test_deadline(self):
+        budget = RetryBudget(ratio=0, min_retries=1, clock=Clock())
+        policy = RetryPolicy(jitter=False, budget=budget)
+        method = self.method(within_deadline=mock.Mock(return_value=False))
+        self.assertIsNone(policy.retry_delay(method, 0, self.response(503)))
+        method.within_deadline.assert_called_once_with(1)
+        # neither counted as a retry nor taken from the budget
+        self.assertEqual(policy.stats.retries, 0)
+        self.assertEqual(policy.stats.sleep_time, 0)
+        self.assertTrue(budget.try_retry())
+
+
+class RetryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.failures = 0
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams/stream_1'): self.get_stream,
+            ('POST', '/api/sensor/v2/observations'): (201, {}, {'status': 201, 'message': 'Observations uploaded'}),
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), retry_count=3, retry_delay=1)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def get_stream(self, request):
+        if self.failures:
+            self.failures -= 1
+            return 503, {}, {'status': 503, 'message': 'Unavailable'}
+        return 200, {}, {'id': 'stream_1', 'resulttype': 'scalarvalue'}
+
+    def test_server_errors(self):
+        self.failures = 2
+        with mock.patch('time.sleep') as sleep:
+            self.assertEqual(self.api.get_stream(id='stream_1').id, 'stream_1')
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(sleep.call_count, 2)
+        stats = self.api.retry_stats.to_dict()
+        self.assertEqual((stats['requests'], stats['retries']), (1, 2))
+        self.assertAlmostEqual(stats['sleep_time'], sum(c[0][0] for c in sleep.call_args_list))
+
+    def test_gives_up(self):
+        self.failures = 10
+        with mock.patch('time.sleep'):
+            with self.assertRaises(SenseTError):
+                self.api.get_stream(id='stream_1')
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_created_not_retried(self):
+        self.api.create_observations(streamid='stream_1', json_data={'results': []})
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.api.retry_stats.retries, 0)
+
+    def test_connection_errors(self):
+        request = self.api.session.request
+        errors = [requests.exceptions.ConnectionError('reset'), requests.exceptions.ReadTimeout('slow')]
+
+        def flaky(*args, **kwargs):
+            if errors:
+                raise errors.pop(0)
+            return request(*args, **kwargs)
+
+        with mock.patch.object(self.api.session, 'request', side_effect=flaky), mock.patch('time.sleep'):
+            self.assertEqual(self.api.get_stream(id='stream_1').id, 'stream_1')
+        self.assertEqual(self.api.retry_stats.error_retries, 2)
+
+        with mock.patch.object(self.api.session, 'request', side_effect=ValueError('bad')):
+            with self.assertRaises(SenseTError) as cm:
+                self.api.get_stream(id='stream_1')
+        self.assertEqual(str(cm.exception), 'Failed to send request: bad')
@@ -0,0 +1,168 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import json
+import datetime
+
+from sensetdp import models
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.error import SenseTError
+from sensetdp.models import Model, Observation, ObservationSeries, UnivariateResult, Stream, Organisation
+from sensetdp.serializers import dumps_results, format_datetime, join_results
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+
+class UTC(datetime.tzinfo):
+    def utcoffset(self, dt):
+        return datetime.timedelta(hours=10)
+
+    def dst(self, dt):
+        return None
+
+
+class ExtraResult(UnivariateResult):
+    pass
+
+
+TIMESTAMPS = [
+    datetime.datetime(2016, 2, 15, 0, 15, 30, 250),
+    datetime.datetime(2016, 2, 15),
+    datetime.datetime(2016, 2, 15, 23, 59, 59, 999999, tzinfo=UTC()),
+    datetime.datetime(999, 1, 1, 1, 1, 1),
+    '2016-02-15T00:00:00.000Z',
+]
+
+VALUES = [1.5, -2, 0.1 + 0.2, 1e300 * 10, {'v': 3.25}, {'v': 7}, {'v': float('nan')},
+          {'p': {'type': 'Point', 'coordinates': [147.3, -42.8]}}, None, True, 'text é']
+
+
+class SerializerTestCase(unittest.TestCase):
+    def check(self, observation, action='create'):
+        self.assertEqual(observation.to_json(action), Model.to_json(observation, action))
+
+    def test_univariate_results(self):
+        observation = Observation()
+        for t in TIMESTAMPS:
+            for v in VALUES:
+                observation.results.append(UnivariateResult(t=t, v=v))
+        self.check(observation)
+        self.check(observation, action=None)
+
+    def test_mixed_results(self):
+        observation = Observation()
+        extra = UnivariateResult(t=TIMESTAMPS[0], v=1.0)
+        extra.qc = 'ok'
+        observation.results = [
+            {'t': '2016-02-15T00:00:00.000000Z', 'v': 1.5},
+            {'t': '2016-02-15T00:00:00.000000Z', 'v': {'v': 2}, 'q': 1},
+            ExtraResult(t=TIMESTAMPS[1], v={'v': 1.0}),
+            extra,
+        ]
+        observation.note = 'extra attribute'
+        self.check(observation)
+
+    def test_stream_and_empty(self):
+        observation = Observation()
+        self.check(observation)
+
+        stream = Stream()
+        stream.id = 'stream_1'
+        organisation = Organisation()
+        organisation.id = 'org'
+        stream.organisations = [organisation]
+        observation.stream = stream
+        observation.results.append(UnivariateResult(t=TIMESTAMPS[0], v={'v': 1.0}))
+        self.check(observation)
+
+    def test_indent_falls_back(self):
+        observation = Observation()
+        observation.results.append(UnivariateResult(t=TIMESTAMPS[0], v={'v': 1.0}))
+        self.assertEqual(observation.to_json('create', indent=2), Model.to_json(observation, 'create', indent=2))
+
+    def test_series(self):
+        results = [{'t': '2016-02-15T00:00:00.000Z', 'v': {'v': v}} for v in (1.5, None, 0.1 + 0.2, -7)]
+        self.check(ObservationSeries.from_results(None, results, streamid='stream_1'))
+        self.check(ObservationSeries.from_results(None, results))
+        with mock.patch.object(models, 'numpy', None):
+            self.check(ObservationSeries.from_results(None, results, streamid='stream_1'))
+
+    def test_format_datetime(self):
+        for t in TIMESTAMPS[:4]:
+            self.assertEqual(format_datetime(t), t.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+        self.assertEqual(dumps_results([]), '[]')
+
+    def test_join_results(self):
+        self.assertEqual(join_results(b'{}', '[1]'), b'{"results": [1]}')
+        self.assertEqual(json.loads(join_results(b'{"a":1}', '[]').decode('utf-8')), {'a': 1, 'results': []})
+
+
+class ObservationBodyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('POST', '/api/sensor/v2/observations'): (201, {}, {'status': 201, 'message': 'Observations uploaded'}),
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def body(self):
+        return json.loads(self.server.requests[-1]['body'].decode('utf-8'))
+
+    def test_observation_body(self):
+        stream = Stream()
+        stream.id = 'stream_1'
+        organisation = Organisation()
+        organisation.id = 'org'
+        stream.organisations = [organisation]
+        observation = Observation()
+        observation.stream = stream
+        observation.results = [UnivariateResult(t=t, v={'v': 1.5}) for t in TIMESTAMPS]
+        expected = {'results': observation.to_state('create')['results']}
+
+        # results are serialized without a state dict per result
+        with mock.patch.object(UnivariateResult, '__getstate__') as getstate:
+            self.api.create_observations(observation)
+        self.assertEqual(getstate.call_count, 0)
+        self.assertEqual(self.server.requests[-1]['query'], {'streamid': 'stream_1'})
+        self.assertEqual(self.body(), expected)
+
+        self.api.create_observations(streamid='stream_1', results=observation.results)
+        self.assertEqual(self.body(), expected)
+
+    def test_nan_not_sent(self):
+        observation = Observation()
+        observation.results = [UnivariateResult(t=TIMESTAMPS[0], v={'v': float('nan')})]
+        with self.assertRaises(SenseTError):
+            self.api.create_observations(streamid='stream_1', results=observation.results)
+        self.assertEqual(self.server.requests, [])
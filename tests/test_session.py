@@ -0,0 +1,73 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+from sensetdp.auth import HTTPBasicAuth
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+STREAM = {'id': 'stream_1', 'resulttype': 'scalarvalue'}
+
+
+class SessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams/stream_1'): (200, {}, STREAM),
+        }).__enter__()
+        self.auth = HTTPBasicAuth('username', 'password')
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_connections_reused(self):
+        api = self.server.api(auth_handler=self.auth)
+        for _ in range(5):
+            self.assertEqual(api.get_stream(id='stream_1').id, 'stream_1')
+
+        stats = api.pool_stats.to_dict()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 4)
+        self.assertEqual(stats['hosts'][self.server.host], {'hits': 4, 'misses': 1})
+
+    def test_keep_alive_disabled(self):
+        api = self.server.api(auth_handler=self.auth, keep_alive=False)
+        for _ in range(3):
+            api.get_stream(id='stream_1')
+
+        self.assertEqual(api.pool_stats.misses, 3)
+        self.assertEqual(api.pool_stats.hits, 0)
+        self.assertEqual(self.server.requests[0]['headers'].get('Connection'), 'close')
+
+    def test_headers_not_shared_between_calls(self):
+        api = self.server.api(auth_handler=self.auth)
+        api.get_stream(id='stream_1', headers={'X-Test': '1'})
+        api.get_stream(id='stream_1')
+
+        self.assertEqual(self.server.requests[0]['headers'].get('X-Test'), '1')
+        self.assertNotIn('X-Test', self.server.requests[1]['headers'])
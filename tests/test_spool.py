@@ -0,0 +1,173 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import io
+import json
+import shutil
+import tempfile
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.error import SenseTError
+from sensetdp.spool import Spool, Replayer
+from sensetdp.writer import ObservationWriter
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+else:
+    import unittest2 as unittest
+
+
+def results(count, offset=0):
+    return [{'t': '2016-02-15T00:%02d:00.000Z' % (i + offset), 'v': {'v': i + offset}} for i in range(count)]
+
+
+class SpoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_nan_not_spooled(self):
+        with Spool(self.path) as spool:
+            with self.assertRaises(ValueError):
+                spool.append('stream_1', [{'t': '2016-02-15T00:00:00.000Z', 'v': {'v': float('nan')}}])
+            self.assertFalse(spool.pending())
+
+    def test_append_read_commit(self):
+        with Spool(self.path, segment_bytes=200) as spool:
+            for i in range(5):
+                spool.append('stream_%d' % i, results(2, i))
+            self.assertGreater(len(spool.segments()), 1)
+            self.assertTrue(spool.pending())
+
+            records = list(spool.read())
+            self.assertEqual([r[0] for r in records], ['stream_%d' % i for i in range(5)])
+            self.assertEqual(records[3][1], results(2, 3))
+
+            spool.commit(records[2][2])
+            self.assertEqual([r[0] for r in spool.read()], ['stream_3', 'stream_4'])
+            spool.commit(records[-1][2])
+            self.assertFalse(spool.pending())
+            self.assertEqual(len(spool.segments()), 1)
+
+        # the cursor survives a restart
+        with Spool(self.path) as spool:
+            self.assertEqual(list(spool.read()), [])
+            spool.append('stream_5', results(1))
+            self.assertEqual([r[0] for r in spool.read()], ['stream_5'])
+
+    def test_damaged_records_skipped(self):
+        with Spool(self.path) as spool:
+            spool.append('stream_1', results(1))
+            spool.append('stream_2', results(1))
+            segment = spool._segment_path(spool.segments()[-1])
+
+        with io.open(segment, 'rb') as f:
+            lines = f.readlines()
+        with io.open(segment, 'wb') as f:
+            f.write(lines[0].replace(b'stream_1', b'stream_X'))  # checksum no longer matches
+            f.write(lines[1])
+            f.write(b'0000 {"stre')  # torn write
+
+        with Spool(self.path) as spool:
+            self.assertEqual([r[0] for r in spool.read()], ['stream_2'])
+
+
+class ReplayerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.available = True
+        self.server = LocalServer({
+            ('POST', '/api/sensor/v2/observations'): self.create_observations,
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.api.close()
+        self.server.__exit__(None, None, None)
+        shutil.rmtree(self.path)
+
+    def create_observations(self, request):
+        if not self.available:
+            return 503, {}, {'status': 503, 'message': 'Unavailable'}
+        return 201, {}, {'status': 201, 'message': 'Observations uploaded'}
+
+    def uploads(self):
+        return [(r['query']['streamid'], [p['t'][11:16] for p in json.loads(r['body'].decode('utf-8'))['results']])
+                for r in self.server.requests]
+
+    def test_replay_in_order_with_dedupe(self):
+        with Spool(self.path) as spool:
+            spool.append('stream_1', results(2))
+            spool.append('stream_2', results(1))
+            spool.append('stream_1', results(2, 1))  # 00:01 again
+            spool.append('stream_1', results(2, 3))
+
+            replayer = Replayer(spool, self.api, max_points=4)
+            self.assertEqual(replayer.replay(), 6)
+            self.assertFalse(spool.pending())
+
+            # replaying the same points again sends nothing
+            spool.append('stream_1', results(1))
+            self.assertEqual(replayer.replay(), 0)
+
+        self.assertEqual(self.uploads(), [
+            ('stream_1', ['00:00', '00:01', '00:02']),
+            ('stream_2', ['00:00']),
+            ('stream_1', ['00:03', '00:04']),
+        ])
+
+    def test_failed_upload_kept(self):
+        with Spool(self.path) as spool:
+            spool.append('stream_1', results(2))
+            self.available = False
+            with self.assertRaises(SenseTError):
+                Replayer(spool, self.api).replay()
+            self.assertTrue(spool.pending())
+
+        self.available = True
+        with Spool(self.path) as spool:
+            self.assertEqual(Replayer(spool, self.api).replay(), 2)
+            self.assertFalse(spool.pending())
+
+    def test_writer_spools_while_unavailable(self):
+        self.available = False
+        spool = Spool(self.path)
+        writer = ObservationWriter(self.api, max_batch=2, spool=spool, replay_interval=60)
+        for point in results(3):
+            writer.write('stream_1', point['t'], point['v'])
+        writer.flush()
+        self.assertTrue(spool.pending())
+        self.assertEqual(writer.stats.points, 0)
+
+        self.available = True
+        writer.flush()
+        writer.close()
+        spool.close()
+        with Spool(self.path) as spool:
+            self.assertFalse(spool.pending())
+        self.assertEqual(writer.stats.points, 3)
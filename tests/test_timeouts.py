@@ -0,0 +1,108 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import time
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.error import SenseTError, DeadlineExceededError
+from sensetdp.retry import RetryPolicy
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+
+class TimeoutsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.delay = 0
+        self.failures = 0
+        self.server = LocalServer({
+            ('GET', '/api/sensor/v2/streams/stream_1'): self.get_stream,
+            ('GET', '/api/sensor/v2/observations'): (200, {}, {'results': []}),
+        }).__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def get_stream(self, request):
+        time.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            return 503, {}, {'status': 503, 'message': 'Unavailable'}
+        return 200, {}, {'id': 'stream_1', 'resulttype': 'scalarvalue'}
+
+    def api(self, **kwargs):
+        return self.server.api(auth_handler=HTTPBasicAuth('username', 'password'), **kwargs)
+
+    def sent_timeouts(self, api, call):
+        with mock.patch.object(api.session, 'request', wraps=api.session.request) as request:
+            call()
+        return [c[1]['timeout'] for c in request.call_args_list]
+
+    def test_timeouts(self):
+        api = self.api(timeout=30, connect_timeout=2,
+                       timeouts={'GET /observations': (3, 600)})
+        self.assertEqual(self.sent_timeouts(api, lambda: api.get_stream(id='stream_1')), [(2, 30)])
+        self.assertEqual(self.sent_timeouts(api, lambda: api.get_observations(streamid='stream_1')), [(3, 600)])
+        self.assertEqual(self.sent_timeouts(api, lambda: api.get_stream(id='stream_1', timeout=1)), [(1, 1)])
+
+        # the defaults follow the api timeout
+        api = self.api()
+        api.timeout = 5
+        self.assertEqual(self.sent_timeouts(api, lambda: api.get_stream(id='stream_1')), [(5, 5)])
+
+    def test_read_timeout(self):
+        self.delay = 0.5
+        api = self.api(read_timeout=0.1)
+        with self.assertRaises(SenseTError) as cm:
+            api.get_stream(id='stream_1')
+        self.assertIn('Failed to send request', str(cm.exception))
+
+    def test_deadline_caps_timeouts(self):
+        api = self.api(timeout=30, deadline=10)
+        connect, read = self.sent_timeouts(api, lambda: api.get_stream(id='stream_1'))[0]
+        self.assertTrue(9 < connect <= 10 and 9 < read <= 10)
+
+    def test_deadline_stops_retries(self):
+        self.failures = 10
+        api = self.api(retry_count=10, retry_delay=0.2, deadline=0.5,
+                       retry_policy=RetryPolicy(jitter=False, budget=False))
+        started = time.time()
+        with self.assertRaises(SenseTError) as cm:
+            api.get_stream(id='stream_1')
+        self.assertLess(time.time() - started, 0.5)
+        self.assertEqual(cm.exception.response.status_code, 503)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_deadline_rate_limit_wait(self):
+        api = self.api(wait_on_rate_limit=True, deadline=60)
+        api.rate_limiter.update({'x-rate-limit-remaining': '0', 'x-rate-limit-reset': str(int(time.time()) + 600)})
+        with self.assertRaises(DeadlineExceededError):
+            api.get_stream(id='stream_1')
+        self.assertEqual(len(self.server.requests), 0)
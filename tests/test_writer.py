@@ -0,0 +1,165 @@
+"""
+MIT License
+Copyright (c) 2016 Ionata Digital
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+from __future__ import unicode_literals, absolute_import, print_function
+
+import json
+import time
+import datetime
+import threading
+
+from sensetdp.auth import HTTPBasicAuth
+from sensetdp.error import SenseTError
+from sensetdp.writer import ObservationWriter, Batcher, _CLOSE
+from tests.local_server import LocalServer
+
+import six
+if six.PY3:
+    import unittest
+    from unittest import mock
+else:
+    import unittest2 as unittest
+    import mock
+
+
+class BatcherTestCase(unittest.TestCase):
+    def test_size_and_latency(self):
+        batcher = Batcher(max_batch=2, max_latency=10)
+        self.assertIsNone(batcher.next_deadline())
+        self.assertIsNone(batcher.add('a', 1, now=100))
+        self.assertIsNone(batcher.add('b', 1, now=105))
+        self.assertEqual(batcher.add('a', 2, now=106), [1, 2])
+        self.assertEqual(batcher.next_deadline(), 115)
+        self.assertEqual(batcher.due(114), [])
+        self.assertEqual(batcher.due(115), [('b', [1])])
+        self.assertIsNone(batcher.add('c', 1, now=120))
+        self.assertEqual(batcher.drain(), [('c', [1])])
+
+
+class ObservationWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.server = LocalServer({
+            ('POST', '/api/sensor/v2/observations'): self.create_observations,
+        }).__enter__()
+        self.api = self.server.api(auth_handler=HTTPBasicAuth('username', 'password'))
+
+    def tearDown(self):
+        self.gate.set()
+        self.api.close()
+        self.server.__exit__(None, None, None)
+
+    def create_observations(self, request):
+        self.gate.wait()
+        if request['query']['streamid'] == 'broken':
+            return 400, {}, {'status': 400, 'message': 'Unknown stream'}
+        return 201, {}, {'status': 201, 'message': 'Observations uploaded'}
+
+    def uploads(self):
+        return [(r['query']['streamid'], json.loads(r['body'].decode('utf-8'))['results'])
+                for r in self.server.requests]
+
+    def test_batches_per_stream(self):
+        with ObservationWriter(self.api, max_batch=3, max_latency=60) as writer:
+            for i in range(4):
+                writer.write('stream_1', datetime.datetime(2016, 2, 15, 0, i), {'v': i})
+            writer.write('stream_2', '2016-02-15T00:00:00.000Z', {'v': 10})
+
+        uploads = self.uploads()
+        self.assertEqual([(s, len(r)) for s, r in uploads], [('stream_1', 3), ('stream_1', 1), ('stream_2', 1)])
+        self.assertEqual(uploads[0][1][1], {'t': '2016-02-15T00:01:00.000000Z', 'v': {'v': 1}})
+        self.assertEqual(writer.stats.points, 5)
+        self.assertEqual(writer.stats.batches, 3)
+        with self.assertRaises(SenseTError):
+            writer.write('stream_1', '2016-02-15T00:00:00.000Z', {'v': 1})
+
+    def test_latency_flush(self):
+        writer = ObservationWriter(self.api, max_batch=100, max_latency=0.05)
+        writer.write('stream_1', '2016-02-15T00:00:00.000Z', {'v': 1})
+        for _ in range(100):
+            if self.server.requests:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(self.uploads()), 1)
+        writer.close()
+
+    def test_explicit_flush(self):
+        writer = ObservationWriter(self.api, max_batch=100, max_latency=60)
+        writer.write('stream_1', '2016-02-15T00:00:00.000Z', {'v': 1})
+        writer.flush()
+        self.assertEqual(len(self.uploads()), 1)
+        writer.close()
+
+    def test_backpressure(self):
+        self.gate.clear()  # uploads hang until the gate opens
+        writer = ObservationWriter(self.api, max_batch=1, max_queue=1, put_timeout=0.05)
+        with self.assertRaises(SenseTError):
+            for i in range(10):
+                writer.write('stream_1', '2016-02-15T00:00:00.000Z', {'v': i})
+        self.gate.set()
+        writer.close()
+
+    def test_errors_reported(self):
+        errors = []
+        with ObservationWriter(self.api, on_error=lambda *args: errors.append(args)) as writer:
+            writer.write('broken', '2016-02-15T00:00:00.000Z', {'v': 1})
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0][0], 'broken')
+        self.assertEqual(writer.stats.errors, 1)
+
+    def test_failing_on_error(self):
+        def on_error(streamid, results, error):
+            raise ValueError('on_error failed')
+
+        with ObservationWriter(self.api, max_batch=1, on_error=on_error) as writer:
+            writer.write('broken', '2016-02-15T00:00:00.000Z', {'v': 1})
+            writer.write('stream_1', '2016-02-15T00:00:00.000Z', {'v': 2})
+            writer.flush()
+            self.assertTrue(writer._thread.is_alive())
+        self.assertEqual(writer.stats.errors, 1)
+        self.assertEqual(writer.stats.points, 1)
+
+    def test_failing_spool(self):
+        spool = mock.Mock()
+        spool.append.side_effect = IOError('No space left on device')
+        spool.sync.side_effect = IOError('No space left on device')
+        errors = []
+        with ObservationWriter(self.api, spool=spool, on_error=lambda *args: errors.append(args)) as writer:
+            writer.write('stream_1', '2016-02-15T00:00:00.000Z', {'v': 1})
+            writer.flush()
+            self.assertTrue(writer._thread.is_alive())
+        self.assertEqual([e[0] for e in errors], ['stream_1'])
+
+    def test_stopped_thread(self):
+        writer = ObservationWriter(self.api, max_queue=1)
+        writer.poll_interval = 0.05
+        # the thread stops without the writer being closed
+        writer._queue.put((_CLOSE, None))
+        writer._thread.join(1)
+        writer._queue.put(('stream_1', {'t': '2016-02-15T00:00:00.000Z', 'v': {'v': 1}}))  # and the queue is full
+        with self.assertRaises(SenseTError):
+            writer.flush()
+        with self.assertRaises(SenseTError):
+            writer.write('stream_1', '2016-02-15T00:00:00.000Z', {'v': 2})
+        with self.assertRaises(SenseTError):
+            writer.close()